@@ -0,0 +1,22 @@
+from fastapi import Request
+
+from app.core import admission
+
+
+async def admit(request: Request):
+    """
+    Hold an admission slot for the matched route until the response is sent.
+
+    Used as a router-level dependency, so requests over the limit are
+    rejected before the body is validated or any upstream work starts.
+    """
+    limiter = admission.get_limiter(request.scope["route"].path)
+    if limiter.max_concurrent <= 0:
+        yield
+        return
+
+    await limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
@@ -7,22 +7,43 @@ from app.core.exceptions import (
     AppException,
     ValidationException,
     ResourceNotFoundException,
+    ServiceUnavailableException,
+    GatewayTimeoutException,
 )
 from app.core.error_codes import ErrorCode
+from app.core.metrics import Counter, registry
 
 # Map exception types to HTTP status codes
 EXCEPTION_STATUS_MAP = {
     ValidationException: status.HTTP_400_BAD_REQUEST,
     ResourceNotFoundException: status.HTTP_404_NOT_FOUND,
+    ServiceUnavailableException: status.HTTP_503_SERVICE_UNAVAILABLE,
+    GatewayTimeoutException: status.HTTP_504_GATEWAY_TIMEOUT,
 }
 
+ERRORS = Counter("app_errors_total", "Error responses by error code.", ("code",))
+# Export every code from the start so rate() works before the first error
+for _code in ErrorCode:
+    ERRORS.inc(0, code=_code.value)
+registry.register(ERRORS)
+
+
+def _count_error(code) -> None:
+    ERRORS.inc(code=getattr(code, "value", code))
+
 
 async def app_exception_handler(request: Request, exc: AppException):
     """Central exception handler"""
     status_code = EXCEPTION_STATUS_MAP.get(type(exc), 500)
+    _count_error(exc.error_code)
+
+    headers = None
+    if getattr(exc, "retry_after", None) is not None:
+        headers = {"Retry-After": str(exc.retry_after)}
 
     return JSONResponse(
         status_code=status_code,
+        headers=headers,
         content={
             "error": {
                 "code": exc.error_code,
@@ -47,6 +68,7 @@ async def validation_exception_handler(
     for error in exc.errors():
         field = ".".join(str(loc) for loc in error["loc"][1:])
         errors.append({"field": field, "message": error["msg"], "type": error["type"]})
+    _count_error(ErrorCode.VAL_REQUEST_INVALID)
 
     return JSONResponse(
         status_code=422,
@@ -77,6 +99,7 @@ async def generic_exception_handler(request: Request, exc: Exception) -> JSONRes
     #         "error_message": str(exc)
     #     }
     # )
+    _count_error(ErrorCode.SYS_INTERNAL_ERROR)
 
     return JSONResponse(
         status_code=500,
@@ -0,0 +1,174 @@
+"""
+ASGI middleware for observability: metrics, Server-Timing and profiling.
+
+All three are plain ASGI callables rather than BaseHTTPMiddleware so
+streamed responses pass through untouched and the per-request cost is a
+few dict updates. Routes are labelled by their template ("/vectors/search"),
+not the raw path, to keep label cardinality bounded.
+"""
+
+import asyncio
+import cProfile
+import os
+import secrets
+import time
+import uuid
+
+from app.config import settings
+from app.core import timing
+from app.core.metrics import SIZE_BUCKETS, Gauge, Histogram, registry
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response body is complete.",
+    ("method", "route", "status"),
+)
+REQUEST_SIZE = Histogram(
+    "http_request_size_bytes",
+    "Request body size.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Response body size.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.")
+
+registry.register(REQUEST_LATENCY, REQUEST_SIZE, RESPONSE_SIZE, IN_FLIGHT)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = "500"
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": getattr(route, "path", "unmatched"),
+            }
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start, status=status, **labels
+            )
+            REQUEST_SIZE.observe(sizes["request"], **labels)
+            RESPONSE_SIZE.observe(sizes["response"], **labels)
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header with the stages in app.core.timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SERVER_TIMING:
+            await self.app(scope, receive, send)
+            return
+
+        with timing.tracking() as request_timing:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    now = time.perf_counter()
+                    if request_timing.endpoint_done is not None:
+                        request_timing.record(
+                            "serialize", now - request_timing.endpoint_done
+                        )
+                    request_timing.record("total", now - request_timing.start)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", request_timing.header_value().encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+
+class ProfilerMiddleware:
+    """
+    Writes a cProfile dump for sampled requests to PROFILE_DIR.
+
+    One request in PROFILE_SAMPLE_N is profiled, plus any request carrying
+    an X-Profile header equal to PROFILE_TOKEN. cProfile sees the whole
+    event-loop thread, so other requests running at the same time show up
+    in the dump too; only one request is profiled at a time to keep that
+    bounded. Open dumps with `python -m pstats <file>` or snakeviz.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._seen = 0
+        self._active = False
+
+    def _should_profile(self, scope) -> bool:
+        if self._active:
+            return False
+        token = settings.PROFILE_TOKEN.encode()
+        if token and any(
+            name == b"x-profile" and secrets.compare_digest(value, token)
+            for name, value in scope["headers"]
+        ):
+            return True
+        if settings.PROFILE_SAMPLE_N <= 0:
+            return False
+        self._seen += 1
+        return self._seen % settings.PROFILE_SAMPLE_N == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path = os.path.join(
+            settings.PROFILE_DIR,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.prof",
+        )
+
+        async def send_with_path(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-dump", os.path.basename(path).encode()),
+                ]
+            await send(message)
+
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_path)
+        finally:
+            profiler.disable()
+            self._active = False
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            await asyncio.to_thread(profiler.dump_stats, path)
@@ -0,0 +1,131 @@
+"""
+Route class that marks where the endpoint starts and ends, and stops
+work nobody is waiting for any more.
+
+FastAPI parses and validates the request, calls the endpoint, then builds
+and encodes the response in one opaque handler. TimedRoute wraps each async
+endpoint so the gaps before and after it can be attributed to parsing and
+serialization in the Server-Timing header (see app/core/timing.py).
+
+It also runs each request's handler as a task under the request deadline
+(app/core/deadline.py), and cancels it, with any upstream call in flight,
+when the deadline passes or the client disconnects. The handler covers
+everything up to the response object, so for streaming endpoints that is
+the time to the first chunk.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from starlette.responses import Response
+
+from app.core import deadline, timing
+from app.core.metrics import Counter, registry
+
+# Status nginx uses for requests the client gave up on; the client never
+# sees it, but it keeps them apart from real errors in access logs
+CLIENT_CLOSED_REQUEST = 499
+
+REQUESTS_CANCELLED = Counter(
+    "requests_cancelled_total",
+    "Requests stopped before their handler finished, by route and reason "
+    "(disconnect, deadline, or deadline_spent on arrival).",
+    ("route", "reason"),
+)
+registry.register(REQUESTS_CANCELLED)
+
+
+def _timed_endpoint(endpoint):
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        request_timing = timing.current()
+        if request_timing is None:
+            return await endpoint(*args, **kwargs)
+
+        start = time.perf_counter()
+        request_timing.record("parse", start - request_timing.start)
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            request_timing.endpoint_done = time.perf_counter()
+            request_timing.record("handler", request_timing.endpoint_done - start)
+
+    return wrapper
+
+
+async def _disconnected(request: Request) -> None:
+    """Return once the client has gone; the body must be read already."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _run_cancellable(
+    request: Request, handler, route: str, watch_disconnect: bool
+) -> Response:
+    left = deadline.remaining()
+    if left is not None and left <= 0:
+        REQUESTS_CANCELLED.inc(route=route, reason="deadline_spent")
+        raise deadline.exceeded()
+
+    watcher = None
+    if watch_disconnect:
+        # Read the body first (FastAPI reuses it), so the watcher below only
+        # ever sees the disconnect message
+        await request.body()
+        watcher = asyncio.create_task(_disconnected(request))
+    task = asyncio.create_task(handler(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task} if watcher is None else {task, watcher},
+            timeout=deadline.remaining(),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    except BaseException:
+        task.cancel()
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    # Let the handler unwind (releasing its admission slot and upstream
+    # connection); its CancelledError is not ours to raise
+    await asyncio.wait({task})
+    if not task.cancelled():
+        task.exception()
+    if watcher in done:
+        REQUESTS_CANCELLED.inc(route=route, reason="disconnect")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    REQUESTS_CANCELLED.inc(route=route, reason="deadline")
+    raise deadline.exceeded()
+
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        # Endpoints that read the raw body stream themselves (no body model
+        # on a method that has a body) cannot have it read up front
+        watch_disconnect = self.body_field is not None or not (
+            self.methods & {"POST", "PUT", "PATCH"}
+        )
+
+        async def app(request: Request) -> Response:
+            seconds = deadline.parse(request.headers.get(deadline.HEADER))
+            with deadline.scope(seconds):
+                return await _run_cancellable(
+                    request, handler, self.path, watch_disconnect
+                )
+
+        return app
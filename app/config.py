@@ -1,12 +1,203 @@
 import os
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
 class Settings:
     PROJECT_NAME: str = "Generate and Embed API"
     VERSION: str = "1.0.0"
     ENV: str = os.getenv("ENV", "dev")
     PORT: int = os.getenv("PORT", 8000)
 
+    # Model server endpoint; point at benchmarks/upstream_stub.py for local runs
+    UPSTREAM_URL: str = os.getenv("UPSTREAM_URL", "https://httpbin.org/post")
+
+    # Per-role replica sets (comma-separated URLs; default UPSTREAM_URL),
+    # balanced with "p2c" (power of two choices) or "least_outstanding".
+    # Backends with EJECT_FAILURES consecutive errors sit out EJECT_SECONDS,
+    # then ramp back up over SLOW_START_SECONDS
+    UPSTREAM_GENERATE_URLS: str = os.getenv("UPSTREAM_GENERATE_URLS", "")
+    UPSTREAM_EMBED_URLS: str = os.getenv("UPSTREAM_EMBED_URLS", "")
+    UPSTREAM_LB_STRATEGY: str = os.getenv("UPSTREAM_LB_STRATEGY", "p2c")
+    UPSTREAM_EJECT_FAILURES: int = int(os.getenv("UPSTREAM_EJECT_FAILURES", "5"))
+    UPSTREAM_EJECT_SECONDS: float = float(os.getenv("UPSTREAM_EJECT_SECONDS", "30"))
+    UPSTREAM_SLOW_START_SECONDS: float = float(
+        os.getenv("UPSTREAM_SLOW_START_SECONDS", "30")
+    )
+
+    # Shared upstream HTTP client (see app/core/upstream.py)
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(
+        os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30")
+    )
+    # HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+    UPSTREAM_HTTP2: bool = _env_bool("UPSTREAM_HTTP2", False)
+    UPSTREAM_CONNECT_TIMEOUT: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+    UPSTREAM_READ_TIMEOUT: float = float(os.getenv("UPSTREAM_READ_TIMEOUT", "20"))
+    UPSTREAM_WRITE_TIMEOUT: float = float(os.getenv("UPSTREAM_WRITE_TIMEOUT", "20"))
+    UPSTREAM_POOL_TIMEOUT: float = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+
+    # Upstream call policy (see app/core/resilience.py). Attempts include the
+    # first; hedge percentile 0 and breaker failures 0 disable those parts
+    UPSTREAM_RETRY_MAX_ATTEMPTS: int = int(
+        os.getenv("UPSTREAM_RETRY_MAX_ATTEMPTS", "3")
+    )
+    UPSTREAM_RETRY_BACKOFF_MS: float = float(
+        os.getenv("UPSTREAM_RETRY_BACKOFF_MS", "50")
+    )
+    UPSTREAM_RETRY_BACKOFF_MAX_MS: float = float(
+        os.getenv("UPSTREAM_RETRY_BACKOFF_MAX_MS", "1000")
+    )
+    UPSTREAM_RETRY_BUDGET_RATIO: float = float(
+        os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", "0.1")
+    )
+    UPSTREAM_HEDGE_PERCENTILE: float = float(
+        os.getenv("UPSTREAM_HEDGE_PERCENTILE", "95")
+    )
+    UPSTREAM_HEDGE_MIN_DELAY_MS: float = float(
+        os.getenv("UPSTREAM_HEDGE_MIN_DELAY_MS", "10")
+    )
+    UPSTREAM_HEDGE_MIN_SAMPLES: int = int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20"))
+    UPSTREAM_BREAKER_FAILURES: int = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+    UPSTREAM_BREAKER_OPEN_SECONDS: float = float(
+        os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "10")
+    )
+
+    # Adaptive upstream concurrency (see app/core/concurrency.py): "gradient",
+    # "aimd" or "off"; the per-model limit starts at INITIAL and stays within
+    # MIN..MAX, latency above TOLERANCE x the baseline counts as congestion,
+    # and calls wait at most QUEUE_TIMEOUT_MS for a slot
+    UPSTREAM_LIMIT_ALGORITHM: str = os.getenv("UPSTREAM_LIMIT_ALGORITHM", "gradient")
+    UPSTREAM_LIMIT_INITIAL: int = int(os.getenv("UPSTREAM_LIMIT_INITIAL", "20"))
+    UPSTREAM_LIMIT_MIN: int = int(os.getenv("UPSTREAM_LIMIT_MIN", "1"))
+    UPSTREAM_LIMIT_MAX: int = int(os.getenv("UPSTREAM_LIMIT_MAX", "100"))
+    UPSTREAM_LIMIT_TOLERANCE: float = float(
+        os.getenv("UPSTREAM_LIMIT_TOLERANCE", "2.0")
+    )
+    UPSTREAM_LIMIT_BACKOFF_RATIO: float = float(
+        os.getenv("UPSTREAM_LIMIT_BACKOFF_RATIO", "0.9")
+    )
+    UPSTREAM_LIMIT_QUEUE_TIMEOUT_MS: float = float(
+        os.getenv("UPSTREAM_LIMIT_QUEUE_TIMEOUT_MS", "1000")
+    )
+
+    # Admission control (see app/core/admission.py): per-route concurrency
+    # limit and wait queue, with per-route overrides as
+    # "route=max_concurrent:max_queue,..."; max_concurrent 0 disables it
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT_MS: float = float(
+        os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "250")
+    )
+    ADMISSION_LIMITS: str = os.getenv("ADMISSION_LIMITS", "")
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(
+        os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")
+    )
+    # /health/ready stays not-ready this long after the last rejection
+    ADMISSION_READY_HOLD_SECONDS: float = float(
+        os.getenv("ADMISSION_READY_HOLD_SECONDS", "5")
+    )
+
+    # Request deadlines (see app/core/deadline.py): the budget when a client
+    # sends no X-Request-Timeout header (0 = none), and a cap on what it sends
+    REQUEST_DEFAULT_TIMEOUT_SECONDS: float = float(
+        os.getenv("REQUEST_DEFAULT_TIMEOUT_SECONDS", "0")
+    )
+    REQUEST_MAX_TIMEOUT_SECONDS: float = float(
+        os.getenv("REQUEST_MAX_TIMEOUT_SECONDS", "300")
+    )
+
+    # Async generation jobs (see app/core/jobs.py): worker pool size, queue
+    # bound, how long finished results are kept, the longest ?wait= a poll
+    # may block, and the result store ("memory" or "package.module:Class")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "4"))
+    JOBS_MAX_QUEUE: int = int(os.getenv("JOBS_MAX_QUEUE", "1000"))
+    JOBS_RESULT_TTL_SECONDS: float = float(os.getenv("JOBS_RESULT_TTL_SECONDS", "3600"))
+    JOBS_MAX_WAIT_SECONDS: float = float(os.getenv("JOBS_MAX_WAIT_SECONDS", "30"))
+    JOBS_STORE: str = os.getenv("JOBS_STORE", "memory")
+
+    # Generation: coalesce identical in-flight prompts into one upstream call
+    GENERATE_COALESCE: bool = _env_bool("GENERATE_COALESCE", True)
+    # Semantic cache for /generate: reuse the answer to an earlier query
+    # whose embedding has at least THRESHOLD cosine similarity; SIZE is the
+    # number of queries kept per model (0 disables it)
+    GENERATE_SEMANTIC_CACHE_SIZE: int = int(
+        os.getenv("GENERATE_SEMANTIC_CACHE_SIZE", "0")
+    )
+    GENERATE_SEMANTIC_CACHE_THRESHOLD: float = float(
+        os.getenv("GENERATE_SEMANTIC_CACHE_THRESHOLD", "0.95")
+    )
+    # /generate/batch: most prompts per request, and how many of them run
+    # against the upstream at once
+    GENERATE_MAX_BATCH_SIZE: int = int(os.getenv("GENERATE_MAX_BATCH_SIZE", "256"))
+    GENERATE_BATCH_CONCURRENCY: int = int(os.getenv("GENERATE_BATCH_CONCURRENCY", "8"))
+
+    # Embeddings
+    EMBED_MAX_BATCH_SIZE: int = int(os.getenv("EMBED_MAX_BATCH_SIZE", "256"))
+    EMBED_MAX_TEXT_CHARS: int = int(os.getenv("EMBED_MAX_TEXT_CHARS", "8192"))
+    # Chunked /embed: most windows one text may split into
+    EMBED_MAX_CHUNKS: int = int(os.getenv("EMBED_MAX_CHUNKS", "1024"))
+    # Micro-batching of concurrent /embed calls; 0 disables it
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "0"))
+    EMBED_BATCH_MAX_SIZE: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+    # Run vector construction/serialization off the event loop:
+    # "none", "thread" or "process"; only for jobs of at least MIN_ROWS vectors
+    EMBED_OFFLOAD: str = os.getenv("EMBED_OFFLOAD", "none")
+    EMBED_OFFLOAD_WORKERS: int = int(os.getenv("EMBED_OFFLOAD_WORKERS", "2"))
+    EMBED_OFFLOAD_MIN_ROWS: int = int(os.getenv("EMBED_OFFLOAD_MIN_ROWS", "64"))
+    # Streaming bulk embedding (/embed/stream): lines per upstream batch and
+    # how many batches run at once; together they bound memory per request
+    EMBED_STREAM_BATCH_SIZE: int = int(os.getenv("EMBED_STREAM_BATCH_SIZE", "64"))
+    EMBED_STREAM_CONCURRENCY: int = int(os.getenv("EMBED_STREAM_CONCURRENCY", "4"))
+    # Output not yet read by the client is held in memory up to this size,
+    # then in a temporary file; past MAX_BYTES the request body is no longer
+    # read until the client catches up (see app/core/spool.py)
+    EMBED_STREAM_SPOOL_BYTES: int = int(
+        os.getenv("EMBED_STREAM_SPOOL_BYTES", str(8 << 20))
+    )
+    EMBED_STREAM_SPOOL_MAX_BYTES: int = int(
+        os.getenv("EMBED_STREAM_SPOOL_MAX_BYTES", str(256 << 20))
+    )
+    # ...and the stream is ended once it has stayed full this long (0 = never)
+    EMBED_STREAM_STALL_SECONDS: float = float(
+        os.getenv("EMBED_STREAM_STALL_SECONDS", "60")
+    )
+    # Precomputed embeddings served by /embed/lookup: a directory built by
+    # `python -m app.precompute`, memory-mapped at startup (empty = none)
+    EMBED_STORE_PATH: str = os.getenv("EMBED_STORE_PATH", "")
+    # In-process embedding cache; a budget of 0 disables it
+    EMBED_CACHE_MAX_BYTES: int = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 << 20)))
+    EMBED_CACHE_TTL_SECONDS: float = float(os.getenv("EMBED_CACHE_TTL_SECONDS", "3600"))
+
+    # Vector store: collections this large get an IVF index (nlist 0 = sqrt(n))
+    VECTOR_IVF_MIN_SIZE: int = int(os.getenv("VECTOR_IVF_MIN_SIZE", "50000"))
+    VECTOR_IVF_NLIST: int = int(os.getenv("VECTOR_IVF_NLIST", "0"))
+    VECTOR_IVF_NPROBE: int = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+
+    # /similarity: most inputs per side and cells per matrix; rows per block
+    # of the matrix product, which bounds temporary memory in both endpoints
+    SIMILARITY_MAX_ITEMS: int = int(os.getenv("SIMILARITY_MAX_ITEMS", "10000"))
+    SIMILARITY_MAX_CELLS: int = int(os.getenv("SIMILARITY_MAX_CELLS", "1000000"))
+    SIMILARITY_CHUNK_ROWS: int = int(os.getenv("SIMILARITY_CHUNK_ROWS", "1024"))
+
+    # /dedup: inputs up to EXACT_MAX_ITEMS compare all pairs, larger ones use
+    # LSH with this many tables of this many hyperplanes each
+    DEDUP_MAX_ITEMS: int = int(os.getenv("DEDUP_MAX_ITEMS", "100000"))
+    DEDUP_EXACT_MAX_ITEMS: int = int(os.getenv("DEDUP_EXACT_MAX_ITEMS", "2048"))
+    DEDUP_LSH_BITS: int = int(os.getenv("DEDUP_LSH_BITS", "16"))
+    DEDUP_LSH_TABLES: int = int(os.getenv("DEDUP_LSH_TABLES", "24"))
+
+    # Observability: Server-Timing stage header, and cProfile dumps for one
+    # request in PROFILE_SAMPLE_N (0 = off) or any request whose X-Profile
+    # header matches PROFILE_TOKEN (empty = header ignored)
+    SERVER_TIMING: bool = _env_bool("SERVER_TIMING", True)
+    PROFILE_SAMPLE_N: int = int(os.getenv("PROFILE_SAMPLE_N", "0"))
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "/tmp/profiles")
+
     @property
     def DOCS_URL(self):
         # Hide docs if we are in production
@@ -0,0 +1,190 @@
+"""
+Admission control: per-route concurrency limits with a short wait queue.
+
+Each guarded route gets an AdmissionLimiter. Up to max_concurrent requests
+run at once; the next max_queue wait (FIFO) for at most queue_timeout_ms;
+anything beyond that is rejected straight away with ServiceUnavailable
+(503 + Retry-After) instead of piling more work onto the upstream. Waiting
+is bounded on both length and time, so a rejected client learns quickly
+and can retry against another pod.
+
+Limits are per process. The defaults apply to every guarded route and
+ADMISSION_LIMITS overrides single routes, e.g.
+"/generate=32:16,/embed/batch=8:8" (max_concurrent:max_queue).
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from app.config import settings
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import Counter, Gauge, Histogram, registry
+
+
+class AdmissionLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_ms: float,
+        retry_after_seconds: int = 1,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_ms = queue_timeout_ms
+        self.retry_after_seconds = retry_after_seconds
+
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.last_rejected_at: float | None = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new request would be rejected right now."""
+        return self.in_flight >= self.max_concurrent and self.queued >= self.max_queue
+
+    def recently_rejected(self, window_seconds: float) -> bool:
+        return (
+            self.last_rejected_at is not None
+            and time.monotonic() - self.last_rejected_at < window_seconds
+        )
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout_ms / 1000)
+        except TimeoutError:
+            # A slot handed over just as the wait timed out must be returned
+            if future.done() and not future.cancelled():
+                self.release()
+            self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            # A slot handed over just as the caller went away must be returned
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, route=self.name)
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter so it cannot be
+        # overtaken by a request that arrives in the meantime
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        self.last_rejected_at = time.monotonic()
+        ADMISSION_REJECTED.inc(route=self.name, reason=reason)
+        raise ServiceUnavailableException(
+            message="The server is at capacity. Please retry shortly.",
+            error_code=ErrorCode.SYS_OVERLOADED,
+            details={"route": self.name, "reason": reason},
+            retry_after=self.retry_after_seconds,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_ms": self.queue_timeout_ms,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "saturated": self.saturated,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def parse_limits(spec: str) -> dict[str, tuple[int, int]]:
+    """Parse "route=max_concurrent:max_queue,..." into a dict."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, values = entry.partition("=")
+        max_concurrent, _, max_queue = values.partition(":")
+        limits[route.strip()] = (int(max_concurrent), int(max_queue or 0))
+    return limits
+
+
+limiters: dict[str, AdmissionLimiter] = {}
+
+
+def get_limiter(route: str) -> AdmissionLimiter:
+    limiter = limiters.get(route)
+    if limiter is None:
+        max_concurrent, max_queue = parse_limits(settings.ADMISSION_LIMITS).get(
+            route, (settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_MAX_QUEUE)
+        )
+        limiter = limiters[route] = AdmissionLimiter(
+            route,
+            max_concurrent=max_concurrent,
+            max_queue=max_queue,
+            queue_timeout_ms=settings.ADMISSION_QUEUE_TIMEOUT_MS,
+            retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+        )
+    return limiter
+
+
+def saturated_routes() -> list[str]:
+    """Routes that are full now or shed load within ADMISSION_READY_HOLD_SECONDS."""
+    return [
+        name
+        for name, limiter in limiters.items()
+        if limiter.saturated
+        or limiter.recently_rejected(settings.ADMISSION_READY_HOLD_SECONDS)
+    ]
+
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests shed by admission control, by route and reason.",
+    ("route", "reason"),
+)
+ADMISSION_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time requests spent queued for an admission slot.",
+    ("route",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+registry.register(
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT,
+    Gauge(
+        "admission_in_flight",
+        "Requests holding an admission slot, by route.",
+        ("route",),
+        fn=lambda: {(name,): lim.in_flight for name, lim in limiters.items()},
+    ),
+    Gauge(
+        "admission_queued",
+        "Requests waiting for an admission slot, by route.",
+        ("route",),
+        fn=lambda: {(name,): lim.queued for name, lim in limiters.items()},
+    ),
+)
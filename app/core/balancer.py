@@ -0,0 +1,200 @@
+"""
+Client-side load balancing across upstream model-server replicas.
+
+A BackendPool holds the replicas serving one model. Each request picks a
+backend with power-of-two-choices (two random backends, take the one with
+fewer outstanding requests) or full least-outstanding-requests, so load
+follows actual backend speed without a proxy hop in between.
+
+Health is tracked passively from real traffic: after eject_failures
+consecutive transport errors or 5xx responses a backend is ejected for
+eject_seconds. When it comes back it is weighted down and ramped up
+linearly over slow_start_seconds, so a cold replica is not flooded the
+moment it rejoins. If every backend is ejected the pool uses all of them
+anyway, since failing every request is never better than trying.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from app.core import upstream
+from app.core.metrics import Counter, Gauge, registry
+
+# Weight a backend starts with at the beginning of slow-start
+_SLOW_START_FLOOR = 0.1
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.rejoined_at: float | None = None
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def weight(self, now: float, slow_start_seconds: float) -> float:
+        if self.rejoined_at is None or slow_start_seconds <= 0:
+            return 1.0
+        progress = (now - self.rejoined_at) / slow_start_seconds
+        if progress >= 1:
+            self.rejoined_at = None
+            return 1.0
+        return _SLOW_START_FLOOR + (1 - _SLOW_START_FLOOR) * progress
+
+    def load(self, now: float, slow_start_seconds: float) -> float:
+        return (self.outstanding + 1) / self.weight(now, slow_start_seconds)
+
+
+class BackendPool:
+    def __init__(
+        self,
+        name: str,
+        urls: list[str],
+        strategy: str = "p2c",
+        eject_failures: int = 5,
+        eject_seconds: float = 30,
+        slow_start_seconds: float = 30,
+    ):
+        if not urls:
+            raise ValueError(f"Backend pool '{name}' needs at least one URL")
+        self.name = name
+        self.backends = [Backend(url) for url in urls]
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.slow_start_seconds = slow_start_seconds
+
+    def pick(self) -> Backend:
+        if len(self.backends) == 1:
+            return self.backends[0]
+
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b.available(now)] or self.backends
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "p2c":
+            candidates = random.sample(candidates, 2)
+        else:
+            # Shuffle so ties do not always go to the first backend
+            candidates = random.sample(candidates, len(candidates))
+        return min(candidates, key=lambda b: b.load(now, self.slow_start_seconds))
+
+    @contextmanager
+    def lease(self):
+        """
+        Pick a backend and count the request against it while in the block.
+
+        Transport errors raised in the block count as failures; callers
+        report HTTP statuses with record_status().
+        """
+        backend = self.pick()
+        backend.outstanding += 1
+        try:
+            yield backend
+        except httpx.TransportError:
+            self._failed(backend)
+            raise
+        finally:
+            backend.outstanding -= 1
+
+    def record_status(self, backend: Backend, status_code: int) -> None:
+        if status_code >= 500:
+            self._failed(backend)
+        else:
+            self._succeeded(backend)
+
+    def _succeeded(self, backend: Backend) -> None:
+        backend.consecutive_failures = 0
+        BACKEND_REQUESTS.inc(pool=self.name, backend=backend.url, outcome="ok")
+
+    def _failed(self, backend: Backend) -> None:
+        BACKEND_REQUESTS.inc(pool=self.name, backend=backend.url, outcome="error")
+        backend.consecutive_failures += 1
+        if self.eject_failures <= 0 or len(self.backends) == 1:
+            return
+        if backend.consecutive_failures >= self.eject_failures:
+            now = time.monotonic()
+            backend.ejected_until = now + self.eject_seconds
+            backend.rejoined_at = backend.ejected_until
+            backend.consecutive_failures = 0
+            backend.ejections += 1
+            BACKEND_EJECTIONS.inc(pool=self.name, backend=backend.url)
+
+    async def post(self, model: str, **kwargs) -> httpx.Response:
+        """POST to one backend of the pool (a single attempt)."""
+        with self.lease() as backend:
+            response = await upstream.post(model, backend.url, **kwargs)
+        self.record_status(backend, response.status_code)
+        return response
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "backends": [
+                {
+                    "url": b.url,
+                    "outstanding": b.outstanding,
+                    "available": b.available(now),
+                    "weight": b.weight(now, self.slow_start_seconds),
+                    "consecutive_failures": b.consecutive_failures,
+                    "ejections": b.ejections,
+                }
+                for b in self.backends
+            ],
+        }
+
+
+pools: dict[str, BackendPool] = {}
+
+
+def register_pool(pool: BackendPool) -> BackendPool:
+    pools[pool.name] = pool
+    return pool
+
+
+def parse_urls(spec: str, default: str) -> list[str]:
+    return [url.strip() for url in spec.split(",") if url.strip()] or [default]
+
+
+BACKEND_REQUESTS = Counter(
+    "upstream_backend_requests_total",
+    "Upstream responses per backend: ok, or error (5xx and transport errors).",
+    ("pool", "backend", "outcome"),
+)
+BACKEND_EJECTIONS = Counter(
+    "upstream_backend_ejections_total",
+    "Times a backend was ejected after consecutive failures.",
+    ("pool", "backend"),
+)
+registry.register(
+    BACKEND_REQUESTS,
+    BACKEND_EJECTIONS,
+    Gauge(
+        "upstream_backend_outstanding",
+        "Requests in flight per backend.",
+        ("pool", "backend"),
+        fn=lambda: {
+            (pool.name, b.url): b.outstanding
+            for pool in pools.values()
+            for b in pool.backends
+        },
+    ),
+    Gauge(
+        "upstream_backend_available",
+        "1 if the backend is in rotation, 0 while ejected.",
+        ("pool", "backend"),
+        fn=lambda: {
+            (pool.name, b.url): int(b.available(time.monotonic()))
+            for pool in pools.values()
+            for b in pool.backends
+        },
+    ),
+)
@@ -0,0 +1,143 @@
+"""
+Dynamic micro-batching.
+
+MicroBatcher collects items submitted concurrently by many coroutines and
+hands them to a single flush call, either when max_batch_size items are
+waiting or when the oldest one has waited max_wait_ms. Each caller gets back
+only its own result, in the same position it was submitted. flush must
+return one result per item; otherwise every caller in the batch fails.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.core.metrics import Gauge, Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_SECONDS_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        flush: Callable[[list[Any]], Awaitable[list[Any]]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        name: str = "batcher",
+    ):
+        self.flush = flush
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._pending: list[tuple[Any, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        self.wait_ms_max = 0.0
+        self.batch_sizes = Histogram(
+            f"{name}_batch_size", "Items per flushed batch.", buckets=BATCH_SIZE_BUCKETS
+        )
+        self.wait_seconds = Histogram(
+            f"{name}_wait_seconds",
+            "Time an item waited in the queue before its batch was flushed.",
+            buckets=WAIT_SECONDS_BUCKETS,
+        )
+        self.queue_depth = Gauge(
+            f"{name}_queue_depth",
+            "Items waiting for the next flush.",
+            fn=lambda: len(self._pending),
+        )
+
+    @property
+    def metrics(self) -> tuple:
+        """Prometheus metrics for this batcher, for metrics.registry.register."""
+        return self.batch_sizes, self.wait_seconds, self.queue_depth
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._dispatch)
+
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            # A batch serves many requests, so it runs outside any one
+            # request's context (e.g. its Server-Timing stages)
+            task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future, float]]) -> None:
+        # Callers that gave up while queued are dropped before going upstream
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        self._record(batch)
+
+        try:
+            results = await self.flush([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                # zip() would leave the callers past the shortfall waiting
+                # forever, and a longer list has no sound mapping either
+                raise RuntimeError(
+                    f"flush returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, batch: list[tuple[Any, asyncio.Future, float]]) -> None:
+        now = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            wait = now - enqueued_at
+            self.wait_seconds.observe(wait)
+            self.wait_ms_max = max(self.wait_ms_max, wait * 1000)
+
+    def stats(self) -> dict:
+        batches = self.batch_sizes.count()
+        items = self.wait_seconds.count()
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": len(self._pending),
+            "in_flight_batches": len(self._tasks),
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_histogram": _histogram(
+                BATCH_SIZE_BUCKETS, self.batch_sizes.counts()
+            ),
+            "wait_ms_histogram": _histogram(
+                tuple(f"{b * 1000:g}" for b in WAIT_SECONDS_BUCKETS),
+                self.wait_seconds.counts(),
+            ),
+            "mean_wait_ms": self.wait_seconds.sum() * 1000 / items if items else 0.0,
+            "max_wait_ms_observed": self.wait_ms_max,
+        }
+
+
+def _histogram(buckets: tuple, counts: list[int]) -> dict[str, int]:
+    labels = [f"<={bound}" for bound in buckets] + [f">{buckets[-1]}"]
+    return dict(zip(labels, counts))
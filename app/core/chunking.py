@@ -0,0 +1,80 @@
+"""
+Splitting long documents into overlapping windows, and pooling the
+window embeddings back into one document vector.
+
+Windows are measured in characters or in approximate tokens. Tokens are
+runs of word characters or single punctuation marks, which is close
+enough to what subword tokenizers produce to keep a chunk inside a model's
+context without running a real tokenizer here. Windows are returned as
+(start, end) character offsets into the original text, so chunks are
+plain slices and a client can map a chunk back to its source.
+
+count_windows() answers how many windows split() would return without
+building them, and stops tokenizing once the answer passes a limit, so an
+oversized document is rejected before it costs more than the limit's worth
+of work.
+"""
+
+import math
+import re
+from itertools import islice
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _windows(count: int, size: int, overlap: int) -> list[tuple[int, int]]:
+    """[start, end) index windows of `size` over `count` units, `overlap` shared."""
+    step = size - overlap
+    windows = []
+    start = 0
+    while True:
+        end = min(start + size, count)
+        windows.append((start, end))
+        if end == count:
+            return windows
+        start += step
+
+
+def window_count(count: int, size: int, overlap: int) -> int:
+    """Number of windows _windows() returns for `count` units."""
+    if count <= size:
+        return 1 if count else 0
+    return math.ceil((count - overlap) / (size - overlap))
+
+
+def count_windows(text: str, unit: str, size: int, overlap: int, limit: int) -> int:
+    """
+    Number of windows split() would return, or limit + 1 if there would be
+    more than limit. Only enough of the text is tokenized to tell.
+    """
+    if unit == "chars":
+        units = 0 if not text or text.isspace() else len(text)
+    else:
+        # Units for limit + 1 windows; any more cannot change the verdict
+        cap = size + limit * (size - overlap)
+        units = sum(1 for _ in islice(TOKEN_RE.finditer(text), cap))
+    return min(window_count(units, size, overlap), limit + 1)
+
+
+def split(text: str, unit: str, size: int, overlap: int) -> list[tuple[int, int]]:
+    """Character spans of the windows over text; empty if it has no content."""
+    if unit == "chars":
+        return _windows(len(text), size, overlap) if text.strip() else []
+
+    tokens = [(m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+    if not tokens:
+        return []
+    return [
+        (tokens[first][0], tokens[last - 1][1])
+        for first, last in _windows(len(tokens), size, overlap)
+    ]
+
+
+def pool(matrix: np.ndarray, method: str, weights: np.ndarray) -> np.ndarray:
+    """Pool (n, dim) chunk vectors into one: "mean", or "weighted_mean"."""
+    if method == "weighted_mean":
+        weights = np.asarray(weights, dtype=np.float32)
+        return (weights @ matrix) / weights.sum()
+    return matrix.mean(axis=0, dtype=np.float32)
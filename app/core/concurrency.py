@@ -0,0 +1,290 @@
+"""
+Adaptive concurrency limits for upstream calls, one limiter per model.
+
+No fixed cap on in-flight upstream requests stays right for long: the
+model server's capacity moves with replica count, batch shapes and what
+else it is serving. Too low a cap wastes it; too high pushes the server
+into queueing collapse, where every request waits behind the others and
+times out. An AdaptiveLimiter infers the cap from what it observes.
+
+Every upstream attempt takes a slot first, waiting FIFO for at most
+queue_timeout_ms (then failing fast with SYS_OVERLOADED), and reports its
+latency and outcome when it ends. Latency is compared with a baseline that
+stands for the no-queueing time: the lowest latency seen, drifting up over
+about baseline_window samples so a server that got slower for good is
+eventually taken as it is. The limit follows one of two algorithms:
+
+- gradient (Vegas-like, after Netflix's Gradient2): the limit is scaled by
+  tolerance * baseline / latency, capped at 1 and floored at 0.5, plus
+  sqrt(limit) of headroom, and smoothed. While latency stays within
+  tolerance x the baseline the limit keeps growing; when the server starts
+  queueing it shrinks in proportion to how much slower it got.
+- aimd: the limit grows by 1 per limit's worth of good samples (so roughly
+  +1 per round trip, as in TCP congestion avoidance) and is multiplied by
+  backoff_ratio on a sample slower than tolerance x the baseline.
+
+With either, an upstream failure (5xx, 429, transport error or timeout)
+multiplies the limit by backoff_ratio, at most once per round trip: calls
+already in flight when the limit was cut do not cut it again. Samples taken
+while fewer than half the slots were busy never grow the limit, since they
+say nothing about what more load would do.
+
+The limit applies to each attempt made by UpstreamPolicy (app/core/
+resilience.py), so retries and hedges take slots too. Streamed generations
+hold a slot for as long as they stream, but only their time to response
+headers is taken as a latency sample.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from app.config import settings
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import Counter, Gauge, Histogram, registry
+
+ALGORITHMS = ("gradient", "aimd")
+
+# Outcomes reported to release()
+OK, DROPPED, IGNORED = "ok", "dropped", "ignored"
+
+# Latency differences below this are timer noise, not queueing
+_MIN_LATENCY = 0.001
+
+
+@dataclass
+class Slot:
+    """A granted slot: when it started and how many slots were busy then."""
+
+    started: float
+    in_flight: int
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        model: str,
+        algorithm: str = "gradient",
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        smoothing: float = 0.2,
+        baseline_window: int = 500,
+        queue_timeout_ms: float = 1000,
+        retry_after_seconds: int = 1,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown limiter algorithm '{algorithm}'")
+        self.model = model
+        self.algorithm = algorithm
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+        self._baseline_alpha = 2 / (baseline_window + 1)
+        self.queue_timeout_ms = queue_timeout_ms
+        self.retry_after_seconds = retry_after_seconds
+
+        self.baseline: float | None = None
+        self.last_latency: float | None = None
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.samples = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def available(self) -> int:
+        return max(self.min_limit, math.floor(self.limit)) - self.in_flight
+
+    async def acquire(self) -> Slot:
+        if self.available > 0 and not self._waiters:
+            self.in_flight += 1
+            return Slot(time.monotonic(), self.in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout_ms / 1000)
+        except TimeoutError:
+            # _wake may have handed this waiter a slot just as the wait
+            # timed out; give it back rather than leak it
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            self._reject()
+        except asyncio.CancelledError:
+            # A slot handed over just as the caller went away must be returned
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            LIMITER_WAIT.observe(time.perf_counter() - start, model=self.model)
+        return Slot(time.monotonic(), self.in_flight)
+
+    def release(
+        self, slot: Slot, outcome: str = OK, latency: float | None = None
+    ) -> None:
+        """
+        Give the slot back, learning from its latency and outcome. Latency
+        defaults to the time the slot was held; streams pass the time to
+        their response headers instead.
+        """
+        if outcome == DROPPED:
+            self.dropped += 1
+            self._decrease(slot)
+        elif outcome == OK:
+            if latency is None:
+                latency = time.monotonic() - slot.started
+            self._sample(slot, latency)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # The limit may have grown, so hand out every slot that is free
+        while self._waiters and self.available > 0:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _sample(self, slot: Slot, latency: float) -> None:
+        latency = max(latency, _MIN_LATENCY)
+        self.samples += 1
+        self.last_latency = latency
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Drift up slowly, so a lasting change in service time is
+            # accepted in the end but a queue building up is not
+            self.baseline += self._baseline_alpha * (latency - self.baseline)
+
+        congested = latency > self.tolerance * self.baseline
+        # Mostly idle slots cannot tell whether more load would be fine
+        utilized = 2 * slot.in_flight >= self.limit
+
+        if self.algorithm == "aimd":
+            if congested:
+                self._decrease(slot)
+            elif utilized:
+                self._set_limit(self.limit + 1 / self.limit)
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline / latency))
+        if gradient >= 1 and not utilized:
+            return
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self._set_limit(self.limit + self.smoothing * (target - self.limit))
+
+    def _decrease(self, slot: Slot) -> None:
+        # One cut per round trip: calls that were already running when the
+        # limit last fell reflect the old load, not the new limit
+        if slot.started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._set_limit(self.limit * self.backoff_ratio)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        self._wake()
+
+    def _reject(self):
+        self.rejected += 1
+        LIMITER_REJECTED.inc(model=self.model)
+        raise ServiceUnavailableException(
+            message="The model server is at capacity. Please retry shortly.",
+            error_code=ErrorCode.SYS_OVERLOADED,
+            details={"model": self.model, "reason": "upstream_limit"},
+            retry_after=self.retry_after_seconds,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "algorithm": self.algorithm,
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "baseline_ms": None if self.baseline is None else self.baseline * 1000,
+            "last_latency_ms": (
+                None if self.last_latency is None else self.last_latency * 1000
+            ),
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+limiters: dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(model: str) -> AdaptiveLimiter | None:
+    """The model's limiter, or None when UPSTREAM_LIMIT_ALGORITHM is "off"."""
+    if settings.UPSTREAM_LIMIT_ALGORITHM == "off":
+        return None
+    limiter = limiters.get(model)
+    if limiter is None:
+        limiter = limiters[model] = AdaptiveLimiter(
+            model,
+            algorithm=settings.UPSTREAM_LIMIT_ALGORITHM,
+            initial_limit=settings.UPSTREAM_LIMIT_INITIAL,
+            min_limit=settings.UPSTREAM_LIMIT_MIN,
+            max_limit=settings.UPSTREAM_LIMIT_MAX,
+            tolerance=settings.UPSTREAM_LIMIT_TOLERANCE,
+            backoff_ratio=settings.UPSTREAM_LIMIT_BACKOFF_RATIO,
+            queue_timeout_ms=settings.UPSTREAM_LIMIT_QUEUE_TIMEOUT_MS,
+        )
+    return limiter
+
+
+LIMITER_REJECTED = Counter(
+    "upstream_limiter_rejected_total",
+    "Upstream calls shed after waiting too long for a concurrency slot.",
+    ("model",),
+)
+LIMITER_WAIT = Histogram(
+    "upstream_limiter_queue_seconds",
+    "Time upstream calls spent queued for a concurrency slot, by model.",
+    ("model",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+registry.register(
+    LIMITER_REJECTED,
+    LIMITER_WAIT,
+    Gauge(
+        "upstream_concurrency_limit",
+        "Current adaptive limit on in-flight upstream calls, by model.",
+        ("model",),
+        fn=lambda: {(model,): lim.limit for model, lim in limiters.items()},
+    ),
+    Gauge(
+        "upstream_concurrency_in_flight",
+        "Upstream calls holding a concurrency slot, by model.",
+        ("model",),
+        fn=lambda: {(model,): lim.in_flight for model, lim in limiters.items()},
+    ),
+    Gauge(
+        "upstream_concurrency_queued",
+        "Upstream calls waiting for a concurrency slot, by model.",
+        ("model",),
+        fn=lambda: {(model,): lim.queued for model, lim in limiters.items()},
+    ),
+)
@@ -0,0 +1,111 @@
+"""
+Per-request deadlines.
+
+A client may send X-Request-Timeout (seconds) with its remaining budget;
+REQUEST_DEFAULT_TIMEOUT_SECONDS applies otherwise, and both are capped at
+REQUEST_MAX_TIMEOUT_SECONDS. TimedRoute (app/api/routing.py) opens a
+scope() for each request, stops the endpoint when the budget runs out and
+fails fast with SYS_DEADLINE_EXCEEDED when it is spent on arrival.
+
+Inside the scope, upstream calls take their timeouts from the remaining
+budget (client_timeout) and retries that could not finish in time are not
+started. Streaming bodies keep the expiry() they started with and end
+in-band once it passes. Work shared between requests (coalesced calls,
+micro-batches) runs detached() from any one caller's deadline; each caller
+still stops waiting at its own.
+"""
+
+import math
+import time
+from collections.abc import Awaitable
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+from app.config import settings
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import GatewayTimeoutException, ValidationException
+
+HEADER = "X-Request-Timeout"
+
+# time.monotonic() value after which the current request is abandoned
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def parse(value: str | None) -> float | None:
+    """The budget in seconds from a header value, with defaults and caps."""
+    if value is None:
+        seconds = settings.REQUEST_DEFAULT_TIMEOUT_SECONDS
+        return seconds if seconds > 0 else None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        raise ValidationException(
+            message=f"{HEADER} must be a number of seconds.",
+            error_code=ErrorCode.VAL_REQUEST_INVALID,
+            details={"header": HEADER, "value": value},
+        )
+    return min(seconds, settings.REQUEST_MAX_TIMEOUT_SECONDS)
+
+
+@contextmanager
+def scope(seconds: float | None):
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def expiry() -> float | None:
+    """
+    The current deadline as a time.monotonic() value, or None. For work that
+    outlives the scope, like a streaming body sent after the handler returns.
+    """
+    return _deadline.get()
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def exceeded() -> GatewayTimeoutException:
+    return GatewayTimeoutException(
+        message="The request deadline was exceeded.",
+        error_code=ErrorCode.SYS_DEADLINE_EXCEEDED,
+    )
+
+
+def check() -> None:
+    """Fail fast if the budget is already spent."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise exceeded()
+
+
+def client_timeout(timeout: httpx.Timeout) -> httpx.Timeout | None:
+    """The client's timeouts each cut to the remaining budget; None without one."""
+    left = remaining()
+    if left is None:
+        return None
+    left = max(left, 0.001)
+    return httpx.Timeout(
+        connect=min(timeout.connect or left, left),
+        read=min(timeout.read or left, left),
+        write=min(timeout.write or left, left),
+        pool=min(timeout.pool or left, left),
+    )
+
+
+async def detached(awaitable: Awaitable):
+    """Await work shared by several requests without the caller's deadline."""
+    token = _deadline.set(None)
+    try:
+        return await awaitable
+    finally:
+        _deadline.reset(token)
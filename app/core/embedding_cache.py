@@ -0,0 +1,107 @@
+"""
+In-process embedding cache.
+
+Vectors are stored as float32 NumPy arrays keyed by (model, hash of text),
+so the cache never holds the raw text and each 512-d entry costs ~2 KB
+instead of a list of boxed Python floats. Stored arrays are read-only and
+returned without copying; callers that need to modify one copy it first.
+Entries expire after a TTL and the least recently used ones are evicted
+once the byte budget is exceeded.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry cost of the key, OrderedDict slot and array header, so the
+# budget tracks real memory rather than just vector payloads.
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class EmbeddingCache:
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, bytes], tuple[np.ndarray, float]] = (
+            OrderedDict()
+        )
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> tuple[str, bytes]:
+        return model, hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def get(self, model: str, text: str) -> np.ndarray | None:
+        key = self.make_key(model, text)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        vector, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, model: str, text: str, vector: np.ndarray) -> None:
+        # Always copy: a row view would keep its whole batch matrix alive.
+        # The copy is read-only because get() hands out the stored array
+        # itself, and an in-place edit by one caller would reach every
+        # later hit
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        size = vector.nbytes + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        key = self.make_key(model, text)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (vector, time.monotonic() + self.ttl_seconds)
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: tuple[str, bytes]) -> None:
+        vector, _ = self._entries.pop(key)
+        self.bytes -= vector.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,260 @@
+"""
+Wire encodings for embedding vectors.
+
+"float" is the original JSON list of numbers. "base64" packs the vector as
+little-endian bytes inside the JSON body. "binary" is an
+application/octet-stream body: a 16-byte header followed by the raw matrix.
+
+Besides float32 and float16, vectors can be sent quantized (see
+app/core/quantization.py): "int8" codes with a float32 scale per vector,
+or "binary", sign bits packed into ceil(dim / 8) bytes. In JSON bodies
+the int8 scale travels in a separate "scale" field; with the "float"
+format quantized vectors are lists of ints (packed bytes for binary).
+
+Binary header (little-endian, struct "<4sBBHII"):
+    magic    4s   b"EMBV"
+    version  u8   1
+    dtype    u8   0 = float32, 1 = float16, 2 = int8, 3 = binary
+    reserved u16  0
+    rows     u32
+    dim      u32  vector dimension (bits, not bytes, for binary)
+For int8 the matrix is followed by `rows` float32 scales.
+
+The streaming bulk endpoint instead sends a sequence of length-prefixed
+records, so a client can decode each one as it arrives. Each record is a
+12-byte header (struct "<BxxxII") followed by `length` bytes:
+    kind     u8   dtype code as in the binary header, or 255 = error
+    padding  3 bytes
+    index    u32  line number of the input text (blank lines not counted)
+    length   u32  payload size in bytes
+An int8 payload starts with its float32 scale. An error payload is the
+UTF-8 JSON {"code": ..., "message": ...}.
+"""
+
+import base64
+import json
+import struct
+
+import numpy as np
+
+from app.core import quantization
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BINARY_MAGIC = b"EMBV"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sBBHII")
+RECORD_HEADER = struct.Struct("<BxxxII")
+RECORD_ERROR = 255
+
+# dtype name -> (little-endian NumPy dtype on the wire, header code)
+DTYPES = {
+    "float32": ("<f4", 0),
+    "float16": ("<f2", 1),
+    "int8": ("i1", 2),
+    "binary": ("u1", 3),
+}
+_DTYPE_BY_CODE = {code: np_dtype for np_dtype, code in DTYPES.values()}
+_INT8, _PACKED = DTYPES["int8"][1], DTYPES["binary"][1]
+
+
+def to_wire(
+    matrix: np.ndarray, dtype: str = "float32", dimensions: int | None = None
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Convert an (n, dim) float matrix to its wire dtype, truncating it to
+    `dimensions` first if given. Returns (rows, scales); scales is the
+    float32 scale per row for int8 and None otherwise. NaN rows (failed
+    items) get a NaN scale in int8 and all-zero bits in binary.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dimensions is not None:
+        matrix = quantization.truncate(matrix, dimensions)
+    if dtype == "int8":
+        codes, scales = quantization.quantize_int8(np.nan_to_num(matrix))
+        scales[np.isnan(matrix).any(axis=-1)] = np.nan
+        return codes, scales
+    if dtype == "binary":
+        return quantization.pack_bits(matrix), None
+    return matrix.astype(DTYPES[dtype][0], copy=False), None
+
+
+def _encode_row(row: np.ndarray, encoding_format: str):
+    if encoding_format == "base64":
+        return base64.b64encode(row.tobytes()).decode()
+    return row.tolist()
+
+
+def encode_embedding(
+    vector: np.ndarray,
+    encoding_format: str,
+    dtype: str = "float32",
+    dimensions: int | None = None,
+) -> dict:
+    """Encode one vector for a JSON body as {"embedding", "scale"}."""
+    if encoding_format == "float" and dtype not in quantization.QUANTIZED_DTYPES:
+        # Plain JSON numbers; float16 only changes the packed encodings
+        dtype = "float32"
+    rows, scales = to_wire(np.asarray(vector)[np.newaxis], dtype, dimensions)
+    return {
+        "embedding": _encode_row(rows[0], encoding_format),
+        "scale": float(scales[0]) if scales is not None else None,
+    }
+
+
+def encode_binary(
+    matrix: np.ndarray, dtype: str = "float32", dimensions: int | None = None
+) -> bytes:
+    """Encode an (n, dim) matrix as header + raw little-endian bytes."""
+    rows, scales = to_wire(matrix, dtype, dimensions)
+    count, dim = len(rows), dimensions or matrix.shape[-1]
+    header = BINARY_HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION, DTYPES[dtype][1], 0, count, dim
+    )
+    body = header + np.ascontiguousarray(rows).tobytes()
+    if scales is not None:
+        body += scales.astype("<f4").tobytes()
+    return body
+
+
+def decode_base64(payload: str, dtype: str = "float32") -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload), dtype=DTYPES[dtype][0])
+
+
+def _binary_layout(payload: bytes) -> tuple[int, int, int, int]:
+    magic, version, code, _, rows, dim = BINARY_HEADER.unpack_from(payload)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Not an embedding payload")
+    width = (dim + 7) // 8 if code == _PACKED else dim
+    return code, rows, dim, width
+
+
+def decode_binary(payload: bytes) -> np.ndarray:
+    """
+    Inverse of encode_binary; returns a read-only (n, dim) view of payload.
+    Quantized payloads give int8 codes (see decode_binary_scales) or
+    (n, ceil(dim / 8)) packed bytes.
+    """
+    code, rows, _, width = _binary_layout(payload)
+    return np.frombuffer(
+        payload,
+        dtype=_DTYPE_BY_CODE[code],
+        count=rows * width,
+        offset=BINARY_HEADER.size,
+    ).reshape(rows, width)
+
+
+def decode_binary_scales(payload: bytes) -> np.ndarray | None:
+    """The per-row scales of an int8 payload, None for other dtypes."""
+    code, rows, _, width = _binary_layout(payload)
+    if code != _INT8:
+        return None
+    return np.frombuffer(
+        payload, dtype="<f4", count=rows, offset=BINARY_HEADER.size + rows * width
+    )
+
+
+def encode_batch_items(
+    data: list[dict],
+    encoding_format: str,
+    dtype: str = "float32",
+    dimensions: int | None = None,
+) -> list[dict]:
+    """
+    Encode the "embedding" of each batch item for a JSON body. Truncation
+    and quantization run once over the matrix of successful items; int8
+    items also get their "scale".
+    """
+    ok = [i for i, item in enumerate(data) if item["embedding"] is not None]
+    encoded = list(data)
+    if not ok:
+        return encoded
+    if encoding_format == "float" and dtype not in quantization.QUANTIZED_DTYPES:
+        dtype = "float32"
+    matrix = np.asarray([data[i]["embedding"] for i in ok], dtype=np.float32)
+    rows, scales = to_wire(matrix, dtype, dimensions)
+    for n, i in enumerate(ok):
+        item = {**data[i], "embedding": _encode_row(rows[n], encoding_format)}
+        if scales is not None:
+            item["scale"] = float(scales[n])
+        encoded[i] = item
+    return encoded
+
+
+def encode_ndjson(
+    data: list[dict],
+    encoding_format: str,
+    dtype: str = "float32",
+    dimensions: int | None = None,
+) -> bytes:
+    """Encode batch items as NDJSON, one item per line."""
+    items = encode_batch_items(data, encoding_format, dtype, dimensions)
+    return "".join(json.dumps(item) + "\n" for item in items).encode()
+
+
+def encode_batch_binary(
+    data: list[dict], dim: int, dtype: str = "float32", dimensions: int | None = None
+) -> tuple[bytes, list[dict]]:
+    """
+    Encode batch items as one binary matrix.
+
+    Failed items become NaN rows (a NaN scale for int8, zero bits for
+    binary); their errors are returned separately so the caller can send
+    them alongside the body.
+    """
+    matrix = np.full((len(data), dim), np.nan, dtype=np.float32)
+    errors = []
+    for item in data:
+        if item["error"] is None:
+            matrix[item["index"]] = item["embedding"]
+        else:
+            errors.append({"index": item["index"], **item["error"]})
+    return encode_binary(matrix, dtype, dimensions), errors
+
+
+def encode_records(
+    data: list[dict], dtype: str = "float32", dimensions: int | None = None
+) -> bytes:
+    """Encode batch items as length-prefixed records, in the order given."""
+    code = DTYPES[dtype][1]
+    ok = [item["embedding"] for item in data if item["error"] is None]
+    if ok:
+        rows, scales = to_wire(ok, dtype, dimensions)
+    row = 0
+
+    parts = []
+    for item in data:
+        if item["error"] is None:
+            kind = code
+            payload = rows[row].tobytes()
+            if scales is not None:
+                payload = scales[row : row + 1].astype("<f4").tobytes() + payload
+            row += 1
+        else:
+            kind = RECORD_ERROR
+            payload = json.dumps(item["error"]).encode()
+        parts.append(RECORD_HEADER.pack(kind, item["index"], len(payload)))
+        parts.append(payload)
+    return b"".join(parts)
+
+
+def decode_records(payload: bytes) -> list[tuple[int, np.ndarray | dict]]:
+    """
+    Inverse of encode_records: (index, vector or error dict) per record.
+    int8 vectors are dequantized to float32; binary ones stay packed bytes.
+    """
+    records = []
+    offset = 0
+    while offset < len(payload):
+        kind, index, length = RECORD_HEADER.unpack_from(payload, offset)
+        offset += RECORD_HEADER.size
+        body = payload[offset : offset + length]
+        offset += length
+        if kind == RECORD_ERROR:
+            records.append((index, json.loads(body)))
+        elif kind == _INT8:
+            scale = np.frombuffer(body, dtype="<f4", count=1)[0]
+            codes = np.frombuffer(body, dtype=np.int8, offset=4)
+            records.append((index, codes.astype(np.float32) * scale))
+        else:
+            records.append((index, np.frombuffer(body, dtype=_DTYPE_BY_CODE[kind])))
+    return records
@@ -4,9 +4,19 @@ from enum import Enum
 class ErrorCode(str, Enum):
     # Validation
     VAL_REQUEST_INVALID = "VAL_REQUEST_001"
+    VAL_BATCH_TOO_LARGE = "VAL_BATCH_001"
+    VAL_INPUT_EMPTY = "VAL_INPUT_001"
+    VAL_INPUT_TOO_LONG = "VAL_INPUT_002"
+    VAL_VECTOR_DIM_MISMATCH = "VAL_VECTOR_001"
 
     # Resources
     RES_USER_NOT_FOUND = "RES_USER_001"
+    RES_COLLECTION_NOT_FOUND = "RES_COLLECTION_001"
+    RES_JOB_NOT_FOUND = "RES_JOB_001"
+    RES_EMBEDDING_NOT_FOUND = "RES_EMBEDDING_001"
 
     # System
     SYS_INTERNAL_ERROR = "SYS_001"
+    SYS_OVERLOADED = "SYS_002"
+    SYS_UPSTREAM_UNAVAILABLE = "SYS_003"
+    SYS_DEADLINE_EXCEEDED = "SYS_004"
@@ -12,3 +12,19 @@ class ValidationException(AppException):
 
 class ResourceNotFoundException(AppException):
     pass
+
+
+class ServiceUnavailableException(AppException):
+    def __init__(
+        self,
+        message: str,
+        error_code: str,
+        details: dict = None,
+        retry_after: int | None = None,
+    ):
+        super().__init__(message, error_code, details)
+        self.retry_after = retry_after
+
+
+class GatewayTimeoutException(AppException):
+    pass
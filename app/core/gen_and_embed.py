@@ -1,17 +1,65 @@
-import httpx
+import asyncio
+import copy
+import json
 import uuid
 import time
+import httpx
 import numpy as np
 
-HTTPBIN_URL = "https://httpbin.org/post"
+from app.config import settings
+from app.core import (
+    balancer,
+    chunking,
+    concurrency,
+    deadline,
+    ndjson,
+    offload,
+    resilience,
+    upstream,
+)
+from app.core.batching import MicroBatcher
+from app.core.embedding_cache import EmbeddingCache
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import (
+    AppException,
+    ServiceUnavailableException,
+    ValidationException,
+)
+from app.core.metrics import Counter, Gauge, Histogram, registry
+from app.core.semantic_cache import SemanticCache
+from app.core.singleflight import SingleFlight
 
+# Default upstream when no per-model backends are configured
+HTTPBIN_URL = settings.UPSTREAM_URL
 
-async def run_generation_task(query: str):
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.post(
-            HTTPBIN_URL, json={"model": "mock-gemma3:4b", "prompt": query}
+GENERATION_MODEL = "mock-gemma3:4b"
+EMBEDDING_MODEL = "mock-embeddinggemma"
+EMBEDDING_DIM = 512
+
+
+def _backend_pool(name: str, urls: str) -> balancer.BackendPool:
+    return balancer.register_pool(
+        balancer.BackendPool(
+            name,
+            balancer.parse_urls(urls, HTTPBIN_URL),
+            strategy=settings.UPSTREAM_LB_STRATEGY,
+            eject_failures=settings.UPSTREAM_EJECT_FAILURES,
+            eject_seconds=settings.UPSTREAM_EJECT_SECONDS,
+            slow_start_seconds=settings.UPSTREAM_SLOW_START_SECONDS,
         )
-    response.raise_for_status()
+    )
+
+
+# Separate replica sets, so embedding load never queues behind generation
+generation_pool = _backend_pool("generate", settings.UPSTREAM_GENERATE_URLS)
+embedding_pool = _backend_pool("embed", settings.UPSTREAM_EMBED_URLS)
+
+
+async def _generate_upstream(query: str):
+    payload = {"model": GENERATION_MODEL, "prompt": query}
+    response = await resilience.get_policy(GENERATION_MODEL).call(
+        lambda: generation_pool.post(GENERATION_MODEL, json=payload)
+    )
     data = response.json()
 
     # httpbin echoes your JSON under "json"
@@ -22,7 +70,7 @@ async def run_generation_task(query: str):
         "id": str(uuid.uuid4()),
         "object": "chat.completion",
         "created": int(time.time()),
-        "model": "mock-gemma3:4b",
+        "model": GENERATION_MODEL,
         "choices": [
             {
                 "index": 0,
@@ -36,23 +84,571 @@ async def run_generation_task(query: str):
     }
 
 
-async def run_embedding_task(text: str):
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.post(
-            HTTPBIN_URL, json={"model": "mock-embeddinggemma", "input": text}
+# Identical concurrent prompts share one upstream call
+generation_flight = SingleFlight()
+
+
+async def run_generation_task(query: str):
+    if not settings.GENERATE_COALESCE:
+        return await _generate_upstream(query)
+
+    # The shared call outlives any one caller's deadline; each caller
+    # still stops waiting at its own (see app/core/deadline.py)
+    result = await generation_flight.do(
+        (GENERATION_MODEL, query),
+        lambda: deadline.detached(_generate_upstream(query)),
+    )
+    # Coalesced callers share one result object; give each its own copy
+    return copy.deepcopy(result)
+
+
+async def _generate_batch_item(index: int, query: str) -> dict:
+    try:
+        result = await run_generation_task(query)
+    except AppException as exc:
+        error = {"code": exc.error_code, "message": exc.message}
+    except Exception:
+        error = {
+            "code": ErrorCode.SYS_INTERNAL_ERROR,
+            "message": "Generation failed. Please try again later.",
+        }
+    else:
+        content = result["choices"][0]["message"]["content"]
+        return {"index": index, "response": content, "error": None}
+    return {"index": index, "response": None, "error": error}
+
+
+async def iter_batch_generation(queries: list[str]):
+    """
+    Generate every query, yielding {"index", "response", "error"} items in
+    completion order.
+
+    At most GENERATE_BATCH_CONCURRENCY queries are in flight at once; a
+    failed query becomes an item with an "error" entry and the rest carry
+    on. Closing the generator early cancels whatever is still running.
+    """
+    if len(queries) > settings.GENERATE_MAX_BATCH_SIZE:
+        raise ValidationException(
+            message=f"Batch size exceeds {settings.GENERATE_MAX_BATCH_SIZE} items.",
+            error_code=ErrorCode.VAL_BATCH_TOO_LARGE,
+            details={"max_batch_size": settings.GENERATE_MAX_BATCH_SIZE},
+        )
+
+    finished: asyncio.Queue[dict] = asyncio.Queue()
+    pending = iter(enumerate(queries))
+
+    async def worker():
+        # Workers share one iterator, so each query is taken exactly once
+        for index, query in pending:
+            finished.put_nowait(await _generate_batch_item(index, query))
+
+    concurrency = max(1, min(settings.GENERATE_BATCH_CONCURRENCY, len(queries)))
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for _ in queries:
+            yield await finished.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def run_batch_generation_task(queries: list[str]):
+    """Generate every query, returning the items in input order."""
+    data = [None] * len(queries)
+    async for item in iter_batch_generation(queries):
+        data[item["index"]] = item
+    return {
+        "object": "list",
+        "model": GENERATION_MODEL,
+        "data": data,
+    }
+
+
+def _completion_chunk(
+    completion_id: str, created: int, delta: dict, finish_reason: str | None = None
+) -> dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": GENERATION_MODEL,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+async def stream_generation_task(query: str):
+    """
+    Yield OpenAI-style chat.completion.chunk dicts as the upstream produces text.
+
+    Upstreams that stream NDJSON (Ollama-style {"response": ..., "done": ...}
+    lines) are relayed line by line without buffering the body. Upstreams
+    that only return one JSON document, like httpbin, yield a single delta.
+    """
+    completion_id = str(uuid.uuid4())
+    created = int(time.time())
+
+    # Streams get the circuit breaker and a concurrency slot but no retries
+    # or hedging: once the first chunk is out, a second attempt could not
+    # be spliced in
+    policy = resilience.get_policy(GENERATION_MODEL)
+    policy.check()
+    client = upstream.get_client()
+    # The body is sent after the handler returns, outside the request's
+    # deadline scope, so keep its expiry here
+    expires = deadline.expiry()
+    options = {}
+    timeout = deadline.client_timeout(client.timeout)
+    if timeout is not None:
+        options["timeout"] = timeout
+
+    def check_deadline():
+        if expires is not None and time.monotonic() >= expires:
+            raise deadline.exceeded()
+
+    limiter = policy.limiter
+    slot = await limiter.acquire() if limiter is not None else None
+    outcome, latency = concurrency.IGNORED, None
+    try:
+        with (
+            generation_pool.lease() as backend,
+            upstream.timed(GENERATION_MODEL) as timing,
+        ):
+            async with client.stream(
+                "POST",
+                backend.url,
+                json={"model": GENERATION_MODEL, "prompt": query, "stream": True},
+                **options,
+            ) as response:
+                timing.stop(response.status_code)
+                if slot is not None:
+                    latency = time.monotonic() - slot.started
+                generation_pool.record_status(backend, response.status_code)
+                response.raise_for_status()
+                policy.record_success()
+                yield _completion_chunk(completion_id, created, {"role": "assistant"})
+                yield _completion_chunk(
+                    completion_id, created, {"content": "Processed remotely: "}
+                )
+
+                if "ndjson" in response.headers.get("content-type", ""):
+                    async for line in response.aiter_lines():
+                        check_deadline()
+                        if not line.strip():
+                            continue
+                        part = json.loads(line)
+                        if part.get("response"):
+                            yield _completion_chunk(
+                                completion_id, created, {"content": part["response"]}
+                            )
+                        if part.get("done"):
+                            break
+                else:
+                    await response.aread()
+                    answer = response.json()["json"]["prompt"]
+                    yield _completion_chunk(completion_id, created, {"content": answer})
+        outcome = concurrency.OK
+    except httpx.HTTPError as exc:
+        if resilience.is_overload(exc):
+            outcome = concurrency.DROPPED
+        policy.record_error(exc)
+        if isinstance(exc, httpx.TimeoutException):
+            # The read timeout was cut to the budget; report which ran out
+            check_deadline()
+        raise
+    finally:
+        if slot is not None:
+            limiter.release(slot, outcome, latency)
+
+    yield _completion_chunk(completion_id, created, {}, finish_reason="stop")
+
+
+def build_embeddings(texts: list[str]) -> np.ndarray:
+    """
+    Build deterministic fake embeddings as one (n, EMBEDDING_DIM) array.
+
+    Each vector comes from its own np.random.Generator seeded by the text
+    length, so no global RNG state is touched and the function is safe to
+    run from worker threads or processes. Only one row per distinct length
+    is generated; the rest are filled by fancy indexing.
+    """
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    unique_lengths, inverse = np.unique(lengths, return_inverse=True)
+
+    rows = np.empty((len(unique_lengths), EMBEDDING_DIM), dtype=np.float32)
+    for i, length in enumerate(unique_lengths):
+        rows[i] = np.random.default_rng(length).random(EMBEDDING_DIM, np.float32)
+    return rows[inverse]
+
+
+async def _embed_upstream(texts: list[str]) -> np.ndarray:
+    """Embed a list of texts with one upstream call; returns an (n, 512) array."""
+    payload = {"model": EMBEDDING_MODEL, "input": texts}
+    response = await resilience.get_policy(EMBEDDING_MODEL).call(
+        lambda: embedding_pool.post(EMBEDDING_MODEL, json=payload)
+    )
+    echoed_texts = response.json()["json"]["input"]
+    if not isinstance(echoed_texts, list) or len(echoed_texts) != len(texts):
+        # Rows are matched to texts by position, so a short or long answer
+        # cannot be used at all
+        raise ServiceUnavailableException(
+            message="The model server returned a malformed response.",
+            error_code=ErrorCode.SYS_UPSTREAM_UNAVAILABLE,
+            details={
+                "model": EMBEDDING_MODEL,
+                "expected_rows": len(texts),
+                "received_rows": (
+                    len(echoed_texts) if isinstance(echoed_texts, list) else None
+                ),
+            },
         )
+    return await offload.run_cpu(build_embeddings, echoed_texts, rows=len(texts))
+
+
+async def _flush_embedding_batch(texts: list[str]) -> list[np.ndarray]:
+    return list(await _embed_upstream(texts))
+
+
+# Coalesces concurrent single-text /embed calls into one upstream request.
+# Disabled (window of 0 ms) unless EMBED_BATCH_WINDOW_MS is set.
+embedding_batcher = MicroBatcher(
+    _flush_embedding_batch,
+    max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=settings.EMBED_BATCH_WINDOW_MS,
+    name="embed_batcher",
+)
+
+
+# Keyed by model + text hash; 0 bytes disables it
+embedding_cache = EmbeddingCache(
+    max_bytes=settings.EMBED_CACHE_MAX_BYTES,
+    ttl_seconds=settings.EMBED_CACHE_TTL_SECONDS,
+)
 
-    response.raise_for_status()
+registry.register(
+    *embedding_batcher.metrics,
+    Counter(
+        "embed_cache_events_total",
+        "Embedding cache lookups and removals by outcome.",
+        ("event",),
+        fn=lambda: {
+            (event,): getattr(embedding_cache, event)
+            for event in ("hits", "misses", "evictions", "expirations")
+        },
+    ),
+    Gauge(
+        "embed_cache_bytes",
+        "Approximate memory held by the embedding cache.",
+        fn=lambda: embedding_cache.bytes,
+    ),
+    Counter(
+        "generate_calls_total",
+        "Generation calls that ran upstream or joined an in-flight call.",
+        ("outcome",),
+        fn=lambda: {
+            ("executed",): generation_flight.executed,
+            ("coalesced",): generation_flight.coalesced,
+        },
+    ),
+)
+
+
+async def _embed_one(text: str) -> np.ndarray:
+    if embedding_batcher.max_wait_ms > 0:
+        return await embedding_batcher.submit(text)
+
+    payload = {"model": EMBEDDING_MODEL, "input": text}
+    response = await resilience.get_policy(EMBEDDING_MODEL).call(
+        lambda: embedding_pool.post(EMBEDDING_MODEL, json=payload)
+    )
     data = response.json()
 
     echoed_text = data["json"]["input"]
 
     # Generate deterministic fake embedding from text length
-    np.random.seed(len(echoed_text))
-    embedding = np.random.rand(512).tolist()
+    return build_embeddings([echoed_text])[0]
+
 
+async def run_embedding_task(text: str, use_cache: bool = True):
+    use_cache = use_cache and embedding_cache.enabled
+    vector = embedding_cache.get(EMBEDDING_MODEL, text) if use_cache else None
+
+    if vector is None:
+        vector = await _embed_one(text)
+        if use_cache:
+            embedding_cache.put(EMBEDDING_MODEL, text, vector)
+
+    # Left as a float32 array; the router picks the wire encoding
     return {
         "object": "embedding",
-        "model": "mock-embeddinggemma",
-        "embedding": embedding,
+        "model": EMBEDDING_MODEL,
+        "embedding": vector,
     }
+
+
+async def run_chunked_embedding_task(
+    text: str, unit: str, size: int, overlap: int, pooling: str
+):
+    """
+    Embed a long text as overlapping windows (see app/core/chunking.py).
+
+    Chunks go upstream in batches of up to EMBED_MAX_BATCH_SIZE, all at
+    once, so latency stays near that of a single call. With pooling
+    "mean" or "weighted_mean" (by chunk length in characters) the chunk
+    vectors are also pooled into one document vector; with "none" the
+    document "embedding" is None.
+    """
+    # Count before splitting, so an oversized text is rejected cheaply
+    max_chunks = settings.EMBED_MAX_CHUNKS
+    count = chunking.count_windows(text, unit, size, overlap, max_chunks)
+    if not count:
+        raise ValidationException(
+            message="Text is empty.", error_code=ErrorCode.VAL_INPUT_EMPTY
+        )
+    if count > max_chunks:
+        raise ValidationException(
+            message=f"Text splits into more than {max_chunks} chunks.",
+            error_code=ErrorCode.VAL_INPUT_TOO_LONG,
+            details={"max_chunks": max_chunks},
+        )
+    spans = chunking.split(text, unit, size, overlap)
+
+    texts = [text[start:end] for start, end in spans]
+    step = settings.EMBED_MAX_BATCH_SIZE
+    parts = await asyncio.gather(
+        *(_embed_upstream(texts[i : i + step]) for i in range(0, len(texts), step))
+    )
+    matrix = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    pooled = None
+    if pooling != "none":
+        lengths = np.fromiter((end - start for start, end in spans), np.float32)
+        pooled = chunking.pool(matrix, pooling, lengths)
+    return {
+        "object": "embedding",
+        "model": EMBEDDING_MODEL,
+        "embedding": pooled,
+        "chunks": [
+            {"index": i, "start": start, "end": end, "embedding": matrix[i]}
+            for i, (start, end) in enumerate(spans)
+        ],
+    }
+
+
+# Reuses completions of earlier, similar queries; a size of 0 disables it
+semantic_cache = SemanticCache(
+    capacity=settings.GENERATE_SEMANTIC_CACHE_SIZE,
+    threshold=settings.GENERATE_SEMANTIC_CACHE_THRESHOLD,
+    dim=EMBEDDING_DIM,
+)
+
+
+async def run_semantic_generation_task(query: str) -> tuple[dict, bool]:
+    """
+    run_generation_task behind the semantic cache; returns (result, hit).
+
+    The query is embedded through run_embedding_task, so the embedding
+    cache and micro-batching apply. If embedding fails the query is still
+    answered, just without the cache.
+    """
+    start = time.perf_counter()
+    try:
+        vector = (await run_embedding_task(query))["embedding"]
+    except Exception:
+        SEMANTIC_LOOKUPS.inc(model=GENERATION_MODEL, outcome="error")
+        return await run_generation_task(query), False
+
+    cached, _ = semantic_cache.get(GENERATION_MODEL, vector)
+    SEMANTIC_LOOKUP_LATENCY.observe(time.perf_counter() - start, model=GENERATION_MODEL)
+    if cached is not None:
+        SEMANTIC_LOOKUPS.inc(model=GENERATION_MODEL, outcome="hit")
+        return copy.deepcopy(cached), True
+
+    SEMANTIC_LOOKUPS.inc(model=GENERATION_MODEL, outcome="miss")
+    result = await run_generation_task(query)
+    semantic_cache.put(GENERATION_MODEL, vector, copy.deepcopy(result))
+    return result, False
+
+
+SEMANTIC_LOOKUPS = Counter(
+    "semantic_cache_lookups_total",
+    "Semantic cache lookups by model and outcome: hit, miss or error.",
+    ("model", "outcome"),
+)
+SEMANTIC_LOOKUP_LATENCY = Histogram(
+    "semantic_cache_lookup_seconds",
+    "Time to embed the query and search the semantic cache.",
+    ("model",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+registry.register(
+    SEMANTIC_LOOKUPS,
+    SEMANTIC_LOOKUP_LATENCY,
+    Gauge(
+        "semantic_cache_entries",
+        "Queries held in the semantic cache, by model.",
+        ("model",),
+        fn=lambda: {(model,): n for model, n in semantic_cache.entries().items()},
+    ),
+)
+
+
+def _validate_batch_item(text: str) -> dict | None:
+    if not text.strip():
+        return {"code": ErrorCode.VAL_INPUT_EMPTY, "message": "Text is empty."}
+    if len(text) > settings.EMBED_MAX_TEXT_CHARS:
+        return {
+            "code": ErrorCode.VAL_INPUT_TOO_LONG,
+            "message": f"Text exceeds {settings.EMBED_MAX_TEXT_CHARS} characters.",
+        }
+    return None
+
+
+async def run_batch_embedding_task(texts: list[str]):
+    """
+    Embed many texts with a single upstream call.
+
+    Invalid items are reported in place with an "error" entry instead of
+    failing the whole batch; only the valid ones are sent upstream.
+    """
+    if len(texts) > settings.EMBED_MAX_BATCH_SIZE:
+        raise ValidationException(
+            message=f"Batch size exceeds {settings.EMBED_MAX_BATCH_SIZE} items.",
+            error_code=ErrorCode.VAL_BATCH_TOO_LARGE,
+            details={"max_batch_size": settings.EMBED_MAX_BATCH_SIZE},
+        )
+
+    data = [{"index": i, "embedding": None, "error": None} for i in range(len(texts))]
+    valid = []
+    for i, text in enumerate(texts):
+        error = _validate_batch_item(text)
+        if error is None:
+            valid.append(i)
+        else:
+            data[i]["error"] = error
+
+    if valid:
+        # One (n, 512) matrix; each item gets a row view of it
+        vectors = await _embed_upstream([texts[i] for i in valid])
+        for i, vector in zip(valid, vectors):
+            data[i]["embedding"] = vector
+
+    return {
+        "object": "list",
+        "model": EMBEDDING_MODEL,
+        "data": data,
+    }
+
+
+def _parse_bulk_line(line: bytes | None) -> tuple[str | None, str | None, dict | None]:
+    """Parse one bulk input line into (id, text, error)."""
+    if line is None:
+        return (
+            None,
+            None,
+            {
+                "code": ErrorCode.VAL_INPUT_TOO_LONG,
+                "message": f"Text exceeds {settings.EMBED_MAX_TEXT_CHARS} characters.",
+            },
+        )
+    try:
+        value = json.loads(line)
+    except ValueError:
+        value = None
+    if isinstance(value, str):
+        return None, value, _validate_batch_item(value)
+    if isinstance(value, dict) and isinstance(value.get("text"), str):
+        item_id = value.get("id")
+        item_id = None if item_id is None else str(item_id)
+        return item_id, value["text"], _validate_batch_item(value["text"])
+    return (
+        None,
+        None,
+        {
+            "code": ErrorCode.VAL_REQUEST_INVALID,
+            "message": 'Line must be a JSON string or an object with a "text" field.',
+        },
+    )
+
+
+async def _embed_bulk_batch(data: list[dict], texts: list[str]) -> list[dict]:
+    valid = [item for item in data if item["error"] is None]
+    if not valid:
+        return data
+    try:
+        vectors = await _embed_upstream(texts)
+    except AppException as exc:
+        error = {"code": exc.error_code, "message": exc.message}
+    except Exception:
+        error = {
+            "code": ErrorCode.SYS_INTERNAL_ERROR,
+            "message": "Embedding failed. Please try again later.",
+        }
+    else:
+        for item, vector in zip(valid, vectors):
+            item["embedding"] = vector
+        return data
+    for item in valid:
+        item["error"] = error
+    return data
+
+
+async def iter_bulk_embeddings(chunks):
+    """
+    Embed an NDJSON byte stream of texts, yielding one list of items per
+    upstream batch as each batch completes.
+
+    Each input line is a JSON string or {"text": ..., "id": ...}; each item
+    is {"index", "id", "embedding", "error"} with index the line number
+    (blank lines skipped). Lines are grouped into batches of
+    EMBED_STREAM_BATCH_SIZE and at most EMBED_STREAM_CONCURRENCY batches
+    are in flight; the body is only read further once a batch has been
+    handed to the consumer, so memory stays bounded by those two settings
+    whatever the input size. Closing the generator cancels the batches
+    still running.
+    """
+    # UTF-8 needs up to 4 bytes per character, plus room for the JSON around it
+    max_line_bytes = settings.EMBED_MAX_TEXT_CHARS * 4 + 1024
+    batch_size = settings.EMBED_STREAM_BATCH_SIZE
+    concurrency = max(1, settings.EMBED_STREAM_CONCURRENCY)
+
+    running: set[asyncio.Task] = set()
+    data: list[dict] = []
+    texts: list[str] = []
+    index = 0
+    try:
+        async for line in ndjson.iter_lines(chunks, max_line_bytes):
+            if line is not None and not line.strip():
+                continue
+            item_id, text, error = _parse_bulk_line(line)
+            data.append(
+                {"index": index, "id": item_id, "embedding": None, "error": error}
+            )
+            if error is None:
+                texts.append(text)
+            index += 1
+            if len(data) < batch_size:
+                continue
+
+            running.add(asyncio.create_task(_embed_bulk_batch(data, texts)))
+            data, texts = [], []
+            # Stop reading while the pipeline is full
+            while len(running) >= concurrency:
+                done, running = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+
+        if data:
+            running.add(asyncio.create_task(_embed_bulk_batch(data, texts)))
+        while running:
+            done, running = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,281 @@
+"""
+Asynchronous generation jobs.
+
+POST /jobs/generate enqueues a prompt and returns at once; a fixed pool of
+JOBS_WORKERS coroutines drains a priority queue and runs each job through
+run_generation_task, so long prompts no longer hold a client connection
+(and a retrying client no longer doubles the work). Clients poll
+GET /jobs/{id}, optionally long-polling with ?wait=.
+
+Finished jobs are kept for JOBS_RESULT_TTL_SECONDS in a ResultStore. The
+store is pluggable: JOBS_STORE is "memory" or "package.module:ClassName"
+for any ResultStore subclass taking ttl_seconds, e.g. one backed by Redis
+so results survive a pod restart. The queue itself is in-process.
+"""
+
+import asyncio
+import importlib
+import itertools
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+from app.config import settings
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import (
+    AppException,
+    ResourceNotFoundException,
+    ServiceUnavailableException,
+)
+from app.core.gen_and_embed import run_generation_task
+from app.core.metrics import Counter, Gauge, Histogram, registry
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class Job:
+    def __init__(self, query: str, priority: int = 0):
+        self.id = uuid.uuid4().hex
+        self.kind = "generate"
+        self.query = query
+        self.priority = priority
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: dict | None = None
+        self.error: dict | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class ResultStore(ABC):
+    """Where job state lives between submission and expiry."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    async def put(self, job: Job) -> None:
+        """Save the job's current state; finished jobs expire after the TTL."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Job | None: ...
+
+    @abstractmethod
+    async def purge_expired(self) -> int:
+        """Drop expired jobs; returns how many were removed."""
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+class MemoryResultStore(ResultStore):
+    def __init__(self, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        # id -> (job, expires_at); unfinished jobs never expire
+        self._jobs: dict[str, tuple[Job, float]] = {}
+
+    async def put(self, job: Job) -> None:
+        expires_at = (
+            time.monotonic() + self.ttl_seconds if job.finished else float("inf")
+        )
+        self._jobs[job.id] = (job, expires_at)
+
+    async def get(self, job_id: str) -> Job | None:
+        entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        job, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._jobs[job_id]
+            return None
+        return job
+
+    async def purge_expired(self) -> int:
+        now = time.monotonic()
+        expired = [job_id for job_id, (_, exp) in self._jobs.items() if now >= exp]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+def load_store(spec: str, ttl_seconds: float) -> ResultStore:
+    if spec == "memory":
+        return MemoryResultStore(ttl_seconds)
+    module_name, _, class_name = spec.partition(":")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    return store_class(ttl_seconds=ttl_seconds)
+
+
+class JobManager:
+    def __init__(self, store: ResultStore, workers: int, max_queue: int):
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.running = 0
+
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._done_events: dict[str, asyncio.Event] = {}
+        self._sequence = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._tasks and self._loop is loop:
+            return
+        # Workers belong to one event loop; a fresh loop (a new server or
+        # test client in the same process) gets a fresh pool and queue
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweeper(), name="job-sweeper"))
+
+    async def stop(self) -> None:
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    async def submit(self, query: str, priority: int = 0) -> Job:
+        self.start()
+        if self.queued >= self.max_queue:
+            JOBS_REJECTED.inc()
+            raise ServiceUnavailableException(
+                message="The job queue is full. Please retry shortly.",
+                error_code=ErrorCode.SYS_OVERLOADED,
+                details={"queued": self.queued, "max_queue": self.max_queue},
+                retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+            )
+
+        job = Job(query, priority)
+        await self.store.put(job)
+        self._done_events[job.id] = asyncio.Event()
+        # Higher priority first, FIFO within a priority
+        self._queue.put_nowait((-priority, next(self._sequence), job))
+        return job
+
+    async def get(self, job_id: str, wait: float = 0) -> Job:
+        """Return the job, waiting up to `wait` seconds for it to finish."""
+        job = await self.store.get(job_id)
+        if job is None:
+            raise ResourceNotFoundException(
+                message=f"Job '{job_id}' does not exist or has expired.",
+                error_code=ErrorCode.RES_JOB_NOT_FOUND,
+                details={"job_id": job_id},
+            )
+        event = self._done_events.get(job_id)
+        if wait > 0 and not job.finished and event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            job = await self.store.get(job_id) or job
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        JOBS_QUEUE_WAIT.observe(job.started_at - job.created_at)
+        await self.store.put(job)
+
+        self.running += 1
+        try:
+            result = await run_generation_task(job.query)
+            job.result = {"response": result["choices"][0]["message"]["content"]}
+            job.status = SUCCEEDED
+        except AppException as exc:
+            job.error = {"code": exc.error_code, "message": exc.message}
+            job.status = FAILED
+        except Exception:
+            job.error = {
+                "code": ErrorCode.SYS_INTERNAL_ERROR,
+                "message": "The job failed. Please try again later.",
+            }
+            job.status = FAILED
+        finally:
+            self.running -= 1
+
+        job.finished_at = time.time()
+        JOBS_FINISHED.inc(status=job.status)
+        await self.store.put(job)
+        event = self._done_events.pop(job.id, None)
+        if event is not None:
+            event.set()
+
+    async def _sweeper(self) -> None:
+        interval = min(60.0, max(1.0, self.store.ttl_seconds / 2))
+        while True:
+            await asyncio.sleep(interval)
+            await self.store.purge_expired()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": self.running,
+            "stored": len(self.store),
+        }
+
+
+job_manager = JobManager(
+    load_store(settings.JOBS_STORE, settings.JOBS_RESULT_TTL_SECONDS),
+    workers=settings.JOBS_WORKERS,
+    max_queue=settings.JOBS_MAX_QUEUE,
+)
+
+JOBS_FINISHED = Counter(
+    "jobs_finished_total", "Finished generation jobs by status.", ("status",)
+)
+JOBS_REJECTED = Counter(
+    "jobs_rejected_total", "Jobs refused because the queue was full."
+)
+JOBS_QUEUE_WAIT = Histogram(
+    "jobs_queue_wait_seconds", "Time jobs spent queued before a worker took them."
+)
+registry.register(
+    JOBS_FINISHED,
+    JOBS_REJECTED,
+    JOBS_QUEUE_WAIT,
+    Gauge("jobs_queued", "Jobs waiting for a worker.", fn=lambda: job_manager.queued),
+    Gauge("jobs_running", "Jobs being run.", fn=lambda: job_manager.running),
+)
@@ -0,0 +1,44 @@
+"""
+Incremental NDJSON reading.
+
+iter_lines() splits a byte stream (e.g. request.stream()) into lines while
+holding at most one line in memory, so a request body of any size can be
+processed in constant space. A line longer than max_line_bytes is not
+buffered: its bytes are dropped as they arrive and None is yielded in its
+place, letting the caller report that one line and carry on.
+"""
+
+from collections.abc import AsyncIterator
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[bytes | None]:
+    buffer = bytearray()
+    overflow = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            piece = chunk[start:end]
+            if overflow or len(buffer) + len(piece) > max_line_bytes:
+                yield None
+            else:
+                buffer += piece
+                yield bytes(buffer)
+            buffer.clear()
+            overflow = False
+            start = end + 1
+
+        rest = chunk[start:]
+        if overflow:
+            continue
+        if len(buffer) + len(rest) > max_line_bytes:
+            overflow = True
+            buffer.clear()
+        else:
+            buffer += rest
+
+    if overflow:
+        yield None
+    elif buffer.strip():
+        yield bytes(buffer)
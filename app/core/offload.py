@@ -0,0 +1,58 @@
+"""
+Off-loop execution for CPU-bound embedding work.
+
+Building and serializing a large batch of vectors is pure NumPy/Python work
+that would otherwise run on the event loop and stall every other coroutine.
+run_cpu() sends it to a bounded thread or process pool when EMBED_OFFLOAD is
+"thread" or "process" and the work covers at least EMBED_OFFLOAD_MIN_ROWS
+vectors; smaller jobs run inline because dispatching them costs more than
+it saves. Functions sent to a process pool must be importable module-level
+functions with picklable arguments.
+"""
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from app.config import settings
+
+_executor: Executor | None = None
+_slots: asyncio.Semaphore | None = None
+
+
+def get_executor() -> Executor | None:
+    global _executor
+    if _executor is None and settings.EMBED_OFFLOAD in ("thread", "process"):
+        if settings.EMBED_OFFLOAD == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.EMBED_OFFLOAD_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EMBED_OFFLOAD_WORKERS,
+                thread_name_prefix="embed-offload",
+            )
+    return _executor
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, rows: int) -> Any:
+    """Run fn(*args) off the event loop if offloading applies to `rows` vectors."""
+    executor = get_executor()
+    if executor is None or rows < settings.EMBED_OFFLOAD_MIN_ROWS:
+        return fn(*args)
+
+    global _slots
+    if _slots is None:
+        # Bound queued work to two jobs per worker; the rest wait here
+        _slots = asyncio.Semaphore(settings.EMBED_OFFLOAD_WORKERS * 2)
+
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, fn, *args)
+
+
+def shutdown() -> None:
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _slots = None
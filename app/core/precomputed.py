@@ -0,0 +1,139 @@
+"""
+Precomputed embeddings served straight from a memory-mapped file.
+
+A store is a directory written by `python -m app.precompute`:
+    vectors.npy  float32 (n, dim) matrix, one row per input line
+    ids.npy      the ids as fixed-width UTF-8 bytes, sorted
+    rows.npy     int64 row in vectors.npy for each entry of ids.npy
+    meta.json    model, dim and count; written last, so its presence
+                 marks a complete build
+
+All three arrays are opened with np.load(mmap_mode="r"): opening costs
+the same for a thousand vectors as for millions, nothing is copied into
+the process, and every uvicorn worker on a node shares the same page
+cache. An id is found by binary search over ids.npy, and its vector is a
+row view of the mapping.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from app.config import settings
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ResourceNotFoundException, ValidationException
+from app.core.metrics import Counter, Gauge, registry
+
+META_FILE = "meta.json"
+
+
+class PrecomputedEmbeddings:
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def row(self, item_id: str) -> int | None:
+        key = item_id.encode()
+        # Longer than every stored id, so it cannot be one (and would be
+        # truncated to a false match by the fixed-width comparison)
+        if len(key) > self.ids.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(self.ids, key))
+        if position < len(self.ids) and self.ids[position] == key:
+            return int(self.rows[position])
+        return None
+
+    def get(self, item_id: str) -> np.ndarray | None:
+        """The vector for item_id as a read-only view of the mapping."""
+        row = self.row(item_id)
+        return None if row is None else self.vectors[row]
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "model": self.meta.get("model"),
+            "count": len(self),
+            "dim": self.dim,
+        }
+
+
+def write_index(path: str, ids: list[str]) -> None:
+    """Write ids.npy and rows.npy for ids given in vectors.npy row order."""
+    encoded = np.array([item_id.encode() for item_id in ids])
+    order = np.argsort(encoded, kind="stable")
+    np.save(os.path.join(path, "ids.npy"), encoded[order])
+    np.save(os.path.join(path, "rows.npy"), order.astype(np.int64))
+
+
+store: PrecomputedEmbeddings | None = None
+
+
+def load(path: str) -> PrecomputedEmbeddings | None:
+    """Open the store at path (empty = none configured) as the process store."""
+    global store
+    store = PrecomputedEmbeddings(path) if path else None
+    return store
+
+
+def lookup(ids: list[str]) -> list[dict]:
+    """
+    Batch items for ids, in order: each embedding is a row view of the
+    mapping, and unknown ids get an item error rather than failing the
+    request.
+    """
+    if store is None:
+        raise ResourceNotFoundException(
+            message="No precomputed embeddings are loaded.",
+            error_code=ErrorCode.RES_EMBEDDING_NOT_FOUND,
+            details={"setting": "EMBED_STORE_PATH"},
+        )
+    if len(ids) > settings.EMBED_MAX_BATCH_SIZE:
+        raise ValidationException(
+            message=f"Batch size exceeds {settings.EMBED_MAX_BATCH_SIZE} items.",
+            error_code=ErrorCode.VAL_BATCH_TOO_LARGE,
+            details={"max_batch_size": settings.EMBED_MAX_BATCH_SIZE},
+        )
+
+    data = []
+    for index, item_id in enumerate(ids):
+        vector = store.get(item_id)
+        if vector is None:
+            LOOKUPS.inc(outcome="miss")
+            error = {
+                "code": ErrorCode.RES_EMBEDDING_NOT_FOUND,
+                "message": f"No precomputed embedding for id '{item_id}'.",
+            }
+        else:
+            LOOKUPS.inc(outcome="hit")
+            error = None
+        data.append(
+            {"index": index, "id": item_id, "embedding": vector, "error": error}
+        )
+    return data
+
+
+LOOKUPS = Counter(
+    "embed_store_lookups_total",
+    "Precomputed embedding lookups by outcome: hit or miss.",
+    ("outcome",),
+)
+registry.register(
+    LOOKUPS,
+    Gauge(
+        "embed_store_vectors",
+        "Vectors in the memory-mapped precomputed store (0 if none).",
+        fn=lambda: len(store) if store is not None else 0,
+    ),
+)
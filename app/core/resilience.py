@@ -0,0 +1,394 @@
+"""
+Call policy for upstream requests: hedging, retries and a circuit breaker.
+
+UpstreamPolicy.call(attempt) runs `attempt` (one upstream request) with:
+
+- Hedging: if the first attempt has not answered within the observed
+  UPSTREAM_HEDGE_PERCENTILE latency, a duplicate is sent and whichever
+  succeeds first wins; the other is cancelled. This cuts the tail caused
+  by one slow upstream replica without waiting for a timeout.
+- Retries: transport errors and 502/503/504 are retried up to
+  UPSTREAM_RETRY_MAX_ATTEMPTS with full-jitter exponential backoff.
+  Non-idempotent calls are only retried when the request never left
+  (connect errors, pool timeouts) and are never hedged.
+- Retry budget: every call earns UPSTREAM_RETRY_BUDGET_RATIO tokens and
+  every retry or hedge spends one, so extra load stays below that ratio
+  of real traffic even when the upstream is failing. Retries that could
+  not start before the request deadline (app/core/deadline.py) are skipped.
+- Circuit breaker: after UPSTREAM_BREAKER_FAILURES consecutive failures
+  the breaker opens and calls fail fast with SYS_UPSTREAM_UNAVAILABLE for
+  UPSTREAM_BREAKER_OPEN_SECONDS; then one probe call is let through and
+  its outcome closes or re-opens the breaker.
+- Concurrency: each attempt holds a slot of the model's adaptive limiter
+  (app/core/concurrency.py), which learns from the attempt's latency and
+  outcome how much load the upstream can take.
+
+Policies are per model, so one unhealthy model does not trip the others.
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from app.config import settings
+from app.core import concurrency, deadline
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import Counter, Gauge, registry
+
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+# Errors raised before the request could reach the upstream
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def is_retryable(exc: BaseException, idempotent: bool = True) -> bool:
+    if isinstance(exc, _NOT_SENT_ERRORS):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy (not the request bad)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Whether an error suggests the upstream has more load than it can take."""
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        return True
+    return is_failure(exc)
+
+
+class LatencyWindow:
+    """Recent successful latencies, for the hedging threshold."""
+
+    def __init__(self, size: int = 512, refresh_every: int = 32):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._sorted: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_refresh += 1
+
+    def percentile(self, pct: float) -> float | None:
+        if not self._samples:
+            return None
+        # Re-sort only every few observations to keep this off the hot path
+        if self._since_refresh >= self._refresh_every or not self._sorted:
+            self._sorted = sorted(self._samples)
+            self._since_refresh = 0
+        index = min(len(self._sorted) - 1, math.ceil(pct / 100 * len(self._sorted)) - 1)
+        return self._sorted[max(index, 0)]
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, max_tokens: float = 100.0, initial: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min(initial, max_tokens)
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; claims the probe slot when half-open."""
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def retry_after(self) -> int:
+        remaining = self.open_seconds - (time.monotonic() - self.opened_at)
+        return max(1, math.ceil(remaining))
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.failure_threshold > 0
+            and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Give the probe slot back when a probe ends without a verdict."""
+        self._probing = False
+
+
+class UpstreamPolicy:
+    def __init__(
+        self,
+        model: str,
+        max_attempts: int = 3,
+        backoff_ms: float = 50,
+        backoff_max_ms: float = 1000,
+        hedge_percentile: float = 95,
+        hedge_min_delay_ms: float = 10,
+        hedge_min_samples: int = 20,
+        budget_ratio: float = 0.1,
+        breaker_failures: int = 5,
+        breaker_open_seconds: float = 10,
+        limiter: concurrency.AdaptiveLimiter | None = None,
+    ):
+        self.model = model
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_ms = backoff_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyWindow()
+        self.budget = RetryBudget(budget_ratio)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_open_seconds)
+        self.limiter = limiter
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging, or None if hedging is off."""
+        if self.hedge_percentile <= 0 or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(
+            self.latency.percentile(self.hedge_percentile),
+            self.hedge_min_delay_ms / 1000,
+        )
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff in seconds for the nth retry."""
+        cap = min(self.backoff_max_ms, self.backoff_ms * 2 ** (retry - 1))
+        return random.uniform(0, cap) / 1000
+
+    async def call(
+        self, attempt: Callable[[], Awaitable[httpx.Response]], idempotent: bool = True
+    ) -> httpx.Response:
+        """Run attempt() under the policy; it must make one upstream request."""
+        self.check()
+        self.budget.deposit()
+
+        retry = 0
+        while True:
+            try:
+                response = await self._attempt(attempt, hedge=idempotent)
+            except Exception as exc:
+                self.record_error(exc)
+                if retry + 1 >= self.max_attempts or not is_retryable(exc, idempotent):
+                    raise
+                delay = self.backoff(retry + 1)
+                left = deadline.remaining()
+                if left is not None and delay >= left:
+                    # The retry could not even start before the deadline
+                    raise
+                if not self.budget.withdraw():
+                    UPSTREAM_BUDGET_EXHAUSTED.inc(model=self.model)
+                    raise
+                retry += 1
+                await asyncio.sleep(delay)
+                self.check()
+                UPSTREAM_ATTEMPTS.inc(model=self.model, kind="retry")
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+    def record_error(self, exc: BaseException) -> None:
+        if is_failure(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+
+    def check(self) -> None:
+        """Fail fast with SYS_UPSTREAM_UNAVAILABLE while the breaker is open."""
+        if self.breaker.allow():
+            return
+        UPSTREAM_BREAKER_REJECTED.inc(model=self.model)
+        raise ServiceUnavailableException(
+            message="The model server is unavailable. Please retry shortly.",
+            error_code=ErrorCode.SYS_UPSTREAM_UNAVAILABLE,
+            details={"model": self.model},
+            retry_after=self.breaker.retry_after(),
+        )
+
+    async def _timed(self, attempt) -> httpx.Response:
+        if self.limiter is None:
+            return await self._send(attempt)
+        slot = await self.limiter.acquire()
+        outcome = concurrency.IGNORED
+        try:
+            response = await self._send(attempt)
+            outcome = concurrency.OK
+            return response
+        except Exception as exc:
+            if is_overload(exc):
+                outcome = concurrency.DROPPED
+            raise
+        finally:
+            self.limiter.release(slot, outcome)
+
+    async def _send(self, attempt) -> httpx.Response:
+        start = time.perf_counter()
+        response = await attempt()
+        response.raise_for_status()
+        self.latency.observe(time.perf_counter() - start)
+        return response
+
+    async def _attempt(self, attempt, hedge: bool) -> httpx.Response:
+        if not hedge or (delay := self.hedge_delay()) is None:
+            return await self._timed(attempt)
+
+        primary = asyncio.create_task(self._timed(attempt))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.budget.withdraw():
+            return await primary
+
+        UPSTREAM_ATTEMPTS.inc(model=self.model, kind="hedge")
+        hedged = asyncio.create_task(self._timed(attempt))
+        pending = {primary, hedged}
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            UPSTREAM_HEDGE_WINS.inc(model=self.model)
+                        return task.result()
+                if not pending:
+                    # Both failed; surface the primary's error
+                    hedged.exception()
+                    return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "retry_budget_tokens": self.budget.tokens,
+            "hedge_delay_ms": None if delay is None else delay * 1000,
+            "latency_samples": len(self.latency),
+        }
+
+
+policies: dict[str, UpstreamPolicy] = {}
+
+
+def get_policy(model: str) -> UpstreamPolicy:
+    policy = policies.get(model)
+    if policy is None:
+        policy = policies[model] = UpstreamPolicy(
+            model,
+            max_attempts=settings.UPSTREAM_RETRY_MAX_ATTEMPTS,
+            backoff_ms=settings.UPSTREAM_RETRY_BACKOFF_MS,
+            backoff_max_ms=settings.UPSTREAM_RETRY_BACKOFF_MAX_MS,
+            hedge_percentile=settings.UPSTREAM_HEDGE_PERCENTILE,
+            hedge_min_delay_ms=settings.UPSTREAM_HEDGE_MIN_DELAY_MS,
+            hedge_min_samples=settings.UPSTREAM_HEDGE_MIN_SAMPLES,
+            budget_ratio=settings.UPSTREAM_RETRY_BUDGET_RATIO,
+            breaker_failures=settings.UPSTREAM_BREAKER_FAILURES,
+            breaker_open_seconds=settings.UPSTREAM_BREAKER_OPEN_SECONDS,
+            limiter=concurrency.get_limiter(model),
+        )
+    return policy
+
+
+_BREAKER_STATES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+
+UPSTREAM_ATTEMPTS = Counter(
+    "upstream_extra_attempts_total",
+    "Upstream attempts beyond the first, by model and kind (retry, hedge).",
+    ("model", "kind"),
+)
+UPSTREAM_HEDGE_WINS = Counter(
+    "upstream_hedge_wins_total",
+    "Hedged attempts that answered before the original.",
+    ("model",),
+)
+UPSTREAM_BUDGET_EXHAUSTED = Counter(
+    "upstream_retry_budget_exhausted_total",
+    "Retries skipped because the retry budget was spent.",
+    ("model",),
+)
+UPSTREAM_BREAKER_REJECTED = Counter(
+    "upstream_breaker_rejected_total",
+    "Calls failed fast by an open circuit breaker.",
+    ("model",),
+)
+registry.register(
+    UPSTREAM_ATTEMPTS,
+    UPSTREAM_HEDGE_WINS,
+    UPSTREAM_BUDGET_EXHAUSTED,
+    UPSTREAM_BREAKER_REJECTED,
+    Gauge(
+        "upstream_breaker_state",
+        "Circuit breaker state by model: 0 closed, 1 half-open, 2 open.",
+        ("model",),
+        fn=lambda: {
+            (model,): _BREAKER_STATES[policy.breaker.state]
+            for model, policy in policies.items()
+        },
+    ),
+    Gauge(
+        "upstream_retry_budget_tokens",
+        "Retries and hedges currently affordable, by model.",
+        ("model",),
+        fn=lambda: {
+            (model,): policy.budget.tokens for model, policy in policies.items()
+        },
+    ),
+)
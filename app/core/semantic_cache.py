@@ -0,0 +1,106 @@
+"""
+Semantic response cache.
+
+Unlike the exact-match embedding cache, entries are found by meaning: a
+lookup embeds the query and takes the most similar stored query, and its
+completion is reused if the cosine similarity reaches `threshold`.
+
+Each model has its own partition: a preallocated (capacity, dim) matrix of
+unit-length query vectors, scored against the lookup vector in one matrix
+product. A full partition evicts its least recently used entry, found
+with argmin over a per-slot last-used counter, so both lookups and
+inserts are a single vectorized pass with no per-entry Python work.
+"""
+
+import numpy as np
+
+
+class _Partition:
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.values: list = [None] * capacity
+        self.size = 0
+
+
+class SemanticCache:
+    def __init__(self, capacity: int, threshold: float, dim: int):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self._partitions: dict[str, _Partition] = {}
+        self._clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray | None:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def get(self, model: str, vector: np.ndarray):
+        """Return (value, similarity) of the closest entry above threshold."""
+        partition = self._partitions.get(model)
+        query = self._normalize(vector)
+        if partition is None or partition.size == 0 or query is None:
+            self.misses += 1
+            return None, None
+
+        scores = partition.vectors[: partition.size] @ query
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None, similarity
+
+        partition.last_used[best] = self._tick()
+        self.hits += 1
+        return partition.values[best], similarity
+
+    def put(self, model: str, vector: np.ndarray, value) -> None:
+        query = self._normalize(vector)
+        if query is None:
+            return
+        partition = self._partitions.get(model)
+        if partition is None:
+            partition = self._partitions[model] = _Partition(self.capacity, self.dim)
+
+        if partition.size < self.capacity:
+            slot = partition.size
+            partition.size += 1
+        else:
+            slot = int(np.argmin(partition.last_used))
+            self.evictions += 1
+        partition.vectors[slot] = query
+        partition.values[slot] = value
+        partition.last_used[slot] = self._tick()
+
+    def entries(self) -> dict[str, int]:
+        return {model: p.size for model, p in self._partitions.items()}
+
+    def clear(self) -> None:
+        self._partitions.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "entries": self.entries(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,241 @@
+"""
+Pairwise cosine similarity and near-duplicate clustering.
+
+Inputs come through vectors.to_matrix, so texts take the normal embedding
+path and vectors may be float or quantized. Rows are normalized once;
+after that every comparison is a block of a matrix product, at most
+SIMILARITY_CHUNK_ROWS rows at a time, so the temporary memory is bounded
+by chunk_rows x n whatever the input size.
+
+Deduplication links every pair with cosine >= threshold and returns the
+connected components with more than one member. Small inputs compare all
+pairs. Larger ones use random-hyperplane LSH: each of `tables` hash tables
+draws `bits` random hyperplanes and keys a vector by which side of each
+it falls on, so vectors at a small angle usually share a key in at least
+one table. Only vectors sharing a key are compared, which keeps the work
+near-linear when duplicates are sparse, at the cost of occasionally
+missing a pair close to the threshold.
+"""
+
+import numpy as np
+
+from app.config import settings
+from app.core import vectors
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ValidationException
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def _check_size(count: int, limit: int, what: str) -> None:
+    if count > limit:
+        raise ValidationException(
+            message=f"Too many {what}: {count} exceeds {limit}.",
+            error_code=ErrorCode.VAL_BATCH_TOO_LARGE,
+            details={what: count, "max": limit},
+        )
+
+
+def cosine_matrix(
+    queries: np.ndarray, corpus: np.ndarray | None, chunk_rows: int
+) -> np.ndarray:
+    """(n, m) cosine similarities of queries against corpus (or themselves)."""
+    queries = _normalize(queries)
+    corpus = queries if corpus is None else _normalize(corpus)
+    scores = np.empty((len(queries), len(corpus)), dtype=np.float32)
+    for start in range(0, len(queries), chunk_rows):
+        np.matmul(
+            queries[start : start + chunk_rows],
+            corpus.T,
+            out=scores[start : start + chunk_rows],
+        )
+    return np.clip(scores, -1, 1, out=scores)
+
+
+# LSH buckets up to this size are compared as explicit pairs, gathered
+# across the whole table at once; larger ones block by block
+_PAIRWISE_MAX = 32
+
+
+def _find(parent: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Union-find roots of nodes, compressing the paths walked."""
+    roots = parent[nodes]
+    while True:
+        above = parent[roots]
+        if (above == roots).all():
+            break
+        roots = above
+    parent[nodes] = roots
+    return roots
+
+
+def _union(parent: np.ndarray, nodes: np.ndarray) -> None:
+    """Join the components of all of nodes into one."""
+    roots = np.unique(_find(parent, nodes))
+    if len(roots) > 1:
+        parent[roots[1:]] = roots[0]
+
+
+def _union_pair(parent: np.ndarray, a: int, b: int) -> None:
+    """_union for two nodes, without the array overhead."""
+    while parent[a] != a:
+        parent[a] = a = parent[parent[a]]
+    while parent[b] != b:
+        parent[b] = b = parent[parent[b]]
+    if a != b:
+        parent[max(a, b)] = min(a, b)
+
+
+def _flatten(parent: np.ndarray) -> np.ndarray:
+    """Point every node straight at its root; returns parent."""
+    while True:
+        above = parent[parent]
+        if (above == parent).all():
+            return parent
+        parent[:] = above
+
+
+def _link_block(
+    unit: np.ndarray,
+    bucket: np.ndarray,
+    threshold: float,
+    parent: np.ndarray,
+    chunk_rows: int,
+) -> int:
+    """Link all pairs within bucket at or above threshold; returns pairs compared."""
+    members = unit[bucket]
+    for start in range(0, len(bucket), chunk_rows):
+        hits = members[start : start + chunk_rows] @ members.T >= threshold
+        # Only rows that match something besides themselves can merge
+        for row in hits[hits.sum(axis=1) > 1]:
+            _union(parent, bucket[row])
+    return len(bucket) * (len(bucket) - 1) // 2
+
+
+def _link_pairs(
+    unit: np.ndarray,
+    left: np.ndarray,
+    right: np.ndarray,
+    threshold: float,
+    parent: np.ndarray,
+    chunk_rows: int,
+) -> int:
+    """Link the pairs (left[k], right[k]) at or above threshold."""
+    roots = _flatten(parent)
+    unlinked = roots[left] != roots[right]
+    left, right = left[unlinked], right[unlinked]
+    for start in range(0, len(left), chunk_rows):
+        i, j = left[start : start + chunk_rows], right[start : start + chunk_rows]
+        close = np.einsum("ij,ij->i", unit[i], unit[j]) >= threshold
+        for a, b in zip(i[close].tolist(), j[close].tolist()):
+            _union_pair(parent, a, b)
+    return len(left)
+
+
+def _link_lsh(
+    unit: np.ndarray,
+    threshold: float,
+    parent: np.ndarray,
+    bits: int,
+    tables: int,
+    chunk_rows: int,
+    seed: int,
+) -> int:
+    rng = np.random.default_rng(seed)
+    weights = np.int64(1) << np.arange(bits, dtype=np.int64)
+    comparisons = 0
+    for _ in range(tables):
+        planes = rng.standard_normal((unit.shape[1], bits)).astype(np.float32)
+        keys = np.concatenate(
+            [
+                (unit[start : start + chunk_rows] @ planes > 0) @ weights
+                for start in range(0, len(unit), chunk_rows)
+            ]
+        )
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+
+        # Pairs in small buckets: members d apart in sorted order, for each d
+        small = np.repeat(sizes <= _PAIRWISE_MAX, sizes)
+        for d in range(1, _PAIRWISE_MAX):
+            same = (keys[d:] == keys[:-d]) & small[d:]
+            if not same.any():
+                break
+            comparisons += _link_pairs(
+                unit, order[:-d][same], order[d:][same], threshold, parent, chunk_rows
+            )
+
+        large = sizes > _PAIRWISE_MAX
+        for start, size in zip(starts[large], sizes[large]):
+            bucket = order[start : start + size]
+            comparisons += _link_block(unit, bucket, threshold, parent, chunk_rows)
+    return comparisons
+
+
+def cluster(
+    matrix: np.ndarray,
+    threshold: float,
+    exact_max_items: int,
+    bits: int,
+    tables: int,
+    chunk_rows: int,
+    seed: int = 0,
+) -> dict:
+    """
+    Near-duplicate clusters of the rows of matrix, as sorted lists of row
+    indices ordered by first member.
+    """
+    unit = _normalize(matrix)
+    # Union-find forest over the rows; linking costs near-constant time per
+    # pair however large the components grow
+    parent = np.arange(len(unit))
+    if len(unit) <= exact_max_items:
+        method = "exact"
+        comparisons = _link_block(
+            unit, np.arange(len(unit)), threshold, parent, chunk_rows
+        )
+    else:
+        method = "lsh"
+        comparisons = _link_lsh(unit, threshold, parent, bits, tables, chunk_rows, seed)
+
+    labels = _flatten(parent)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    groups = [group.tolist() for group in np.split(order, bounds) if len(group) > 1]
+    return {
+        "clusters": sorted(groups, key=lambda group: group[0]),
+        "method": method,
+        "comparisons": comparisons,
+    }
+
+
+def _count(inputs: dict) -> int:
+    return len(next(value for value in inputs.values() if value is not None))
+
+
+async def load_pair(
+    queries: dict, corpus: dict | None
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Matrices for cosine_matrix from to_matrix keyword arguments. Sizes are
+    checked before anything is embedded.
+    """
+    rows = _count(queries)
+    columns = _count(corpus) if corpus is not None else rows
+    _check_size(max(rows, columns), settings.SIMILARITY_MAX_ITEMS, "items")
+    _check_size(rows * columns, settings.SIMILARITY_MAX_CELLS, "cells")
+    left = await vectors.to_matrix(**queries)
+    right = await vectors.to_matrix(**corpus) if corpus is not None else None
+    return left, right
+
+
+async def load(inputs: dict) -> np.ndarray:
+    """The matrix for cluster() from to_matrix keyword arguments."""
+    _check_size(_count(inputs), settings.DEDUP_MAX_ITEMS, "items")
+    return await vectors.to_matrix(**inputs)
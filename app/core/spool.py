@@ -0,0 +1,205 @@
+"""
+Decoupling a streamed request from its streamed response.
+
+Most HTTP/1.1 clients (httpx, requests) upload the whole request body
+before they read any of the response. An endpoint that answers while it
+is still reading would fill the socket buffers, block on send, stop
+reading the body and deadlock with the client. decouple() runs the
+producer in a background task and buffers its output in a spool: memory
+up to max_memory_bytes, then a temporary file, whose reads and writes run
+in a worker thread so disk I/O never blocks the event loop. When the
+reader keeps up (a full-duplex client) the spool is rewound and stays
+small.
+
+The spool is bounded too: once max_bytes are waiting, the producer stops
+(and with it the reading of the request body) until the reader has taken
+the spool down to half of that. A single chunk may take the spool past
+max_bytes; it is never split. A client that uploads more than max_bytes
+worth of input before it reads anything deadlocks with the server there,
+so decouple() ends the stream when the request deadline passes or the
+spool has stayed full for stall_seconds, whichever comes first.
+"""
+
+import asyncio
+import tempfile
+import time
+from collections.abc import AsyncIterator
+
+from app.core import deadline
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import GatewayTimeoutException
+
+READ_SIZE = 64 * 1024
+
+
+class _Spool:
+    def __init__(self, max_memory_bytes: int, max_bytes: int):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+        self._max_memory_bytes = max_memory_bytes
+        self.max_bytes = max_bytes
+        self._low_water = max_bytes // 2
+        # Once it rolls over to disk the file stays there until closed
+        self._on_disk = False
+        self._write_pos = 0
+        self._read_pos = 0
+        # Reads and writes seek the same file, possibly from two threads
+        self._lock = asyncio.Lock()
+        self._written = asyncio.Event()
+        self._drained = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return self._write_pos - self._read_pos
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.max_bytes
+
+    async def _io(self, fn, *args):
+        # In-memory operations are cheaper than the thread hop
+        if not self._on_disk:
+            return fn(*args)
+        future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread cannot be stopped; let it finish with the file
+            # before anything else touches or closes it
+            await asyncio.wait([future])
+            raise
+
+    def _write_at(self, pos: int, data: bytes) -> None:
+        self._file.seek(pos)
+        self._file.write(data)
+
+    def _read_at(self, pos: int) -> bytes:
+        self._file.seek(pos)
+        return self._file.read(READ_SIZE)
+
+    def _rewind(self) -> None:
+        self._file.seek(0)
+        self._file.truncate()
+
+    async def write(self, data: bytes) -> None:
+        async with self._lock:
+            if self._write_pos + len(data) > self._max_memory_bytes:
+                self._on_disk = True
+            await self._io(self._write_at, self._write_pos, data)
+            self._write_pos += len(data)
+        self._written.set()
+
+    async def read(self) -> bytes:
+        async with self._lock:
+            data = await self._io(self._read_at, self._read_pos)
+            self._read_pos += len(data)
+            if self._read_pos == self._write_pos:
+                # Caught up: rewind so a reader that keeps pace never grows it
+                await self._io(self._rewind)
+                self._read_pos = self._write_pos = 0
+        if self.pending <= self._low_water:
+            self._drained.set()
+        return data
+
+    async def wait(self) -> None:
+        self._written.clear()
+        await self._written.wait()
+
+    async def wait_drained(self) -> None:
+        while self.pending > self._low_water:
+            self._drained.clear()
+            await self._drained.wait()
+
+    def wake(self) -> None:
+        self._written.set()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def stalled(seconds: float) -> GatewayTimeoutException:
+    return GatewayTimeoutException(
+        message="The client stopped reading the response.",
+        error_code=ErrorCode.SYS_DEADLINE_EXCEEDED,
+        details={"reason": "stalled", "seconds": seconds},
+    )
+
+
+async def decouple(
+    chunks: AsyncIterator[bytes],
+    max_memory_bytes: int,
+    max_bytes: int,
+    expires: float | None = None,
+    stall_seconds: float | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yield what `chunks` produces. The producer runs ahead of the reader by
+    up to max_bytes, never waiting for it before then.
+
+    The stream is cut short with GatewayTimeoutException once `expires` (a
+    time.monotonic() value, see deadline.expiry()) passes, or once a full
+    spool has not drained for stall_seconds. If the consumer is busy with a
+    chunk already yielded then, typically blocked sending it to a client
+    that is not reading, its task is cancelled out of that and the error
+    is raised when the generator is closed.
+    """
+    spool = _Spool(max_memory_bytes, max_bytes)
+    consumer = asyncio.current_task()
+    error: GatewayTimeoutException | None = None
+    parked = cancelled = False
+
+    def cut(exc: GatewayTimeoutException) -> None:
+        nonlocal error, cancelled
+        if error is not None:
+            return
+        error = exc
+        if parked:
+            cancelled = True
+            consumer.cancel()
+        spool.wake()
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                await spool.write(chunk)
+                if spool.full:
+                    try:
+                        await asyncio.wait_for(spool.wait_drained(), stall_seconds)
+                    except TimeoutError:
+                        cut(stalled(stall_seconds))
+                        return
+        finally:
+            spool.wake()
+
+    timer = None
+    if expires is not None:
+        timer = asyncio.get_running_loop().call_later(
+            max(0.0, expires - time.monotonic()), lambda: cut(deadline.exceeded())
+        )
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            if error is not None:
+                raise error
+            if spool.pending:
+                data = await spool.read()
+                parked = True
+                try:
+                    yield data
+                finally:
+                    parked = False
+            elif task.done():
+                # Re-raises whatever stopped the producer early
+                task.result()
+                return
+            else:
+                await spool.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        spool.close()
+        if cancelled:
+            # The consumer's cancellation was ours; report it as the error
+            consumer.uncancel()
+            raise error
@@ -0,0 +1,59 @@
+"""
+Per-request stage timings for the Server-Timing response header.
+
+ServerTimingMiddleware starts a RequestTiming for each request and keeps it
+in a ContextVar, so code anywhere below the router can add to it without
+threading a request object through: record() adds a duration. Outside a
+request (scripts, background batches) it is a no-op.
+
+Stages recorded today:
+    parse      request start until the endpoint runs (routing, body, validation)
+    handler    endpoint body, including everything it awaits
+    upstream   model-server calls, up to response headers (summed)
+    serialize  endpoint return until response headers (response model, JSON)
+    total      request start until response headers
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.endpoint_done: float | None = None
+        self.stages: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header_value(self) -> str:
+        """Stages as a Server-Timing header value, durations in milliseconds."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()
+        )
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def current() -> RequestTiming | None:
+    return _current.get()
+
+
+@contextmanager
+def tracking():
+    """Make a fresh RequestTiming current for the duration of the block."""
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+def record(name: str, seconds: float) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.record(name, seconds)
@@ -0,0 +1,165 @@
+"""
+Shared upstream HTTP client.
+
+A single httpx.AsyncClient is kept per process so calls from gen_and_embed
+reuse keep-alive connections instead of opening a new TCP+TLS connection per
+request. The FastAPI lifespan in app.main opens and closes it; outside the app
+(scripts, one-off tasks) get_client() creates it lazily.
+
+post() and timed() record upstream latency per model and status code for
+GET /metrics; latency is measured up to the response headers.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from app.config import settings
+from app.core import deadline, timing
+from app.core.metrics import Gauge, Histogram, registry
+
+_client: httpx.AsyncClient | None = None
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Upstream request latency until response headers, by model and status.",
+    ("model", "status"),
+)
+
+
+def build_client() -> httpx.AsyncClient:
+    """Create an AsyncClient with pool limits and timeouts taken from settings."""
+    limits = httpx.Limits(
+        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+        read=settings.UPSTREAM_READ_TIMEOUT,
+        write=settings.UPSTREAM_WRITE_TIMEOUT,
+        pool=settings.UPSTREAM_POOL_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        limits=limits, timeout=timeout, http2=settings.UPSTREAM_HTTP2
+    )
+
+
+async def start_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the lifespan has not run."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+
+class _Timing:
+    def __init__(self, model: str):
+        self.model = model
+        self.start = time.perf_counter()
+        self.recorded = False
+
+    def stop(self, status: int | str) -> None:
+        """Record the latency once, when the response headers arrive."""
+        if not self.recorded:
+            self.recorded = True
+            elapsed = time.perf_counter() - self.start
+            UPSTREAM_LATENCY.observe(elapsed, model=self.model, status=str(status))
+            timing.record("upstream", elapsed)
+
+
+@contextmanager
+def timed(model: str):
+    """
+    Time an upstream call for UPSTREAM_LATENCY.
+
+    Call .stop(status_code) on the yielded timer once the response arrives;
+    calls that leave the block without it are recorded with status "error",
+    or "cancelled" for losing hedged attempts and abandoned requests.
+    """
+    timing = _Timing(model)
+    try:
+        yield timing
+    except asyncio.CancelledError:
+        timing.stop("cancelled")
+        raise
+    finally:
+        timing.stop("error")
+
+
+async def post(model: str, url: str, **kwargs) -> httpx.Response:
+    """
+    POST through the shared client, recording latency for `model`. Under a
+    request deadline the timeouts shrink to the remaining budget.
+    """
+    deadline.check()
+    client = get_client()
+    timeout = deadline.client_timeout(client.timeout)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    with timed(model) as timing:
+        response = await client.post(url, **kwargs)
+        timing.stop(response.status_code)
+    return response
+
+
+def pool_stats() -> dict:
+    """
+    Snapshot of the connection pool, for sizing the limits above.
+
+    httpx does not expose pool counters publicly, so this reads them from the
+    underlying httpcore pool and degrades to zeros if that layout changes.
+    """
+    stats = {
+        "max_connections": settings.UPSTREAM_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.UPSTREAM_MAX_KEEPALIVE,
+        "http2": settings.UPSTREAM_HTTP2,
+        "connections": 0,
+        "in_use": 0,
+        "idle": 0,
+        "waiting": 0,
+    }
+    if _client is None or _client.is_closed:
+        return stats
+
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return stats
+
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for conn in connections if conn.is_idle())
+    requests = list(getattr(pool, "_requests", []))
+    stats["connections"] = len(connections)
+    stats["idle"] = idle
+    stats["in_use"] = len(connections) - idle
+    stats["waiting"] = sum(1 for req in requests if req.is_queued())
+    return stats
+
+
+UPSTREAM_POOL = Gauge(
+    "upstream_pool_connections",
+    "Upstream connection pool usage by state.",
+    ("state",),
+    fn=lambda: {
+        (state,): value
+        for state, value in pool_stats().items()
+        if state in ("connections", "in_use", "idle", "waiting")
+    },
+)
+registry.register(UPSTREAM_LATENCY, UPSTREAM_POOL)
@@ -0,0 +1,236 @@
+"""
+In-process vector store with cosine top-k search.
+
+Vectors live in one contiguous float32 matrix that grows by doubling, and
+are L2-normalized on insert so similarity is a plain matrix product. Top-k
+uses np.argpartition, which is O(n) per query instead of a full sort.
+
+Collections at or above ivf_min_size also get an IVF (inverted file) index:
+a spherical k-means coarse quantizer splits rows into nlist clusters and a
+search only scores the rows in the nprobe clusters closest to the query.
+This trades a little recall for much less work per query; see
+benchmarks/vector_search.py for the trade-off curve. The index keeps a
+cluster-ordered copy of the matrix so each cluster is one contiguous block;
+it is rebuilt lazily on the first search after an upsert, so IVF
+collections cost roughly twice the memory and suit read-heavy use.
+"""
+
+import math
+
+import numpy as np
+
+# Rows scored per block when assigning rows to centroids, to bound memory
+_ASSIGN_BLOCK = 8192
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indices and values of the k largest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return (
+        np.take_along_axis(part, order, axis=1),
+        np.take_along_axis(part_scores, order, axis=1),
+    )
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Train nlist unit-norm centroids on already-normalized vectors."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters from random points so nlist stays useful
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class VectorStore:
+    def __init__(
+        self,
+        dim: int,
+        ivf_min_size: int = 50_000,
+        nlist: int = 0,
+        nprobe: int = 8,
+        initial_capacity: int = 1024,
+    ):
+        self.dim = dim
+        self.ivf_min_size = ivf_min_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self._matrix = np.empty((initial_capacity, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+
+        # IVF state: centroids, per-row cluster, and rows sorted by cluster
+        self._centroids: np.ndarray | None = None
+        self._assign = np.empty(initial_capacity, dtype=np.int32)
+        self._trained_size = 0
+        self._lists_dirty = True
+        self._list_rows = np.empty(0, dtype=np.int64)
+        self._list_bounds = np.empty(0, dtype=np.int64)
+        self._list_matrix = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Normalized rows currently stored (a view, not a copy)."""
+        return self._matrix[: self._size]
+
+    @property
+    def uses_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def upsert(self, ids: list[str], vectors: np.ndarray) -> int:
+        """Insert or replace vectors by id; returns how many ids were new."""
+        vectors = normalize(vectors).reshape(len(ids), self.dim)
+        rows = np.empty(len(ids), dtype=np.int64)
+        created = 0
+        for i, vector_id in enumerate(ids):
+            row = self._rows.get(vector_id)
+            if row is None:
+                row = self._size + created
+                self._rows[vector_id] = row
+                self._ids.append(vector_id)
+                created += 1
+            rows[i] = row
+
+        self._reserve(self._size + created)
+        self._matrix[rows] = vectors
+        self._size += created
+
+        if self._centroids is not None:
+            self._assign[rows] = self._nearest_centroid(vectors)
+            self._lists_dirty = True
+        self._maybe_train()
+        return created
+
+    def search(
+        self, queries: np.ndarray, k: int, nprobe: int | None = None
+    ) -> list[list[tuple[str, float]]]:
+        """Top-k (id, cosine similarity) for each query row."""
+        queries = normalize(queries).reshape(-1, self.dim)
+        if self._size == 0:
+            return [[] for _ in range(len(queries))]
+
+        if self._centroids is None:
+            rows, scores = top_k(queries @ self.vectors.T, k)
+            return [self._hits(r, s) for r, s in zip(rows, scores)]
+        return self._search_ivf(queries, k, nprobe or self.nprobe)
+
+    def _search_ivf(
+        self, queries: np.ndarray, k: int, nprobe: int
+    ) -> list[list[tuple[str, float]]]:
+        self._build_lists()
+        nprobe = min(nprobe, len(self._centroids))
+        probes, _ = top_k(queries @ self._centroids.T, nprobe)
+
+        # Group (query, cluster) pairs by cluster so each cluster block is
+        # scored with one matrix product for all queries that probe it
+        pair_queries = np.repeat(np.arange(len(queries)), nprobe)
+        pair_clusters = probes.ravel()
+        order = np.argsort(pair_clusters, kind="stable")
+        clusters, starts = np.unique(pair_clusters[order], return_index=True)
+
+        scores: list[list[np.ndarray]] = [[] for _ in range(len(queries))]
+        rows: list[list[np.ndarray]] = [[] for _ in range(len(queries))]
+        for cluster, members in zip(
+            clusters, np.split(pair_queries[order], starts[1:])
+        ):
+            lo, hi = self._list_bounds[cluster], self._list_bounds[cluster + 1]
+            if lo == hi:
+                continue
+            block_scores = queries[members] @ self._list_matrix[lo:hi].T
+            for query, query_scores in zip(members, block_scores):
+                scores[query].append(query_scores)
+                rows[query].append(self._list_rows[lo:hi])
+
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            if not query_scores:
+                results.append([])
+                continue
+            candidates = np.concatenate(query_rows)
+            best, best_scores = top_k(np.concatenate(query_scores)[np.newaxis], k)
+            results.append(self._hits(candidates[best[0]], best_scores[0]))
+        return results
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> list[tuple[str, float]]:
+        return [(self._ids[row], float(score)) for row, score in zip(rows, scores)]
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._matrix)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        assign = np.empty(capacity, dtype=np.int32)
+        assign[: self._size] = self._assign[: self._size]
+        self._assign = assign
+
+    def _maybe_train(self) -> None:
+        # (Re)train when first crossing the threshold and each time the
+        # collection doubles, so clusters track the data distribution
+        if self._size < self.ivf_min_size or self._size < 2 * self._trained_size:
+            return
+        nlist = self.nlist or max(1, int(math.sqrt(self._size)))
+        sample_size = min(self._size, nlist * 64)
+        sample = self.vectors[
+            np.random.default_rng(self._size).choice(
+                self._size, sample_size, replace=False
+            )
+        ]
+        self._centroids = spherical_kmeans(sample, min(nlist, sample_size))
+        self._assign[: self._size] = self._nearest_centroid(self.vectors)
+        self._trained_size = self._size
+        self._lists_dirty = True
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _ASSIGN_BLOCK):
+            block = vectors[start : start + _ASSIGN_BLOCK]
+            out[start : start + len(block)] = np.argmax(
+                block @ self._centroids.T, axis=1
+            )
+        return out
+
+    def _build_lists(self) -> None:
+        if not self._lists_dirty:
+            return
+        assign = self._assign[: self._size]
+        self._list_rows = np.argsort(assign, kind="stable")
+        self._list_bounds = np.searchsorted(
+            assign[self._list_rows], np.arange(len(self._centroids) + 1)
+        )
+        self._list_matrix = self._matrix[self._list_rows]
+        self._lists_dirty = False
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "capacity": len(self._matrix),
+            "dim": self.dim,
+            "ivf": self.uses_ivf,
+            "nlist": 0 if self._centroids is None else len(self._centroids),
+            "nprobe": self.nprobe,
+        }
@@ -0,0 +1,193 @@
+"""
+Vector collections built on the embedding path.
+
+Texts are embedded with run_batch_embedding_task, in batches of at most
+EMBED_MAX_BATCH_SIZE sent together, and stored in named VectorStore
+collections, created on first upsert. Callers can also supply ready-made
+vectors, either as floats or in the int8 / binary forms /embed returns;
+those are dequantized on the way in (see app/core/quantization.py).
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.config import settings
+from app.core import quantization
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ResourceNotFoundException, ValidationException
+from app.core.gen_and_embed import EMBEDDING_DIM, run_batch_embedding_task
+from app.core.metrics import Gauge, registry
+from app.core.vector_store import VectorStore
+
+collections: dict[str, VectorStore] = {}
+
+registry.register(
+    Gauge(
+        "vector_collection_size",
+        "Vectors stored per collection.",
+        ("collection",),
+        fn=lambda: {(name,): len(store) for name, store in collections.items()},
+    )
+)
+
+
+def get_collection(name: str, create: bool = False) -> VectorStore:
+    store = collections.get(name)
+    if store is None:
+        if not create:
+            raise ResourceNotFoundException(
+                message=f"Collection '{name}' does not exist.",
+                error_code=ErrorCode.RES_COLLECTION_NOT_FOUND,
+                details={"collection": name},
+            )
+        store = collections[name] = VectorStore(
+            EMBEDDING_DIM,
+            ivf_min_size=settings.VECTOR_IVF_MIN_SIZE,
+            nlist=settings.VECTOR_IVF_NLIST,
+            nprobe=settings.VECTOR_IVF_NPROBE,
+        )
+    return store
+
+
+def _dim_error(length: int) -> dict:
+    return {
+        "code": ErrorCode.VAL_VECTOR_DIM_MISMATCH,
+        "message": f"Vector has {length} dimensions, expected {EMBEDDING_DIM}.",
+    }
+
+
+async def upsert_items(collection: str, items: list[dict]) -> dict:
+    """
+    Insert or replace items given as {"id", "text"}, {"id", "vector"} or
+    {"id", "quantized": {"dtype", "data", "scale"}}.
+
+    Items that fail (bad text, wrong dimension) are reported by index and
+    skipped; the rest are stored.
+    """
+    vectors: list[np.ndarray | None] = [None] * len(items)
+    errors = []
+
+    text_positions = [i for i, item in enumerate(items) if item.get("text") is not None]
+    if text_positions:
+        texts = [items[i]["text"] for i in text_positions]
+        step = settings.EMBED_MAX_BATCH_SIZE
+        results = await asyncio.gather(
+            *(
+                run_batch_embedding_task(texts[start : start + step])
+                for start in range(0, len(texts), step)
+            )
+        )
+        embedded_items = [item for result in results for item in result["data"]]
+        for i, embedded in zip(text_positions, embedded_items):
+            if embedded["error"] is None:
+                vectors[i] = embedded["embedding"]
+            else:
+                errors.append({"index": i, **embedded["error"]})
+
+    for i, item in enumerate(items):
+        if item.get("quantized") is not None:
+            try:
+                vectors[i] = quantization.dequantize(
+                    **item["quantized"], dim=EMBEDDING_DIM
+                )
+            except ValueError as exc:
+                errors.append(
+                    {
+                        "index": i,
+                        "code": ErrorCode.VAL_VECTOR_DIM_MISMATCH,
+                        "message": str(exc),
+                    }
+                )
+            continue
+        if item.get("vector") is None:
+            continue
+        vector = np.asarray(item["vector"], dtype=np.float32)
+        if vector.shape != (EMBEDDING_DIM,):
+            errors.append({"index": i, **_dim_error(vector.size)})
+        else:
+            vectors[i] = vector
+
+    ok = [i for i, vector in enumerate(vectors) if vector is not None]
+    created = 0
+    if ok:
+        store = get_collection(collection, create=True)
+        created = store.upsert(
+            [items[i]["id"] for i in ok], np.stack([vectors[i] for i in ok])
+        )
+
+    return {
+        "upserted": len(ok),
+        "created": created,
+        "errors": sorted(errors, key=lambda e: e["index"]),
+    }
+
+
+async def to_matrix(
+    texts: list[str] | None = None,
+    vectors: list[list[float]] | None = None,
+    quantized: list[dict] | None = None,
+) -> np.ndarray:
+    """
+    An (n, EMBEDDING_DIM) float32 matrix from whichever input is given:
+    texts (embedded in batches of EMBED_MAX_BATCH_SIZE, sent together),
+    float vectors, or quantized vectors. Any bad input fails the request.
+    """
+    if texts:
+        step = settings.EMBED_MAX_BATCH_SIZE
+        results = await asyncio.gather(
+            *(
+                run_batch_embedding_task(texts[i : i + step])
+                for i in range(0, len(texts), step)
+            )
+        )
+        data = [
+            {**item, "index": offset * step + item["index"]}
+            for offset, result in enumerate(results)
+            for item in result["data"]
+        ]
+        failed = [item for item in data if item["error"] is not None]
+        if failed:
+            raise ValidationException(
+                message="One or more texts could not be embedded.",
+                error_code=failed[0]["error"]["code"],
+                details={
+                    "errors": [{"index": f["index"], **f["error"]} for f in failed]
+                },
+            )
+        return np.stack([item["embedding"] for item in data])
+
+    if quantized:
+        try:
+            return np.stack(
+                [quantization.dequantize(**q, dim=EMBEDDING_DIM) for q in quantized]
+            )
+        except ValueError as exc:
+            raise ValidationException(
+                message=str(exc), error_code=ErrorCode.VAL_VECTOR_DIM_MISMATCH
+            )
+
+    for vector in vectors:
+        if len(vector) != EMBEDDING_DIM:
+            raise ValidationException(
+                message=_dim_error(len(vector))["message"],
+                error_code=ErrorCode.VAL_VECTOR_DIM_MISMATCH,
+            )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+async def search(
+    collection: str,
+    k: int,
+    queries: list[str] | None = None,
+    vectors: list[list[float]] | None = None,
+    nprobe: int | None = None,
+    quantized: list[dict] | None = None,
+) -> list[list[tuple[str, float]]]:
+    """
+    Top-k matches for each query text, query vector or quantized query
+    vector, in request order.
+    """
+    store = get_collection(collection)
+    matrix = await to_matrix(texts=queries, vectors=vectors, quantized=quantized)
+    return store.search(matrix, k, nprobe)
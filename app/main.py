@@ -1,9 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.config import settings
-from app.routers import health, ml
+from app.core import offload, precomputed, upstream
+from app.core.jobs import job_manager
+from app.routers import health, jobs, metrics, ml, similarity, stats, vectors
+from app.api.middleware import (
+    MetricsMiddleware,
+    ProfilerMiddleware,
+    ServerTimingMiddleware,
+)
 from app.api.error_handlers import (
     app_exception_handler,
     validation_exception_handler,
@@ -12,8 +21,24 @@ from app.api.error_handlers import (
 from app.core.exceptions import AppException
 from fastapi.exceptions import RequestValidationError
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client for the whole process
+    await upstream.start_client()
+    precomputed.load(settings.EMBED_STORE_PATH)
+    job_manager.start()
+    yield
+    await job_manager.stop()
+    await upstream.close_client()
+    offload.shutdown()
+
+
 app = FastAPI(
-    title=settings.PROJECT_NAME, version=settings.VERSION, docs_url=settings.DOCS_URL
+    title=settings.PROJECT_NAME,
+    version=settings.VERSION,
+    docs_url=settings.DOCS_URL,
+    lifespan=lifespan,
 )
 
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -26,9 +51,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Last added is outermost; metrics and timings wrap everything below them
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health.router)
 app.include_router(ml.router)
+app.include_router(vectors.router)
+app.include_router(similarity.router)
+app.include_router(jobs.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=settings.PORT)
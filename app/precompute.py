@@ -0,0 +1,142 @@
+"""
+Build a precomputed embedding store from a JSONL corpus.
+
+    python -m app.precompute corpus.jsonl /data/embeddings
+
+Each line of the input is {"id": ..., "text": ...}; ids must be unique.
+Texts are embedded through run_batch_embedding_task, the same path as
+/embed/batch, so the upstream, retries and validation are those of the
+service (configure them through the usual environment variables). Vectors
+are written straight into a memory-mapped vectors.npy, so building uses
+little memory beyond the id list. Point EMBED_STORE_PATH at the output
+directory to serve it from /embed/lookup; see app/core/precomputed.py for
+the layout.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.core import precomputed, upstream
+from app.core.gen_and_embed import (
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    run_batch_embedding_task,
+)
+
+
+def read_corpus(path: str):
+    """Yield (line number, id, text), skipping blank lines."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item_id, text = record.get("id"), record.get("text")
+            if item_id in (None, "") or not isinstance(text, str):
+                raise ValueError(f'line {number}: needs a non-empty "id" and a "text"')
+            yield number, str(item_id), text
+
+
+def collect_ids(path: str) -> list[str]:
+    ids, seen = [], set()
+    for number, item_id, _ in read_corpus(path):
+        if item_id in seen:
+            raise ValueError(f"line {number}: duplicate id {item_id!r}")
+        seen.add(item_id)
+        ids.append(item_id)
+    return ids
+
+
+def batches(path: str, size: int):
+    batch = []
+    for number, _, text in read_corpus(path):
+        batch.append((number, text))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def embed_into(
+    vectors: np.ndarray, path: str, batch_size: int, concurrency: int
+) -> None:
+    slots = asyncio.Semaphore(concurrency)
+    failed: list[str] = []
+
+    async def run(start: int, batch: list[tuple[int, str]]):
+        try:
+            result = await run_batch_embedding_task([text for _, text in batch])
+        finally:
+            slots.release()
+        for (number, _), item in zip(batch, result["data"]):
+            if item["error"] is None:
+                vectors[start + item["index"]] = item["embedding"]
+            else:
+                failed.append(f"line {number}: {item['error']['message']}")
+
+    tasks = set()
+    row = 0
+    for batch in batches(path, batch_size):
+        await slots.acquire()
+        task = asyncio.create_task(run(row, batch))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        row += len(batch)
+    await asyncio.gather(*tasks)
+    if failed:
+        raise ValueError("; ".join(failed[:10]))
+
+
+async def build(input_path: str, output_dir: str, batch_size: int, concurrency: int):
+    start = time.perf_counter()
+    ids = collect_ids(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+    # An interrupted rebuild must not leave an old meta.json next to new data
+    meta_path = os.path.join(output_dir, precomputed.META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(output_dir, "vectors.npy"),
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(ids), EMBEDDING_DIM),
+    )
+    await upstream.start_client()
+    try:
+        await embed_into(vectors, input_path, batch_size, concurrency)
+    finally:
+        await upstream.close_client()
+    vectors.flush()
+    del vectors
+
+    precomputed.write_index(output_dir, ids)
+    meta = {"model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM, "count": len(ids)}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return {**meta, "seconds": round(time.perf_counter() - start, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL file of {id, text} records")
+    parser.add_argument("output", help="directory to write the store to")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBED_MAX_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(
+            build(args.input, args.output, args.batch_size, args.concurrency)
+        )
+    except ValueError as exc:
+        sys.exit(f"precompute: {exc}")
+    print(json.dumps(report))
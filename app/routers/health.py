@@ -1,10 +1,19 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core import admission
 
 router = APIRouter(tags=["Health"])
 
 
 @router.get("/health/ready")
 async def health_ready():
+    # Report not-ready while shedding load so the Service routes elsewhere
+    saturated = admission.saturated_routes()
+    if saturated:
+        return JSONResponse(
+            status_code=503, content={"status": "saturated", "routes": saturated}
+        )
     return {"status": "ok"}
 
 
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Query
+
+from app.api.routing import TimedRoute
+from app.config import settings
+from app.core.jobs import job_manager
+from app.routers.schemas import JobResponse, JobSubmitParams
+
+# No admission dependency: the job queue is the bound, and long-polls would
+# otherwise hold admission slots while doing nothing
+router = APIRouter(prefix="/jobs", tags=["Jobs"], route_class=TimedRoute)
+
+
+@router.post("/generate", status_code=202)
+async def submit_generation(request: JobSubmitParams) -> JobResponse:
+    job = await job_manager.submit(request.query, request.priority)
+    return JobResponse(**job.to_dict())
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(
+        0,
+        ge=0,
+        description=(
+            "Seconds to wait for the job to finish before answering; "
+            "capped at JOBS_MAX_WAIT_SECONDS."
+        ),
+    ),
+) -> JobResponse:
+    job = await job_manager.get(job_id, min(wait, settings.JOBS_MAX_WAIT_SECONDS))
+    return JobResponse(**job.to_dict())
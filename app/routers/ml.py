@@ -1,24 +1,362 @@
-from fastapi import APIRouter
+import json
+from collections.abc import AsyncIterator
 
-from app.core.gen_and_embed import run_generation_task, run_embedding_task
+import numpy as np
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.api.dependencies import admit
+from app.api.routing import TimedRoute
+from app.config import settings
+from app.core import deadline, offload, precomputed, quantization, spool
+from app.core.encoding import (
+    BINARY_MEDIA_TYPE,
+    encode_batch_binary,
+    encode_batch_items,
+    encode_binary,
+    encode_embedding,
+    encode_ndjson,
+    encode_records,
+)
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import GatewayTimeoutException
+from app.core.gen_and_embed import (
+    EMBEDDING_DIM,
+    iter_batch_generation,
+    iter_bulk_embeddings,
+    run_batch_generation_task,
+    run_chunked_embedding_task,
+    run_generation_task,
+    run_semantic_generation_task,
+    semantic_cache,
+    stream_generation_task,
+    run_embedding_task,
+    run_batch_embedding_task,
+)
 from app.routers.schemas import (
     GenerateParams,
+    GenerationBatchItem,
+    GenerationBatchParams,
+    GenerationBatchResponse,
     GenerationResponse,
     EmbeddingResponse,
     EmbeddingParams,
+    EmbeddingBatchParams,
+    EmbeddingBatchResponse,
+    EmbeddingDtype,
+    EmbeddingLookupParams,
+    EmbeddingLookupResponse,
+    EncodingFormat,
 )
 
-router = APIRouter(tags=["ML Operations"])
+router = APIRouter(
+    tags=["ML Operations"], route_class=TimedRoute, dependencies=[Depends(admit)]
+)
 
 
 @router.post("/generate")
-async def generate(request: GenerateParams) -> GenerationResponse:
-    result = await run_generation_task(request.query)
+async def generate(
+    request: GenerateParams,
+    response: Response,
+    x_cache_bypass: bool = Header(
+        False, description="Skip the semantic cache for this request."
+    ),
+) -> GenerationResponse:
+    if semantic_cache.enabled and not x_cache_bypass:
+        result, hit = await run_semantic_generation_task(request.query)
+        response.headers["X-Semantic-Cache"] = "hit" if hit else "miss"
+    else:
+        result = await run_generation_task(request.query)
     return GenerationResponse(response=result["choices"][0]["message"]["content"])
 
 
+async def _sse_events(first: dict, chunks: AsyncIterator[dict]) -> AsyncIterator[str]:
+    try:
+        yield f"data: {json.dumps(first)}\n\n"
+        async for chunk in chunks:
+            yield f"data: {json.dumps(chunk)}\n\n"
+    except Exception as exc:
+        # Headers are already sent, so the failure has to be reported in-band
+        if isinstance(exc, GatewayTimeoutException):
+            error = {"code": exc.error_code, "message": exc.message}
+        else:
+            error = {
+                "code": ErrorCode.SYS_INTERNAL_ERROR,
+                "message": "The stream was interrupted. Please try again later.",
+            }
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        return
+    finally:
+        await chunks.aclose()
+    yield "data: [DONE]\n\n"
+
+
+@router.post("/generate/stream", response_class=StreamingResponse)
+async def generate_stream(request: GenerateParams):
+    chunks = stream_generation_task(request.query)
+    # Pull the first chunk before responding, so upstream errors still go
+    # through the normal exception handlers rather than a half-sent stream
+    first = await anext(chunks)
+    return StreamingResponse(
+        _sse_events(first, chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _ndjson_lines(first: dict, items: AsyncIterator[dict]) -> AsyncIterator[str]:
+    try:
+        yield GenerationBatchItem(**first).model_dump_json() + "\n"
+        async for item in items:
+            yield GenerationBatchItem(**item).model_dump_json() + "\n"
+    finally:
+        # Cancels the remaining upstream calls if the client went away
+        await items.aclose()
+
+
+@router.post("/generate/batch")
+async def generate_batch(request: GenerationBatchParams) -> GenerationBatchResponse:
+    if not request.stream:
+        result = await run_batch_generation_task(request.queries)
+        return GenerationBatchResponse(data=result["data"])
+
+    items = iter_batch_generation(request.queries)
+    # As with /generate/stream, a batch that is rejected outright fails
+    # before the response starts and gets the normal error envelope
+    first = await anext(items)
+    return StreamingResponse(
+        _ndjson_lines(first, items),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
+async def _embed_chunked(request: EmbeddingParams):
+    result = await run_chunked_embedding_task(
+        request.text, **request.chunking.model_dump()
+    )
+    chunks = result["chunks"]
+
+    if request.encoding_format == "binary":
+        # The pooled vector, or one row per chunk; spans go in a header
+        matrix = (
+            result["embedding"][np.newaxis]
+            if result["embedding"] is not None
+            else np.stack([chunk["embedding"] for chunk in chunks])
+        )
+        spans = [[chunk["start"], chunk["end"]] for chunk in chunks]
+        return Response(
+            encode_binary(matrix, request.dtype, request.dimensions),
+            media_type=BINARY_MEDIA_TYPE,
+            headers={"X-Embedding-Chunks": json.dumps(spans)},
+        )
+
+    encoded = await offload.run_cpu(
+        encode_batch_items,
+        chunks,
+        request.encoding_format,
+        request.dtype,
+        request.dimensions,
+        rows=len(chunks),
+    )
+    pooled = result["embedding"]
+    if pooled is None:
+        return EmbeddingResponse(embedding=None, chunks=encoded)
+    return EmbeddingResponse(
+        **encode_embedding(
+            pooled, request.encoding_format, request.dtype, request.dimensions
+        ),
+        chunks=encoded,
+    )
+
+
 @router.post("/embed")
-async def embed(request: EmbeddingParams) -> EmbeddingResponse:
+async def embed(
+    request: EmbeddingParams,
+    x_cache_bypass: bool = Header(
+        False, description="Skip the embedding cache for this request."
+    ),
+) -> EmbeddingResponse:
+    quantization.check_dimensions(request.dimensions, EMBEDDING_DIM)
+    if request.chunking is not None:
+        return await _embed_chunked(request)
+
     # Call the core logic
-    result = await run_embedding_task(request.text)
-    return EmbeddingResponse(embedding=result["embedding"])
+    result = await run_embedding_task(request.text, use_cache=not x_cache_bypass)
+    vector = np.asarray(result["embedding"], dtype=np.float32)
+
+    if request.encoding_format == "binary":
+        return Response(
+            encode_binary(vector[np.newaxis], request.dtype, request.dimensions),
+            media_type=BINARY_MEDIA_TYPE,
+        )
+    return EmbeddingResponse(
+        **encode_embedding(
+            vector, request.encoding_format, request.dtype, request.dimensions
+        )
+    )
+
+
+@router.post("/embed/batch")
+async def embed_batch(request: EmbeddingBatchParams) -> EmbeddingBatchResponse:
+    quantization.check_dimensions(request.dimensions, EMBEDDING_DIM)
+    result = await run_batch_embedding_task(request.texts)
+
+    rows = len(result["data"])
+
+    if request.encoding_format == "binary":
+        payload, errors = await offload.run_cpu(
+            encode_batch_binary,
+            result["data"],
+            EMBEDDING_DIM,
+            request.dtype,
+            request.dimensions,
+            rows=rows,
+        )
+        return Response(
+            payload,
+            media_type=BINARY_MEDIA_TYPE,
+            headers={"X-Embedding-Errors": json.dumps(errors)},
+        )
+
+    data = await offload.run_cpu(
+        encode_batch_items,
+        result["data"],
+        request.encoding_format,
+        request.dtype,
+        request.dimensions,
+        rows=rows,
+    )
+    return EmbeddingBatchResponse(data=data)
+
+
+@router.post("/embed/lookup")
+async def embed_lookup(request: EmbeddingLookupParams) -> EmbeddingLookupResponse:
+    quantization.check_dimensions(request.dimensions, EMBEDDING_DIM)
+    data = precomputed.lookup(request.ids)
+    rows = len(data)
+
+    if request.encoding_format == "binary":
+        payload, errors = await offload.run_cpu(
+            encode_batch_binary,
+            data,
+            EMBEDDING_DIM,
+            request.dtype,
+            request.dimensions,
+            rows=rows,
+        )
+        return Response(
+            payload,
+            media_type=BINARY_MEDIA_TYPE,
+            headers={"X-Embedding-Errors": json.dumps(errors)},
+        )
+
+    data = await offload.run_cpu(
+        encode_batch_items,
+        data,
+        request.encoding_format,
+        request.dtype,
+        request.dimensions,
+        rows=rows,
+    )
+    return EmbeddingLookupResponse(data=data)
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that may start sending before the request body has
+    been read.
+
+    The base class watches for client disconnects by reading receive() in
+    parallel, which would swallow body chunks the endpoint has not read
+    yet; here a disconnect surfaces through request.stream() instead.
+
+    The body is closed as soon as sending stops, so a spool.decouple() body
+    cleans up at once and reports a stream it cut short. Headers are out by
+    then, so such a response just ends early and the server drops the
+    connection.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            try:
+                await self.stream_response(send)
+            finally:
+                await self.body_iterator.aclose()
+        except GatewayTimeoutException:
+            return
+
+
+async def _bulk_embedding_body(
+    items: AsyncIterator[list[dict]],
+    encoding_format: str,
+    dtype: str,
+    dimensions: int | None,
+) -> AsyncIterator[bytes]:
+    try:
+        async for data in items:
+            if encoding_format == "binary":
+                yield await offload.run_cpu(
+                    encode_records, data, dtype, dimensions, rows=len(data)
+                )
+            else:
+                yield await offload.run_cpu(
+                    encode_ndjson,
+                    data,
+                    encoding_format,
+                    dtype,
+                    dimensions,
+                    rows=len(data),
+                )
+    finally:
+        await items.aclose()
+
+
+@router.post(
+    "/embed/stream",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def embed_stream(
+    request: Request,
+    encoding_format: EncodingFormat = Query(
+        "float",
+        description=(
+            "float or base64: NDJSON items. binary: length-prefixed records "
+            "(see app/core/encoding.py)."
+        ),
+    ),
+    dtype: EmbeddingDtype = Query("float32", description="See EmbeddingParams.dtype."),
+    dimensions: int | None = Query(
+        None,
+        ge=1,
+        le=EMBEDDING_DIM,
+        description="Truncate vectors to this many components and renormalize.",
+    ),
+):
+    """
+    Embed an NDJSON body of any size: one JSON string or {"text", "id"}
+    object per line. Results stream back per batch as they complete, each
+    tagged with the line index it answers.
+    """
+    items = iter_bulk_embeddings(request.stream())
+    body = _bulk_embedding_body(items, encoding_format, dtype, dimensions)
+    return _DuplexStreamingResponse(
+        spool.decouple(
+            body,
+            settings.EMBED_STREAM_SPOOL_BYTES,
+            settings.EMBED_STREAM_SPOOL_MAX_BYTES,
+            # The body is sent after this returns, outside the deadline scope
+            expires=deadline.expiry(),
+            stall_seconds=settings.EMBED_STREAM_STALL_SECONDS or None,
+        ),
+        media_type=(
+            BINARY_MEDIA_TYPE if encoding_format == "binary" else "application/x-ndjson"
+        ),
+        headers={"X-Accel-Buffering": "no"},
+    )
@@ -1,19 +1,361 @@
-from pydantic import BaseModel, Field
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+EncodingFormat = Literal["float", "base64", "binary"]
+EmbeddingDtype = Literal["float32", "float16", "int8", "binary"]
 
 
 class GenerateParams(BaseModel):
     query: str = Field(..., description="The search query string.")
 
 
+class ChunkingParams(BaseModel):
+    unit: Literal["chars", "tokens"] = Field(
+        "chars",
+        description="Measure windows in characters or approximate tokens.",
+    )
+    size: int = Field(512, ge=1, description="Window length in units.")
+    overlap: int = Field(64, ge=0, description="Units shared by adjacent windows.")
+    pooling: Literal["mean", "weighted_mean", "none"] = Field(
+        "mean",
+        description=(
+            "Pool chunk vectors into one document vector (weighted_mean "
+            "weights by chunk length), or none to return only chunk vectors."
+        ),
+    )
+
+    @model_validator(mode="after")
+    def _overlap_below_size(self):
+        if self.overlap >= self.size:
+            raise ValueError("'overlap' must be smaller than 'size'.")
+        return self
+
+
 class EmbeddingParams(BaseModel):
     text: str = Field(..., description="The text to be embedded.")
+    chunking: ChunkingParams | None = Field(
+        None,
+        description=(
+            "Split the text into overlapping windows and embed each one; "
+            "for documents longer than the model's context."
+        ),
+    )
+    encoding_format: EncodingFormat = Field(
+        "float",
+        description=(
+            "float: JSON list of numbers. base64: little-endian bytes as a "
+            "base64 string. binary: application/octet-stream body."
+        ),
+    )
+    dtype: EmbeddingDtype = Field(
+        "float32",
+        description=(
+            "Element type. float16 applies to base64 and binary encodings. "
+            "int8: integer codes with a per-vector 'scale' (value ~= code * "
+            "scale). binary: sign bits packed 8 per byte, most significant "
+            "bit first; compare with Hamming distance."
+        ),
+    )
+    dimensions: int | None = Field(
+        None,
+        ge=1,
+        description=(
+            "Keep only the first N components, renormalized to unit length "
+            "(Matryoshka-style truncation)."
+        ),
+    )
 
 
 class GenerationResponse(BaseModel):
     response: str = Field(..., description="The generated response based on the query.")
 
 
+class EmbeddingChunk(BaseModel):
+    index: int = Field(..., description="Position of the chunk in the text.")
+    start: int = Field(..., description="Character offset where the chunk starts.")
+    end: int = Field(..., description="Character offset where the chunk ends.")
+    embedding: list | str = Field(..., description="The chunk's embedding.")
+    scale: float | None = Field(None, description="int8 scale of the embedding.")
+
+
 class EmbeddingResponse(BaseModel):
-    embedding: list = Field(
-        ..., description="The generated embedding vector for the input text."
+    embedding: list | str | None = Field(
+        ...,
+        description=(
+            "The generated embedding vector for the input text, or its "
+            "base64 encoding when encoding_format is base64. With chunking, "
+            "the pooled document vector (null when pooling is none)."
+        ),
+    )
+    scale: float | None = Field(
+        None, description="Per-vector scale, only for the int8 dtype."
+    )
+    chunks: list[EmbeddingChunk] | None = Field(
+        None, description="Per-chunk vectors, only when chunking was requested."
+    )
+
+
+class EmbeddingBatchParams(BaseModel):
+    texts: list[str] = Field(
+        ..., min_length=1, description="The texts to be embedded, in order."
+    )
+    encoding_format: EncodingFormat = Field(
+        "float", description="Same as EmbeddingParams.encoding_format."
+    )
+    dtype: EmbeddingDtype = Field(
+        "float32", description="Same as EmbeddingParams.dtype."
+    )
+    dimensions: int | None = Field(
+        None, ge=1, description="Same as EmbeddingParams.dimensions."
+    )
+
+
+class ItemError(BaseModel):
+    code: str = Field(..., description="Machine-readable error code.")
+    message: str = Field(..., description="Why this item could not be processed.")
+
+
+class EmbeddingBatchItem(BaseModel):
+    index: int = Field(..., description="Position of the text in the request.")
+    embedding: list | str | None = Field(
+        None, description="The embedding vector, or null if this item failed."
+    )
+    scale: float | None = Field(
+        None, description="Per-vector scale, only for the int8 dtype."
+    )
+    error: ItemError | None = Field(
+        None, description="Set when this item failed; other items are unaffected."
+    )
+
+
+class EmbeddingBatchResponse(BaseModel):
+    data: list[EmbeddingBatchItem] = Field(
+        ..., description="One entry per input text, in request order."
+    )
+
+
+class GenerationBatchParams(BaseModel):
+    queries: list[str] = Field(
+        ..., min_length=1, description="The query strings to answer, in order."
+    )
+    stream: bool = Field(
+        False,
+        description=(
+            "Stream items back as NDJSON, one line per item in completion "
+            "order, instead of one JSON body in input order."
+        ),
+    )
+
+
+class GenerationBatchItem(BaseModel):
+    index: int = Field(..., description="Position of the query in the request.")
+    response: str | None = Field(
+        None, description="The generated response, or null if the item failed."
+    )
+    error: ItemError | None = Field(
+        None, description="Set when this item could not be processed."
+    )
+
+
+class GenerationBatchResponse(BaseModel):
+    data: list[GenerationBatchItem] = Field(
+        ..., description="One entry per query, in request order."
+    )
+
+
+class EmbeddingLookupParams(BaseModel):
+    ids: list[str] = Field(
+        ..., min_length=1, description="Ids of precomputed embeddings, in order."
+    )
+    encoding_format: EncodingFormat = Field(
+        "float", description="Same as EmbeddingParams.encoding_format."
+    )
+    dtype: EmbeddingDtype = Field(
+        "float32", description="Same as EmbeddingParams.dtype."
+    )
+    dimensions: int | None = Field(
+        None, ge=1, description="Same as EmbeddingParams.dimensions."
+    )
+
+
+class EmbeddingLookupItem(EmbeddingBatchItem):
+    id: str = Field(..., description="The id that was looked up.")
+
+
+class EmbeddingLookupResponse(BaseModel):
+    data: list[EmbeddingLookupItem] = Field(
+        ..., description="One entry per id, in request order."
+    )
+
+
+class IndexedItemError(ItemError):
+    index: int = Field(..., description="Position of the failed item in the request.")
+
+
+class QuantizedVector(BaseModel):
+    dtype: Literal["int8", "binary"] = Field(
+        ..., description="How the vector was quantized; see EmbeddingParams.dtype."
+    )
+    data: list[int] | str = Field(
+        ..., description="int8 codes or packed bytes, as a list or base64 string."
+    )
+    scale: float | None = Field(None, description="Per-vector scale, for int8.")
+
+    @model_validator(mode="after")
+    def _int8_has_scale(self):
+        if self.dtype == "int8" and self.scale is None:
+            raise ValueError("int8 vectors need a 'scale'.")
+        return self
+
+
+class VectorItem(BaseModel):
+    id: str = Field(..., description="Caller-chosen identifier; upserts replace it.")
+    text: str | None = Field(None, description="Text to embed and store.")
+    vector: list[float] | None = Field(
+        None, description="A ready-made vector to store instead of embedding text."
+    )
+    quantized: QuantizedVector | None = Field(
+        None,
+        description=(
+            "A ready-made int8 or binary vector, as returned by /embed; "
+            "stored dequantized."
+        ),
+    )
+
+    @model_validator(mode="after")
+    def _text_or_vector(self):
+        given = [self.text, self.vector, self.quantized]
+        if sum(value is not None for value in given) != 1:
+            raise ValueError("Provide exactly one of 'text', 'vector' or 'quantized'.")
+        return self
+
+
+class VectorUpsertParams(BaseModel):
+    collection: str = Field("default", description="Collection to write to.")
+    items: list[VectorItem] = Field(..., min_length=1)
+
+
+class VectorUpsertResponse(BaseModel):
+    upserted: int = Field(..., description="Items stored (new or replaced).")
+    created: int = Field(..., description="Items whose id was not stored before.")
+    errors: list[IndexedItemError] = Field(
+        default_factory=list, description="Items that could not be stored."
+    )
+
+
+class VectorSearchParams(BaseModel):
+    collection: str = Field("default", description="Collection to search.")
+    queries: list[str] | None = Field(
+        None, min_length=1, description="Query texts, embedded before searching."
+    )
+    vectors: list[list[float]] | None = Field(
+        None, min_length=1, description="Query vectors, used as-is."
+    )
+    quantized: list[QuantizedVector] | None = Field(
+        None, min_length=1, description="int8 or binary query vectors."
+    )
+    k: int = Field(10, ge=1, le=1000, description="Matches to return per query.")
+    nprobe: int | None = Field(
+        None, ge=1, description="IVF clusters to scan; higher is slower but exact-er."
+    )
+
+    @model_validator(mode="after")
+    def _queries_or_vectors(self):
+        given = [self.queries, self.vectors, self.quantized]
+        if sum(value is not None for value in given) != 1:
+            raise ValueError(
+                "Provide exactly one of 'queries', 'vectors' or 'quantized'."
+            )
+        return self
+
+
+class VectorMatch(BaseModel):
+    id: str
+    score: float = Field(..., description="Cosine similarity to the query.")
+
+
+class VectorSearchResponse(BaseModel):
+    results: list[list[VectorMatch]] = Field(
+        ..., description="Best matches first, one list per query."
+    )
+
+
+class SimilarityInputs(BaseModel):
+    texts: list[str] | None = Field(
+        None, min_length=1, description="Texts, embedded before comparing."
+    )
+    vectors: list[list[float]] | None = Field(
+        None, min_length=1, description="Ready-made vectors, used as-is."
+    )
+    quantized: list[QuantizedVector] | None = Field(
+        None, min_length=1, description="int8 or binary vectors."
+    )
+
+    @model_validator(mode="after")
+    def _one_input(self):
+        given = [self.texts, self.vectors, self.quantized]
+        if sum(value is not None for value in given) != 1:
+            raise ValueError(
+                "Provide exactly one of 'texts', 'vectors' or 'quantized'."
+            )
+        return self
+
+
+class SimilarityParams(SimilarityInputs):
+    corpus: SimilarityInputs | None = Field(
+        None,
+        description=(
+            "Compare the inputs against these instead of against each other; "
+            "the result is then inputs x corpus."
+        ),
+    )
+
+
+class SimilarityResponse(BaseModel):
+    scores: list[list[float]] = Field(
+        ..., description="Cosine similarities, one row per input, in request order."
+    )
+
+
+class DedupParams(SimilarityInputs):
+    threshold: float = Field(
+        0.95,
+        gt=0,
+        le=1,
+        description="Cosine similarity at which two items count as duplicates.",
+    )
+
+
+class DedupResponse(BaseModel):
+    clusters: list[list[int]] = Field(
+        ...,
+        description=(
+            "Groups of near-duplicate input indices, each sorted, ordered by "
+            "first member. Items without duplicates are left out."
+        ),
+    )
+    method: Literal["exact", "lsh"] = Field(
+        ..., description="exact compares all pairs; lsh only likely candidates."
+    )
+    comparisons: int = Field(..., description="Pairwise similarities computed.")
+
+
+class JobSubmitParams(GenerateParams):
+    priority: int = Field(
+        0, ge=0, le=9, description="Higher runs sooner; FIFO within a priority."
+    )
+
+
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Job identifier to poll with GET /jobs/{id}.")
+    kind: str = Field(..., description="What the job runs, e.g. generate.")
+    status: Literal["queued", "running", "succeeded", "failed"]
+    priority: int
+    created_at: float = Field(..., description="Unix time the job was accepted.")
+    started_at: float | None = Field(None, description="Unix time a worker took it.")
+    finished_at: float | None = Field(None, description="Unix time it finished.")
+    result: GenerationResponse | None = Field(
+        None, description="Set once the job has succeeded."
     )
+    error: ItemError | None = Field(None, description="Set if the job failed.")
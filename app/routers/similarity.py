@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+
+from app.api.dependencies import admit
+from app.api.routing import TimedRoute
+from app.config import settings
+from app.core import offload, similarity
+from app.routers.schemas import (
+    DedupParams,
+    DedupResponse,
+    SimilarityInputs,
+    SimilarityParams,
+    SimilarityResponse,
+)
+
+router = APIRouter(
+    tags=["Similarity"], route_class=TimedRoute, dependencies=[Depends(admit)]
+)
+
+
+def _inputs(request: SimilarityInputs) -> dict:
+    quantized = request.quantized
+    return {
+        "texts": request.texts,
+        "vectors": request.vectors,
+        "quantized": [q.model_dump() for q in quantized] if quantized else None,
+    }
+
+
+@router.post("/similarity")
+async def pairwise_similarity(request: SimilarityParams) -> SimilarityResponse:
+    corpus = _inputs(request.corpus) if request.corpus is not None else None
+    queries, corpus = await similarity.load_pair(_inputs(request), corpus)
+    scores = await offload.run_cpu(
+        similarity.cosine_matrix,
+        queries,
+        corpus,
+        settings.SIMILARITY_CHUNK_ROWS,
+        rows=len(queries),
+    )
+    return SimilarityResponse(scores=scores.tolist())
+
+
+@router.post("/dedup")
+async def dedup(request: DedupParams) -> DedupResponse:
+    matrix = await similarity.load(_inputs(request))
+    result = await offload.run_cpu(
+        similarity.cluster,
+        matrix,
+        request.threshold,
+        settings.DEDUP_EXACT_MAX_ITEMS,
+        settings.DEDUP_LSH_BITS,
+        settings.DEDUP_LSH_TABLES,
+        settings.SIMILARITY_CHUNK_ROWS,
+        rows=len(matrix),
+    )
+    return DedupResponse(**result)
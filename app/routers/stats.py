@@ -0,0 +1,80 @@
+from fastapi import APIRouter
+
+from app.core import (
+    admission,
+    balancer,
+    concurrency,
+    precomputed,
+    resilience,
+    upstream,
+    vectors,
+)
+from app.core.gen_and_embed import (
+    embedding_batcher,
+    embedding_cache,
+    generation_flight,
+    semantic_cache,
+)
+from app.core.jobs import job_manager
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+@router.get("/upstream")
+async def upstream_stats():
+    return upstream.pool_stats()
+
+
+@router.get("/backends")
+async def backend_stats():
+    return {name: pool.stats() for name, pool in balancer.pools.items()}
+
+
+@router.get("/upstream-policy")
+async def upstream_policy_stats():
+    return {model: policy.stats() for model, policy in resilience.policies.items()}
+
+
+@router.get("/upstream-limits")
+async def upstream_limit_stats():
+    return {model: limiter.stats() for model, limiter in concurrency.limiters.items()}
+
+
+@router.get("/embed-batcher")
+async def embed_batcher_stats():
+    return embedding_batcher.stats()
+
+
+@router.get("/embed-cache")
+async def embed_cache_stats():
+    return embedding_cache.stats()
+
+
+@router.get("/embed-store")
+async def embed_store_stats():
+    return precomputed.store.stats() if precomputed.store is not None else None
+
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    return semantic_cache.stats()
+
+
+@router.get("/generate-coalescing")
+async def generate_coalescing_stats():
+    return generation_flight.stats()
+
+
+@router.get("/vectors")
+async def vector_stats():
+    return {name: store.stats() for name, store in vectors.collections.items()}
+
+
+@router.get("/admission")
+async def admission_stats():
+    return {name: limiter.stats() for name, limiter in admission.limiters.items()}
+
+
+@router.get("/jobs")
+async def job_stats():
+    return job_manager.stats()
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+
+from app.api.dependencies import admit
+from app.api.routing import TimedRoute
+from app.core import vectors
+from app.routers.schemas import (
+    VectorMatch,
+    VectorSearchParams,
+    VectorSearchResponse,
+    VectorUpsertParams,
+    VectorUpsertResponse,
+)
+
+router = APIRouter(
+    prefix="/vectors",
+    tags=["Vector Search"],
+    route_class=TimedRoute,
+    dependencies=[Depends(admit)],
+)
+
+
+@router.post("/upsert")
+async def upsert(request: VectorUpsertParams) -> VectorUpsertResponse:
+    items = [item.model_dump() for item in request.items]
+    result = await vectors.upsert_items(request.collection, items)
+    return VectorUpsertResponse(**result)
+
+
+@router.post("/search")
+async def search(request: VectorSearchParams) -> VectorSearchResponse:
+    results = await vectors.search(
+        request.collection,
+        request.k,
+        queries=request.queries,
+        vectors=request.vectors,
+        nprobe=request.nprobe,
+        quantized=(
+            [q.model_dump() for q in request.quantized] if request.quantized else None
+        ),
+    )
+    return VectorSearchResponse(
+        results=[
+            [VectorMatch(id=vector_id, score=score) for vector_id, score in hits]
+            for hits in results
+        ]
+    )
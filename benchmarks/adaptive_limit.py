@@ -0,0 +1,177 @@
+"""
+Adaptive upstream concurrency limits under an injected upstream slowdown.
+
+Starts benchmarks/upstream_stub.py with a fixed capacity (requests it
+serves at once; the rest queue inside it, like a saturated model server)
+and, for each limiter algorithm, a fresh app in front of it. Load is open
+loop at a fixed rate through three phases: normal, slowdown (the stub's
+latency is raised through PUT /control, which cuts its throughput) and
+recovery. Each phase reports client latency, statuses and the limit the
+app settled on, read from /stats/upstream-limits.
+
+    python -m benchmarks.adaptive_limit --rps 30 --phase-seconds 10
+    python -m benchmarks.adaptive_limit --algorithms off,gradient --slow-ms 300
+
+Stub, app and load generator share the machine, so keep the rate well
+below what the app can serve on its own; the point is to overload the
+stub, not the host.
+
+Without a limit the stub's queue grows for as long as the slowdown lasts,
+so every request waits behind it and the backlog outlives the slowdown.
+With one, excess requests wait briefly in the app and are then shed with a
+fast 503, while the ones admitted keep close to the stub's service time.
+Admission control is switched off so it does not mask the limiter.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.load import SCENARIOS, Recorder, _spawn, _wait_ready, summarize
+
+PHASES = ("normal", "slowdown", "recovery")
+MODEL = "mock-gemma3:4b"
+
+
+async def _sample_limits(client, samples: dict, phase_of, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            response = await client.get("/stats/upstream-limits")
+        except httpx.HTTPError:
+            # An overloaded app may drop this too; skip the sample
+            response = None
+        stats = response.json().get(MODEL) if response is not None else None
+        phase = phase_of(time.perf_counter())
+        if stats is not None and phase is not None:
+            samples[phase].append(stats["limit"])
+        await asyncio.sleep(0.25)
+
+
+async def run(algorithm: str, args) -> dict:
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    stub = _spawn(
+        "benchmarks.upstream_stub:app",
+        args.stub_port,
+        {"STUB_CAPACITY": str(args.capacity), "STUB_LATENCY_MS": str(args.base_ms)},
+    )
+    app = _spawn(
+        "app.main:app",
+        args.app_port,
+        {
+            "UPSTREAM_URL": f"{stub_url}/post",
+            "UPSTREAM_LIMIT_ALGORITHM": algorithm,
+            "ADMISSION_MAX_CONCURRENT": "0",
+        },
+    )
+    recorders = {phase: Recorder() for phase in PHASES}
+    limits = {phase: [] for phase in PHASES}
+    path, build = SCENARIOS["generate"]
+    try:
+        await _wait_ready(f"{stub_url}/docs")
+        await _wait_ready(f"{base_url}/health/live")
+
+        limits_http = httpx.Limits(max_connections=args.max_connections)
+        async with (
+            httpx.AsyncClient(
+                base_url=base_url, limits=limits_http, timeout=args.timeout
+            ) as client,
+            httpx.AsyncClient(base_url=stub_url) as stub_client,
+        ):
+            start = time.perf_counter() + args.warmup
+
+            def phase_of(moment: float) -> str | None:
+                index = int((moment - start) // args.phase_seconds)
+                return PHASES[index] if 0 <= index < len(PHASES) else None
+
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(
+                _sample_limits(client, limits, phase_of, stop)
+            )
+            tasks = set()
+            total = int(args.rps * (args.warmup + len(PHASES) * args.phase_seconds))
+            origin = time.perf_counter()
+            current = None
+            for i in range(total):
+                scheduled = origin + i / args.rps
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                phase = phase_of(scheduled)
+                if phase != current:
+                    current = phase
+                    latency = args.slow_ms if phase == "slowdown" else args.base_ms
+                    await stub_client.put("/control", json={"latency_ms": latency})
+                # Warmup requests go to a throwaway recorder
+                recorder = recorders[phase] if phase else Recorder()
+                task = asyncio.create_task(
+                    recorder.send(client, path, build(i, 0), scheduled)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+            stop.set()
+            await sampler
+    finally:
+        for process in (app, stub):
+            process.terminate()
+            process.wait()
+
+    report = {}
+    for phase in PHASES:
+        samples = np.asarray(limits[phase])
+        report[phase] = {
+            **summarize(recorders[phase], args.phase_seconds),
+            "limit": (
+                {
+                    "mean": float(samples.mean()),
+                    "min": float(samples.min()),
+                    "max": float(samples.max()),
+                }
+                if samples.size
+                else None
+            ),
+        }
+    return report
+
+
+async def main(args) -> dict:
+    report = {
+        "rps": args.rps,
+        "capacity": args.capacity,
+        "base_ms": args.base_ms,
+        "slow_ms": args.slow_ms,
+        "phase_seconds": args.phase_seconds,
+    }
+    for algorithm in args.algorithms.split(","):
+        report[algorithm] = await run(algorithm, args)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--algorithms", default="off,aimd,gradient", help="comma-separated"
+    )
+    parser.add_argument("--rps", type=float, default=30)
+    parser.add_argument("--phase-seconds", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=3, help="seconds, discarded")
+    parser.add_argument("--capacity", type=int, default=2, help="stub slots")
+    parser.add_argument("--base-ms", type=float, default=20, help="normal latency")
+    parser.add_argument("--slow-ms", type=float, default=150, help="slowdown latency")
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--stub-port", type=int, default=9000)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
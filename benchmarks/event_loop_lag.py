@@ -0,0 +1,89 @@
+"""
+Event-loop lag with and without off-loading embedding work.
+
+A ticker coroutine sleeps 1 ms in a loop and records how late it wakes up
+while large embedding batches are built and serialized concurrently. With
+EMBED_OFFLOAD=none that work runs on the loop and the ticker's lag grows to
+the length of a whole batch; with "thread" or "process" it should stay near
+the scheduler's resolution.
+
+    python -m benchmarks.event_loop_lag --batch-size 2048 --batches 16
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.core import offload
+from app.core.encoding import encode_batch_items
+from app.core.gen_and_embed import build_embeddings
+
+TICK_S = 0.001
+
+
+def build_and_serialize(texts: list[str]) -> list[dict]:
+    vectors = build_embeddings(texts)
+    data = [{"index": i, "embedding": v, "error": None} for i, v in enumerate(vectors)]
+    return encode_batch_items(data, "float")
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append((time.perf_counter() - start - TICK_S) * 1000)
+
+
+async def run(mode: str, batch_size: int, batches: int, workers: int) -> dict:
+    offload.shutdown()
+    settings.EMBED_OFFLOAD = mode
+    settings.EMBED_OFFLOAD_WORKERS = workers
+    settings.EMBED_OFFLOAD_MIN_ROWS = 1
+
+    # Distinct lengths so every row is generated rather than reused
+    texts = ["x" * (i + 1) for i in range(batch_size)]
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            offload.run_cpu(build_and_serialize, texts, rows=batch_size)
+            for _ in range(batches)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    offload.shutdown()
+
+    lag = np.array(lags or [0.0])
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "ticks": len(lags),
+        "lag_ms_p50": round(float(np.percentile(lag, 50)), 3),
+        "lag_ms_p99": round(float(np.percentile(lag, 99)), 3),
+        "lag_ms_max": round(float(lag.max()), 3),
+    }
+
+
+async def main(args) -> list[dict]:
+    return [
+        await run(mode, args.batch_size, args.batches, args.workers)
+        for mode in args.modes
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--batches", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", default=["none", "thread", "process"])
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
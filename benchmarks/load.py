@@ -0,0 +1,297 @@
+"""
+Load generator for the API, with JSON results for comparing builds.
+
+Drives one scenario at a fixed request rate (open loop: requests are sent
+on schedule whether or not earlier ones finished, and latency is measured
+from the scheduled send time so a stalled server cannot hide its queueing)
+or at a fixed concurrency (closed loop: N workers back to back).
+
+    python -m benchmarks.load --scenario generate --rps 200 --duration 30
+    python -m benchmarks.load --scenario embed-batch --concurrency 16
+
+With --spawn it starts benchmarks/upstream_stub.py and the app itself as
+subprocesses, so a run needs nothing else and server CPU per request can be
+read from /proc (Linux only; null elsewhere). Stub latency and error rate
+come from the STUB_* variables documented in upstream_stub.py, and any
+app setting can be passed through the environment as usual.
+
+Payloads are unique per request unless --distinct is set, so the embedding
+cache and generation coalescing do not flatter the numbers by accident.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+
+import httpx
+import numpy as np
+
+PROMPT = "the quick brown fox jumps over the lazy dog"
+
+
+def _text(i: int) -> str:
+    return f"{PROMPT} #{i}"
+
+
+# name -> (path, body builder taking (request number, batch size))
+SCENARIOS: dict[str, tuple[str, Callable[[int, int], dict]]] = {
+    "generate": ("/generate", lambda i, n: {"query": _text(i)}),
+    "generate-stream": ("/generate/stream", lambda i, n: {"query": _text(i)}),
+    "generate-batch": (
+        "/generate/batch",
+        lambda i, n: {"queries": [_text(i * n + j) for j in range(n)]},
+    ),
+    "embed": ("/embed", lambda i, n: {"text": _text(i)}),
+    "embed-base64": (
+        "/embed",
+        lambda i, n: {"text": _text(i), "encoding_format": "base64"},
+    ),
+    "embed-batch": (
+        "/embed/batch",
+        lambda i, n: {"texts": [_text(i * n + j) for j in range(n)]},
+    ),
+    "embed-batch-binary": (
+        "/embed/batch",
+        lambda i, n: {
+            "texts": [_text(i * n + j) for j in range(n)],
+            "encoding_format": "binary",
+        },
+    ),
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: Counter = Counter()
+
+    async def send(
+        self, client: httpx.AsyncClient, path: str, body: dict, scheduled: float
+    ) -> None:
+        try:
+            async with client.stream("POST", path, json=body) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+            self.statuses[str(response.status_code)] += 1
+        except httpx.HTTPError as exc:
+            self.statuses[type(exc).__name__] += 1
+        self.latencies.append(time.perf_counter() - scheduled)
+
+
+async def run_rps(client, recorder, scenario, rps, duration, batch_size, distinct):
+    path, build = SCENARIOS[scenario]
+    tasks = set()
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        body = build(i % distinct if distinct else i, batch_size)
+        task = asyncio.create_task(recorder.send(client, path, body, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+async def run_concurrency(
+    client, recorder, scenario, concurrency, duration, batch_size, distinct
+):
+    path, build = SCENARIOS[scenario]
+    deadline = time.perf_counter() + duration
+    counter = iter(range(sys.maxsize))
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            body = build(i % distinct if distinct else i, batch_size)
+            await recorder.send(client, path, body, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def _process_cpu_seconds(pid: int) -> float | None:
+    """utime + stime of a process from /proc, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _spawn(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port)],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 15.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    latencies = np.asarray(recorder.latencies) * 1000
+    requests = len(latencies)
+    ok = sum(n for status, n in recorder.statuses.items() if status.startswith("2"))
+    names = ("p50", "p95", "p99", "p999")
+    percentiles = (
+        dict(zip(names, np.percentile(latencies, [50, 95, 99, 99.9]).tolist()))
+        if requests
+        else dict.fromkeys(names)
+    )
+    return {
+        "requests": requests,
+        "ok": ok,
+        "error_rate": (requests - ok) / requests if requests else 0.0,
+        "statuses": dict(recorder.statuses),
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": float(latencies.mean()) if requests else None,
+            **percentiles,
+            "max": float(latencies.max()) if requests else None,
+        },
+    }
+
+
+async def main(args) -> dict:
+    processes = []
+    server_pid = args.server_pid
+    base_url = args.base_url
+    if args.spawn:
+        stub = _spawn("benchmarks.upstream_stub:app", args.stub_port, {})
+        app = _spawn(
+            "app.main:app",
+            args.app_port,
+            {"UPSTREAM_URL": f"http://127.0.0.1:{args.stub_port}/post"},
+        )
+        processes = [stub, app]
+        server_pid = app.pid
+        base_url = f"http://127.0.0.1:{args.app_port}"
+
+    try:
+        if args.spawn:
+            await _wait_ready(f"http://127.0.0.1:{args.stub_port}/docs")
+            await _wait_ready(f"{base_url}/health/live")
+
+        limits = httpx.Limits(max_connections=args.max_connections)
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=args.timeout
+        ) as client:
+            if args.rps:
+                runner, load = run_rps, args.rps
+            else:
+                runner, load = run_concurrency, args.concurrency
+
+            if args.warmup:
+                await runner(
+                    client,
+                    Recorder(),
+                    args.scenario,
+                    load,
+                    args.warmup,
+                    args.batch_size,
+                    args.distinct,
+                )
+
+            recorder = Recorder()
+            server_cpu = server_pid and _process_cpu_seconds(server_pid)
+            client_cpu = time.process_time()
+            start = time.perf_counter()
+            await runner(
+                client,
+                recorder,
+                args.scenario,
+                load,
+                args.duration,
+                args.batch_size,
+                args.distinct,
+            )
+            elapsed = time.perf_counter() - start
+            client_cpu = time.process_time() - client_cpu
+            server_cpu_end = server_pid and _process_cpu_seconds(server_pid)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "revision": _git_revision(),
+        "label": args.label,
+        "scenario": args.scenario,
+        "mode": "rps" if args.rps else "concurrency",
+        "target": load,
+        "batch_size": args.batch_size if "batch" in args.scenario else None,
+        **summarize(recorder, elapsed),
+    }
+    requests = report["requests"] or 1
+    report["client_cpu_ms_per_request"] = client_cpu * 1000 / requests
+    report["server_cpu_ms_per_request"] = (
+        (server_cpu_end - server_cpu) * 1000 / requests
+        if server_cpu is not None and server_cpu_end is not None
+        else None
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="generate")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, help="fixed request rate (open loop)")
+    load.add_argument(
+        "--concurrency", type=int, default=10, help="fixed concurrency (closed loop)"
+    )
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds, discarded")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--distinct", type=int, default=0, help="cycle N payloads (0 = all unique)"
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--server-pid", type=int, help="app PID, for server CPU")
+    parser.add_argument("--spawn", action="store_true", help="start stub and app")
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--stub-port", type=int, default=9000)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--label", help="free-form tag stored in the report")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
@@ -0,0 +1,49 @@
+"""
+Measure time-to-first-byte vs total time for /generate and /generate/stream.
+
+    python -m benchmarks.ttfb --base-url http://127.0.0.1:8000 --runs 20
+
+Start the app against benchmarks/upstream_stub.py with a chunk delay to make
+the difference visible.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+PROMPT = "the quick brown fox jumps over the lazy dog " * 4
+
+
+async def _measure(client: httpx.AsyncClient, path: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", path, json={"query": PROMPT}) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    return first_byte, time.perf_counter() - start
+
+
+async def main(base_url: str, runs: int) -> dict:
+    report = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for path in ("/generate", "/generate/stream"):
+            samples = [await _measure(client, path) for _ in range(runs)]
+            report[path] = {
+                "ttfb_ms_p50": statistics.median(s[0] for s in samples) * 1000,
+                "total_ms_p50": statistics.median(s[1] for s in samples) * 1000,
+            }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.base_url, args.runs)), indent=2))
@@ -0,0 +1,134 @@
+"""
+Local stand-in for the httpbin upstream.
+
+Behaves like https://httpbin.org/post for the calls gen_and_embed makes:
+the JSON body is echoed back under "json". Requests with "stream": true get
+an Ollama-style NDJSON stream instead, one {"response": word, "done": false}
+line per word of the prompt, so time-to-first-byte can be measured.
+
+Run it and point the app at it:
+
+    uvicorn benchmarks.upstream_stub:app --port 9000
+    UPSTREAM_URL=http://127.0.0.1:9000/post uvicorn app.main:app
+
+Settings (environment variables, overridable per request via query params):
+    STUB_LATENCY_MS      mean delay before the response starts  (default 0)
+    STUB_LATENCY_DIST    fixed | uniform | exponential | lognormal
+                         (default fixed); uniform spans 0..2x the mean,
+                         lognormal has a heavy tail set by STUB_LATENCY_SIGMA
+    STUB_LATENCY_SIGMA   lognormal shape parameter              (default 0.5)
+    STUB_ERROR_RATE      fraction of requests answered with a 503 (default 0)
+    STUB_CHUNK_DELAY_MS  delay between streamed chunks          (default 50)
+    STUB_SEED            seed for latency and error draws       (default 0)
+    STUB_CAPACITY        requests served at once; the rest wait their turn,
+                         as on a saturated model server    (default 0 = no limit)
+
+PUT /control with a JSON object of any of latency_ms, latency_dist,
+error_rate and chunk_delay_ms changes the defaults while the stub runs, to
+inject a slowdown or an error burst mid-benchmark. GET /control shows them.
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+LATENCY_DIST = os.getenv("STUB_LATENCY_DIST", "fixed")
+LATENCY_SIGMA = float(os.getenv("STUB_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+CHUNK_DELAY_MS = float(os.getenv("STUB_CHUNK_DELAY_MS", "50"))
+
+CAPACITY = int(os.getenv("STUB_CAPACITY", "0"))
+
+_rng = random.Random(int(os.getenv("STUB_SEED", "0")))
+_slots = asyncio.Semaphore(CAPACITY) if CAPACITY > 0 else None
+
+# Runtime defaults, changed through PUT /control
+control = {
+    "latency_ms": LATENCY_MS,
+    "latency_dist": LATENCY_DIST,
+    "error_rate": ERROR_RATE,
+    "chunk_delay_ms": CHUNK_DELAY_MS,
+}
+
+app = FastAPI(title="Upstream stub")
+
+
+def sample_latency_ms(mean_ms: float, dist: str, sigma: float = LATENCY_SIGMA) -> float:
+    """Draw one delay whose mean is mean_ms under the given distribution."""
+    if mean_ms <= 0 or dist == "fixed":
+        return max(mean_ms, 0.0)
+    if dist == "uniform":
+        return _rng.uniform(0, 2 * mean_ms)
+    if dist == "exponential":
+        return _rng.expovariate(1 / mean_ms)
+    if dist == "lognormal":
+        # Choose mu so the distribution's mean, not its median, is mean_ms
+        mu = math.log(mean_ms) - sigma**2 / 2
+        return _rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution '{dist}'")
+
+
+async def _stream_words(model: str, prompt: str, chunk_delay_ms: float):
+    words = prompt.split(" ")
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(chunk_delay_ms / 1000)
+        token = word if i == len(words) - 1 else word + " "
+        yield json.dumps({"model": model, "response": token, "done": False}) + "\n"
+    yield json.dumps({"model": model, "response": "", "done": True}) + "\n"
+
+
+@app.get("/control")
+async def get_control():
+    return control
+
+
+@app.put("/control")
+async def put_control(request: Request):
+    updates = await request.json()
+    unknown = set(updates) - set(control)
+    if unknown:
+        return JSONResponse({"error": f"unknown keys {sorted(unknown)}"}, 400)
+    control.update(updates)
+    return control
+
+
+@app.post("/post")
+async def post(
+    request: Request,
+    latency_ms: float | None = None,
+    latency_dist: str | None = None,
+    error_rate: float | None = None,
+    chunk_delay_ms: float | None = None,
+):
+    payload = await request.json()
+    latency_ms = control["latency_ms"] if latency_ms is None else latency_ms
+    latency_dist = latency_dist or control["latency_dist"]
+    error_rate = control["error_rate"] if error_rate is None else error_rate
+    if chunk_delay_ms is None:
+        chunk_delay_ms = control["chunk_delay_ms"]
+
+    delay_ms = sample_latency_ms(latency_ms, latency_dist)
+    if _slots is None:
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+    else:
+        # Service time is spent holding a slot, so excess load queues here
+        async with _slots:
+            await asyncio.sleep(delay_ms / 1000)
+
+    if error_rate and _rng.random() < error_rate:
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+
+    if payload.get("stream"):
+        return StreamingResponse(
+            _stream_words(payload.get("model", ""), payload["prompt"], chunk_delay_ms),
+            media_type="application/x-ndjson",
+        )
+    return JSONResponse({"json": payload, "url": str(request.url)})
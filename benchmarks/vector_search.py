@@ -0,0 +1,96 @@
+"""
+Latency vs recall for VectorStore exact and IVF search.
+
+Builds a clustered synthetic collection, then times batched top-k search
+with exact scoring and with IVF at several nprobe values, reporting
+recall@k against the exact results.
+
+    python -m benchmarks.vector_search --size 100000 --dim 512 --queries 64
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.core.vector_store import VectorStore
+
+
+def clustered(n: int, dim: int, clusters: int, rng: np.random.Generator):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def timed_search(store: VectorStore, queries: np.ndarray, k: int, nprobe=None):
+    start = time.perf_counter()
+    results = store.search(queries, k, nprobe)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return results, elapsed_ms
+
+
+def recall(exact, approx, k: int) -> float:
+    return float(
+        np.mean(
+            [
+                len({i for i, _ in a} & {i for i, _ in e}) / k
+                for a, e in zip(approx, exact)
+            ]
+        )
+    )
+
+
+def main(args) -> dict:
+    rng = np.random.default_rng(0)
+    data = clustered(args.size, args.dim, args.clusters, rng)
+    queries = clustered(args.queries, args.dim, args.clusters, rng)
+    ids = [str(i) for i in range(args.size)]
+
+    exact_store = VectorStore(args.dim, ivf_min_size=args.size + 1)
+    exact_store.upsert(ids, data)
+
+    start = time.perf_counter()
+    ivf_store = VectorStore(args.dim, ivf_min_size=1, nlist=args.nlist)
+    ivf_store.upsert(ids, data)
+    ivf_store.search(queries[:1], args.k)  # build the cluster lists
+    build_s = time.perf_counter() - start
+
+    exact, exact_ms = timed_search(exact_store, queries, args.k)
+    rows = [{"index": "exact", "nprobe": None, "latency_ms": exact_ms, "recall": 1.0}]
+    for nprobe in args.nprobe:
+        approx, ms = timed_search(ivf_store, queries, args.k, nprobe)
+        rows.append(
+            {
+                "index": "ivf",
+                "nprobe": nprobe,
+                "latency_ms": ms,
+                "recall": recall(exact, approx, args.k),
+            }
+        )
+
+    for row in rows:
+        row["latency_ms"] = round(row["latency_ms"], 2)
+        row["latency_ms_per_query"] = round(row["latency_ms"] / args.queries, 3)
+        row["recall"] = round(row["recall"], 4)
+    return {
+        "size": args.size,
+        "dim": args.dim,
+        "queries": args.queries,
+        "k": args.k,
+        "nlist": ivf_store.stats()["nlist"],
+        "ivf_build_s": round(build_s, 2),
+        "results": rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -4,7 +4,8 @@ conftest.py
 Key change from before: we now have TWO levels of mocking needed.
 
 1. For UNIT tests of gen_and_embed.py:
-   Mock httpx.AsyncClient so no real HTTP call is made.
+   Mock the shared upstream client (app.core.upstream.get_client) so no
+   real HTTP call is made.
 
 2. For INTEGRATION tests of routes (ml.py):
    Mock run_generation_task / run_embedding_task at app.routers.ml
@@ -35,6 +36,47 @@ def client(app):
         yield test_client
 
 
+@pytest.fixture(autouse=True)
+def clear_embedding_cache():
+    """
+    The embedding cache is process-wide, so a vector cached by one test
+    would turn the next test's upstream call into a cache hit. Start every
+    test with it empty.
+    """
+    from app.core.gen_and_embed import embedding_cache
+
+    embedding_cache.clear()
+    yield
+    embedding_cache.clear()
+
+
+@pytest.fixture
+def semantic_cache(monkeypatch):
+    """Turn the (normally disabled) semantic cache on, empty, for one test."""
+    from app.core.gen_and_embed import semantic_cache
+
+    monkeypatch.setattr(semantic_cache, "capacity", 16)
+    semantic_cache.clear()
+    yield semantic_cache
+    semantic_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_policies():
+    """
+    Breakers, retry budgets and concurrency limits are per process too;
+    without a reset, the failure tests would open the breaker (and shrink
+    the limit) for every test after them.
+    """
+    from app.core import concurrency, resilience
+
+    resilience.policies.clear()
+    concurrency.limiters.clear()
+    yield
+    resilience.policies.clear()
+    concurrency.limiters.clear()
+
+
 # ---------------------------------------------------------------------------
 # Canonical response shapes
 #
@@ -65,20 +107,31 @@ MOCK_EMBEDDING_RESPONSE = {
     "embedding": [0.1] * 512,
 }
 
+MOCK_BATCH_EMBEDDING_RESPONSE = {
+    "object": "list",
+    "model": "mock-embeddinggemma",
+    "data": [
+        {"index": 0, "embedding": [0.1] * 512, "error": None},
+        {
+            "index": 1,
+            "embedding": None,
+            "error": {"code": "VAL_INPUT_001", "message": "Text is empty."},
+        },
+    ],
+}
+
 
 # ---------------------------------------------------------------------------
 # httpx mock helpers
 #
-# Your functions use httpx as an async context manager:
+# Your functions use the process-wide pooled client:
 #
-#   async with httpx.AsyncClient() as client:
-#       response = await client.post(...)
+#   client = upstream.get_client()
+#   response = await client.post(...)
 #
-# To mock this you need to mock THREE things:
-#   1. httpx.AsyncClient() constructor call
-#   2. __aenter__ (the `async with` entry — returns the client object)
-#   3. __aexit__  (the `async with` exit — cleanup)
-#   4. client.post() (the actual call inside the block)
+# To mock this you patch app.core.upstream.get_client to return a mock
+# client whose post() returns a fake response. The async context manager
+# methods are kept so the same mock also works for `async with` callers.
 # ---------------------------------------------------------------------------
 
 
@@ -97,9 +150,11 @@ def _make_httpbin_response(echoed_json: dict) -> MagicMock:
     Build a fake httpx.Response that mimics what httpbin.org/post returns.
 
     httpbin echoes your POST body back under the "json" key:
-        POST {"prompt": "hello"}  →  response.json() == {"json": {"prompt": "hello"}, ...}
+        POST {"prompt": "hello"}
+            →  response.json() == {"json": {"prompt": "hello"}, ...}
     """
     mock_response = MagicMock(spec=httpx.Response)
+    mock_response.status_code = 200
     mock_response.raise_for_status = MagicMock()  # no-op — simulates 200 OK
     mock_response.json.return_value = {"json": echoed_json}
     return mock_response
@@ -117,7 +172,7 @@ def mock_httpx_generation():
     response = _make_httpbin_response(echoed)
     mock_client = _make_mock_client(response)
 
-    with patch("app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client):
+    with patch("app.core.upstream.get_client", return_value=mock_client):
         yield mock_client
 
 
@@ -128,7 +183,26 @@ def mock_httpx_embedding():
     response = _make_httpbin_response(echoed)
     mock_client = _make_mock_client(response)
 
-    with patch("app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client):
+    with patch("app.core.upstream.get_client", return_value=mock_client):
+        yield mock_client
+
+
+@pytest.fixture
+def mock_httpx_echo():
+    """
+    Mocks httpx with a client that echoes whatever JSON it is sent.
+
+    Use this when the payload varies per call (batches, lists of inputs)
+    and a fixed echoed body would not match what the code sent.
+    """
+
+    async def echo(url, json=None, **kwargs):
+        return _make_httpbin_response(json)
+
+    mock_client = _make_mock_client(MagicMock())
+    mock_client.post = AsyncMock(side_effect=echo)
+
+    with patch("app.core.upstream.get_client", return_value=mock_client):
         yield mock_client
 
 
@@ -136,6 +210,7 @@ def mock_httpx_embedding():
 def mock_httpx_server_error():
     """Mocks httpx to simulate a 500 from the upstream server."""
     mock_response = MagicMock(spec=httpx.Response)
+    mock_response.status_code = 500
     mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
         message="Internal Server Error",
         request=MagicMock(),
@@ -143,7 +218,7 @@ def mock_httpx_server_error():
     )
     mock_client = _make_mock_client(mock_response)
 
-    with patch("app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client):
+    with patch("app.core.upstream.get_client", return_value=mock_client):
         yield
 
 
@@ -155,7 +230,7 @@ def mock_httpx_timeout():
     mock_client.__aenter__ = AsyncMock(return_value=mock_client)
     mock_client.__aexit__ = AsyncMock(return_value=None)
 
-    with patch("app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client):
+    with patch("app.core.upstream.get_client", return_value=mock_client):
         yield
 
 
@@ -185,3 +260,39 @@ def mock_embedding_task():
         return_value=MOCK_EMBEDDING_RESPONSE,
     ) as mock:
         yield mock
+
+
+@pytest.fixture
+def mock_batch_embedding_task():
+    with patch(
+        "app.routers.ml.run_batch_embedding_task",
+        new_callable=AsyncMock,
+        return_value=MOCK_BATCH_EMBEDDING_RESPONSE,
+    ) as mock:
+        yield mock
+
+
+async def _mock_generation_stream(query):
+    for delta in ({"role": "assistant"}, {"content": "Processed remotely: "}):
+        yield {
+            "id": "test-uuid-1234",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "mock-gemma3:4b",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+    yield {
+        "id": "test-uuid-1234",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "mock-gemma3:4b",
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+
+
+@pytest.fixture
+def mock_generation_stream():
+    with patch(
+        "app.routers.ml.stream_generation_task", side_effect=_mock_generation_stream
+    ) as mock:
+        yield mock
@@ -0,0 +1,60 @@
+"""
+tests/integration/test_admission.py
+
+Load shedding as clients and Kubernetes see it: a 503 with Retry-After in
+the standard error envelope, and /health/ready failing while saturated.
+"""
+
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionLimiter
+
+
+@pytest.fixture
+def full_generate_limiter(monkeypatch):
+    """A /generate limiter with every slot taken and no queue."""
+    limiter = AdmissionLimiter(
+        "/generate", max_concurrent=1, max_queue=0, queue_timeout_ms=10
+    )
+    limiter.in_flight = 1
+    monkeypatch.setitem(admission.limiters, "/generate", limiter)
+    return limiter
+
+
+class TestLoadShedding:
+    def test_rejects_with_503_and_retry_after(
+        self, client, full_generate_limiter, mock_generation_task
+    ):
+        response = client.post("/generate", json={"query": "hello"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert response.json()["error"]["code"] == "SYS_002"
+        mock_generation_task.assert_not_called()
+
+    def test_other_routes_are_unaffected(
+        self, client, full_generate_limiter, mock_embedding_task
+    ):
+        response = client.post("/embed", json={"text": "hello"})
+        assert response.status_code == 200
+
+    def test_slot_is_released_after_response(self, client, mock_generation_task):
+        client.post("/generate", json={"query": "hello"})
+        assert admission.limiters["/generate"].in_flight == 0
+
+
+class TestReadiness:
+    def test_not_ready_while_saturated(self, client, full_generate_limiter):
+        response = client.get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json() == {"status": "saturated", "routes": ["/generate"]}
+
+    def test_stays_not_ready_briefly_after_shedding(
+        self, client, full_generate_limiter, mock_generation_task
+    ):
+        client.post("/generate", json={"query": "hello"})
+        full_generate_limiter.in_flight = 0
+
+        assert client.get("/health/ready").status_code == 503
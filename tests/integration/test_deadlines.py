@@ -0,0 +1,243 @@
+"""
+tests/integration/test_deadlines.py
+
+Integration tests for request deadlines and client disconnects.
+
+The disconnect test drives the ASGI app directly, since TestClient has no
+way to hang up mid-request.
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def slow_generation():
+    """run_generation_task that never finishes unless cancelled."""
+    state = {"started": asyncio.Event(), "cancelled": False}
+
+    async def generate(query):
+        state["started"].set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    with patch("app.routers.ml.run_generation_task", side_effect=generate):
+        yield state
+
+
+@pytest.fixture
+def slow_upstream_stream():
+    """Upstream NDJSON stream that sends a line every 20 ms for a second."""
+
+    class SlowLines(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for i in range(50):
+                await asyncio.sleep(0.02)
+                yield json.dumps({"response": f"word{i} "}).encode() + b"\n"
+
+    def ndjson(request):
+        headers = {"content-type": "application/x-ndjson"}
+        return httpx.Response(200, headers=headers, stream=SlowLines())
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(ndjson))
+    with patch("app.core.upstream.get_client", return_value=client):
+        yield
+
+
+def cancelled_count(client, route, reason) -> float:
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(
+            f'requests_cancelled_total{{route="{route}",reason="{reason}"}}'
+        ):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestDeadline:
+    def test_spent_budget_fails_fast_with_504(self, client, mock_generation_task):
+        before = cancelled_count(client, "/generate", "deadline_spent")
+        response = client.post(
+            "/generate", json={"query": "q"}, headers={"X-Request-Timeout": "0"}
+        )
+        assert response.status_code == 504
+        assert response.json()["error"]["code"] == "SYS_004"
+        mock_generation_task.assert_not_called()
+        assert cancelled_count(client, "/generate", "deadline_spent") == before + 1
+
+    def test_slow_handler_is_cancelled_at_deadline(self, client, slow_generation):
+        response = client.post(
+            "/generate", json={"query": "q"}, headers={"X-Request-Timeout": "0.05"}
+        )
+        assert response.status_code == 504
+        assert slow_generation["cancelled"]
+        assert cancelled_count(client, "/generate", "deadline") >= 1
+
+    def test_generous_budget_changes_nothing(self, client, mock_generation_task):
+        response = client.post(
+            "/generate", json={"query": "q"}, headers={"X-Request-Timeout": "30"}
+        )
+        assert response.status_code == 200
+
+    def test_stream_outliving_its_deadline_ends_with_error_event(
+        self, client, slow_upstream_stream
+    ):
+        response = client.post(
+            "/generate/stream",
+            json={"query": "q"},
+            headers={"X-Request-Timeout": "0.2"},
+        )
+        # Headers went out in time, so the deadline is reported in-band
+        assert response.status_code == 200
+        body = response.text
+        assert "event: error" in body
+        error = json.loads(body.split("event: error\ndata: ")[1].split("\n")[0])
+        assert error["code"] == "SYS_004"
+        assert "[DONE]" not in body
+        assert "word0" in body and "word49" not in body
+
+    def test_malformed_header_returns_400(self, client):
+        response = client.post(
+            "/generate", json={"query": "q"}, headers={"X-Request-Timeout": "soon"}
+        )
+        assert response.status_code == 400
+
+
+class TestDisconnect:
+    def test_disconnect_cancels_in_flight_work(self, app, slow_generation):
+        async def main():
+            body = json.dumps({"query": "q"}).encode()
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            sent = []
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await slow_generation["started"].wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": "/generate",
+                "raw_path": b"/generate",
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"content-type", b"application/json")],
+                "client": ("test", 1),
+                "server": ("test", 80),
+            }
+            await asyncio.wait_for(app(scope, receive, send), 5)
+            return sent
+
+        sent = asyncio.run(main())
+        assert slow_generation["cancelled"]
+        assert sent[0]["status"] == 499
+
+
+class TestUploadFirstEmbedStream:
+    """
+    A client that uploads the whole body before reading any of the response
+    (httpx, requests), sending more than the output spool can hold. Once
+    the spool is full the server stops reading the body, the client never
+    gets to reading the response, and the request must still end.
+    """
+
+    LINES = 5000
+
+    def _run(self, app, headers=()):
+        lines = [f'"text {i}"\n'.encode() for i in range(self.LINES)]
+        messages = [
+            {
+                "type": "http.request",
+                "body": b"".join(lines[i : i + 100]),
+                "more_body": i + 100 < len(lines),
+            }
+            for i in range(0, len(lines), 100)
+        ]
+        total = len(messages)
+
+        async def main():
+            uploaded = asyncio.Event()
+            sent = []
+
+            async def receive():
+                if messages:
+                    message = messages.pop(0)
+                    if not messages:
+                        uploaded.set()
+                    return message
+                await asyncio.sleep(30)
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if message["type"] == "http.response.body":
+                    # Nothing is read until the upload is done
+                    await uploaded.wait()
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": "/embed/stream",
+                "raw_path": b"/embed/stream",
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"content-type", b"application/x-ndjson"), *headers],
+                "client": ("test", 1),
+                "server": ("test", 80),
+            }
+            await asyncio.wait_for(app(scope, receive, send), 5)
+            return sent
+
+        sent = asyncio.run(main())
+        return sent, total - len(messages)
+
+    @pytest.fixture(autouse=True)
+    def small_spool(self):
+        from app.config import settings
+
+        with (
+            patch.object(settings, "EMBED_STREAM_SPOOL_BYTES", 16_000),
+            patch.object(settings, "EMBED_STREAM_SPOOL_MAX_BYTES", 32_000),
+        ):
+            yield settings
+
+    def test_stalled_upload_ends_after_the_stall_timeout(
+        self, app, mock_httpx_echo, small_spool
+    ):
+        from app.core import admission
+
+        with patch.object(small_spool, "EMBED_STREAM_STALL_SECONDS", 0.1):
+            sent, read = self._run(app)
+
+        assert sent[0]["status"] == 200
+        # The body was only partly read, and the response never completed
+        assert read < self.LINES // 100
+        assert sent[-1].get("more_body", False)
+        assert admission.get_limiter("/embed/stream").in_flight == 0
+
+    def test_stalled_upload_ends_at_the_request_deadline(
+        self, app, mock_httpx_echo, small_spool
+    ):
+        with patch.object(small_spool, "EMBED_STREAM_STALL_SECONDS", 0):
+            sent, read = self._run(app, [(b"x-request-timeout", b"0.2")])
+
+        assert sent[0]["status"] == 200
+        assert read < self.LINES // 100
+        assert sent[-1].get("more_body", False)
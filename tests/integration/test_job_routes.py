@@ -0,0 +1,68 @@
+"""
+tests/integration/test_job_routes.py
+
+The async job API end to end: submit returns 202 and an id, polling with
+?wait= returns the finished result, and unknown ids are a 404.
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from tests.conftest import MOCK_GENERATION_RESPONSE
+
+
+@pytest.fixture
+def mock_job_generation():
+    with patch(
+        "app.core.jobs.run_generation_task",
+        new_callable=AsyncMock,
+        return_value=MOCK_GENERATION_RESPONSE,
+    ) as mock:
+        yield mock
+
+
+class TestJobRoutes:
+    def test_submit_returns_202_with_job_id(self, client, mock_job_generation):
+        response = client.post("/jobs/generate", json={"query": "test query"})
+
+        assert response.status_code == 202
+        body = response.json()
+        assert body["id"]
+        assert body["kind"] == "generate"
+        assert body["status"] in ("queued", "running", "succeeded")
+
+    def test_poll_with_wait_returns_result(self, client, mock_job_generation):
+        job_id = client.post("/jobs/generate", json={"query": "test query"}).json()[
+            "id"
+        ]
+
+        response = client.get(f"/jobs/{job_id}", params={"wait": 5})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "succeeded"
+        assert body["result"] == {"response": "Processed remotely: test query"}
+        assert body["error"] is None
+
+    def test_unknown_job_is_404(self, client):
+        response = client.get("/jobs/does-not-exist")
+
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "RES_JOB_001"
+
+    def test_priority_out_of_range_is_rejected(self, client):
+        response = client.post(
+            "/jobs/generate", json={"query": "test query", "priority": 10}
+        )
+        assert response.status_code == 422
+
+    def test_negative_wait_is_rejected(self, client):
+        response = client.get("/jobs/anything", params={"wait": -1})
+        assert response.status_code == 422
+
+    def test_stats(self, client):
+        response = client.get("/stats/jobs")
+
+        assert response.status_code == 200
+        assert {"workers", "queued", "running", "stored"} <= response.json().keys()
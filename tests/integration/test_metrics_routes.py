@@ -0,0 +1,56 @@
+"""
+tests/integration/test_metrics_routes.py
+
+GET /metrics is scraped by Prometheus, so the content type and metric
+names are a contract just like the health checks.
+"""
+
+
+class TestMetricsEndpoint:
+    def test_returns_prometheus_text(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    def test_records_request_latency_by_route_template(self, client):
+        client.get("/health/live")
+        body = client.get("/metrics").text
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/health/live",'
+            'status="200"}' in body
+        )
+
+    def test_unknown_paths_share_one_label(self, client):
+        client.get("/no/such/path")
+        body = client.get("/metrics").text
+        assert 'route="unmatched"' in body
+        assert "/no/such/path" not in body
+
+    def test_exports_every_error_code(self, client):
+        from app.core.error_codes import ErrorCode
+
+        body = client.get("/metrics").text
+        for code in ErrorCode:
+            assert f'app_errors_total{{code="{code.value}"}}' in body
+
+    def test_counts_validation_errors(self, client):
+        from app.api.error_handlers import ERRORS
+
+        before = ERRORS.value(code="VAL_REQUEST_001")
+        client.post("/generate", json={})
+        assert ERRORS.value(code="VAL_REQUEST_001") == before + 1
+
+    def test_exports_component_metrics(self, client):
+        body = client.get("/metrics").text
+        for name in (
+            "http_requests_in_flight",
+            "http_request_size_bytes",
+            "http_response_size_bytes",
+            "upstream_request_duration_seconds",
+            "upstream_pool_connections",
+            "embed_batcher_queue_depth",
+            "embed_cache_events_total",
+            "generate_calls_total",
+            "vector_collection_size",
+        ):
+            assert f"# TYPE {name} " in body
@@ -0,0 +1,66 @@
+"""
+tests/integration/test_middleware.py
+
+Server-Timing header and the sampled profiler hook. Both are used against
+production traffic, so they must never change a response body.
+"""
+
+import pstats
+
+import pytest
+
+from app.config import settings
+
+
+def _stages(response) -> dict[str, float]:
+    stages = {}
+    for part in response.headers["server-timing"].split(", "):
+        name, dur = part.split(";dur=")
+        stages[name] = float(dur)
+    return stages
+
+
+class TestServerTiming:
+    def test_generate_reports_each_stage(self, client, mock_httpx_generation):
+        response = client.post("/generate", json={"query": "hello"})
+
+        assert response.status_code == 200
+        stages = _stages(response)
+        for name in ("parse", "handler", "upstream", "serialize", "total"):
+            assert name in stages
+        assert stages["upstream"] <= stages["handler"] <= stages["total"]
+
+    def test_routes_without_timed_endpoints_report_total(self, client):
+        stages = _stages(client.get("/health/live"))
+        assert "total" in stages
+
+    def test_can_be_disabled(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "SERVER_TIMING", False)
+        assert "server-timing" not in client.get("/health/live").headers
+
+
+class TestProfiler:
+    @pytest.fixture
+    def profile_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "PROFILE_TOKEN", "s3cret")
+        return tmp_path
+
+    def test_admin_header_writes_a_dump(self, client, profile_dir):
+        response = client.get("/health/live", headers={"X-Profile": "s3cret"})
+
+        dump = profile_dir / response.headers["x-profile-dump"]
+        assert dump.exists()
+        assert pstats.Stats(str(dump)).total_calls > 0
+
+    def test_wrong_token_is_ignored(self, client, profile_dir):
+        response = client.get("/health/live", headers={"X-Profile": "guess"})
+
+        assert "x-profile-dump" not in response.headers
+        assert list(profile_dir.iterdir()) == []
+
+    def test_samples_one_request_in_n(self, client, profile_dir, monkeypatch):
+        monkeypatch.setattr(settings, "PROFILE_SAMPLE_N", 3)
+        for _ in range(6):
+            client.get("/health/live")
+        assert len(list(profile_dir.iterdir())) == 2
@@ -31,6 +31,7 @@ don't care about HTTP — they only test the route wiring and response shape.
 """
 
 import pytest
+from fastapi.testclient import TestClient
 
 
 class TestGenerateEndpoint:
@@ -143,7 +144,13 @@ class TestEmbedEndpoint:
 
     def test_core_function_received_correct_text(self, client, mock_embedding_task):
         client.post("/embed", json={"text": "my specific text"})
-        mock_embedding_task.assert_called_once_with("my specific text")
+        mock_embedding_task.assert_called_once_with("my specific text", use_cache=True)
+
+    def test_cache_bypass_header_disables_cache(self, client, mock_embedding_task):
+        client.post(
+            "/embed", json={"text": "hello"}, headers={"X-Cache-Bypass": "true"}
+        )
+        mock_embedding_task.assert_called_once_with("hello", use_cache=False)
 
     def test_missing_text_returns_422(self, client):
         response = client.post("/embed", json={})
@@ -154,3 +161,419 @@ class TestEmbedEndpoint:
         errors = response.json()["error"]["details"]["validation_errors"]
         fields = [e["field"] for e in errors]
         assert "text" in fields
+
+
+class TestEmbedBatchEndpoint:
+    def test_returns_200(self, client, mock_batch_embedding_task):
+        response = client.post("/embed/batch", json={"texts": ["hello", ""]})
+        assert response.status_code == 200
+
+    def test_returns_one_item_per_text(self, client, mock_batch_embedding_task):
+        response = client.post("/embed/batch", json={"texts": ["hello", ""]})
+        assert len(response.json()["data"]) == 2
+
+    def test_item_errors_are_reported_in_place(self, client, mock_batch_embedding_task):
+        data = client.post("/embed/batch", json={"texts": ["hello", ""]}).json()
+        assert data["data"][0]["error"] is None
+        assert data["data"][1]["embedding"] is None
+        assert data["data"][1]["error"]["code"] == "VAL_INPUT_001"
+
+    def test_core_function_received_all_texts(self, client, mock_batch_embedding_task):
+        client.post("/embed/batch", json={"texts": ["a", "b"]})
+        mock_batch_embedding_task.assert_called_once_with(["a", "b"])
+
+    def test_empty_list_returns_422(self, client):
+        response = client.post("/embed/batch", json={"texts": []})
+        assert response.status_code == 422
+
+    def test_oversized_batch_returns_400(self, client, mock_httpx_echo, monkeypatch):
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_BATCH_SIZE", 1)
+        response = client.post("/embed/batch", json={"texts": ["a", "b"]})
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VAL_BATCH_001"
+
+
+class TestGenerateStreamEndpoint:
+    @staticmethod
+    def _events(response):
+        return [
+            line[len("data: ") :]
+            for line in response.text.split("\n")
+            if line.startswith("data: ")
+        ]
+
+    def test_returns_event_stream(self, client, mock_generation_stream):
+        response = client.post("/generate/stream", json={"query": "hello"})
+        assert response.status_code == 200
+        assert "text/event-stream" in response.headers["content-type"]
+
+    def test_emits_each_chunk_then_done(self, client, mock_generation_stream):
+        import json
+
+        response = client.post("/generate/stream", json={"query": "hello"})
+        events = self._events(response)
+
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(e) for e in events[:-1]]
+        assert len(chunks) == 3
+        assert all(c["object"] == "chat.completion.chunk" for c in chunks)
+
+    def test_core_function_received_query(self, client, mock_generation_stream):
+        client.post("/generate/stream", json={"query": "my specific query"})
+        mock_generation_stream.assert_called_once_with("my specific query")
+
+    def test_upstream_failure_before_first_chunk_uses_error_envelope(self, client):
+        from unittest.mock import patch
+
+        async def failing(query):
+            raise RuntimeError("upstream down")
+            yield  # pragma: no cover
+
+        with patch("app.routers.ml.stream_generation_task", side_effect=failing):
+            with TestClient(client.app, raise_server_exceptions=False) as c:
+                response = c.post("/generate/stream", json={"query": "hello"})
+
+        assert response.status_code == 500
+        assert response.json()["error"]["code"] == "SYS_001"
+
+    def test_missing_query_returns_422(self, client):
+        response = client.post("/generate/stream", json={})
+        assert response.status_code == 422
+
+
+class TestGenerateBatchEndpoint:
+    def test_returns_items_in_order(self, client, mock_httpx_echo):
+        response = client.post("/generate/batch", json={"queries": ["a", "b", "c"]})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert [item["index"] for item in data] == [0, 1, 2]
+        assert data[1] == {
+            "index": 1,
+            "response": "Processed remotely: b",
+            "error": None,
+        }
+
+    def test_stream_returns_ndjson_lines(self, client, mock_httpx_echo):
+        import json
+
+        response = client.post(
+            "/generate/batch", json={"queries": ["a", "b", "c"], "stream": True}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        items = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(item["index"] for item in items) == [0, 1, 2]
+        assert all(item["response"].startswith("Processed") for item in items)
+
+    def test_too_large_batch_returns_400_even_when_streaming(
+        self, client, mock_httpx_echo, monkeypatch
+    ):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "GENERATE_MAX_BATCH_SIZE", 1)
+        response = client.post(
+            "/generate/batch", json={"queries": ["a", "b"], "stream": True}
+        )
+
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VAL_BATCH_001"
+
+    def test_empty_list_returns_422(self, client):
+        response = client.post("/generate/batch", json={"queries": []})
+        assert response.status_code == 422
+
+
+class TestEmbedStreamEndpoint:
+    BODY = b'"first"\n{"id": "doc-2", "text": "second"}\n""\n'
+
+    def test_returns_ndjson_items(self, client, mock_httpx_echo):
+        import json
+
+        response = client.post("/embed/stream", content=self.BODY)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        items = sorted(
+            (json.loads(line) for line in response.text.splitlines()),
+            key=lambda item: item["index"],
+        )
+        assert [item["index"] for item in items] == [0, 1, 2]
+        assert items[1]["id"] == "doc-2"
+        assert len(items[0]["embedding"]) == 512
+        assert items[2]["error"]["code"] == "VAL_INPUT_001"
+
+    def test_binary_records(self, client, mock_httpx_echo):
+        from app.core.encoding import decode_records
+
+        response = client.post(
+            "/embed/stream",
+            params={"encoding_format": "binary"},
+            content=self.BODY,
+        )
+
+        assert response.headers["content-type"] == "application/octet-stream"
+        records = dict(decode_records(response.content))
+        assert records[0].shape == (512,)
+        assert records[2]["code"] == "VAL_INPUT_001"
+
+    def test_empty_body_returns_nothing(self, client, mock_httpx_echo):
+        response = client.post("/embed/stream", content=b"")
+        assert response.status_code == 200
+        assert response.content == b""
+
+
+class TestEmbedLookupEndpoint:
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        import numpy as np
+
+        from app.core import precomputed
+
+        vectors = np.arange(3 * 512, dtype=np.float32).reshape(3, 512)
+        np.save(tmp_path / "vectors.npy", vectors)
+        precomputed.write_index(str(tmp_path), ["doc-a", "doc-b", "doc-c"])
+        (tmp_path / "meta.json").write_text('{"count": 3}')
+        monkeypatch.setattr(
+            precomputed, "store", precomputed.PrecomputedEmbeddings(str(tmp_path))
+        )
+        return vectors
+
+    def test_returns_vectors_by_id(self, client, store):
+        response = client.post("/embed/lookup", json={"ids": ["doc-c", "doc-a"]})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert [item["id"] for item in data] == ["doc-c", "doc-a"]
+        assert data[0]["embedding"] == store[2].tolist()
+
+    def test_unknown_id_is_an_item_error(self, client, store):
+        response = client.post("/embed/lookup", json={"ids": ["doc-a", "missing"]})
+
+        data = response.json()["data"]
+        assert data[0]["error"] is None
+        assert data[1]["embedding"] is None
+        assert data[1]["error"]["code"] == "RES_EMBEDDING_001"
+
+    def test_binary(self, client, store):
+        from app.core.encoding import decode_binary
+
+        response = client.post(
+            "/embed/lookup", json={"ids": ["doc-b"], "encoding_format": "binary"}
+        )
+        assert (decode_binary(response.content)[0] == store[1]).all()
+
+    def test_no_store_returns_404(self, client, monkeypatch):
+        from app.core import precomputed
+
+        monkeypatch.setattr(precomputed, "store", None)
+        response = client.post("/embed/lookup", json={"ids": ["doc-a"]})
+
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "RES_EMBEDDING_001"
+
+
+class TestGenerateSemanticCache:
+    def test_hit_header_on_similar_query(self, client, mock_httpx_echo, semantic_cache):
+        first = client.post("/generate", json={"query": "what is rust?"})
+        second = client.post("/generate", json={"query": "what's rust?!"})
+
+        assert first.headers["x-semantic-cache"] == "miss"
+        assert second.headers["x-semantic-cache"] == "hit"
+        assert second.json() == first.json()
+
+    def test_bypass_header_skips_cache(self, client, mock_httpx_echo, semantic_cache):
+        client.post("/generate", json={"query": "what is rust?"})
+        response = client.post(
+            "/generate",
+            json={"query": "what's rust?!"},
+            headers={"X-Cache-Bypass": "true"},
+        )
+
+        assert "x-semantic-cache" not in response.headers
+        assert response.json()["response"] == "Processed remotely: what's rust?!"
+
+    def test_no_header_when_disabled(self, client, mock_generation_task):
+        response = client.post("/generate", json={"query": "hello"})
+        assert "x-semantic-cache" not in response.headers
+
+
+class TestEmbedChunking:
+    CHUNKING = {"unit": "chars", "size": 10, "overlap": 2, "pooling": "mean"}
+
+    def test_pooled_vector_and_chunk_spans(self, client, mock_httpx_echo):
+        response = client.post(
+            "/embed", json={"text": "x" * 26, "chunking": self.CHUNKING}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["embedding"]) == 512
+        assert [(c["start"], c["end"]) for c in body["chunks"]] == [
+            (0, 10),
+            (8, 18),
+            (16, 26),
+        ]
+
+    def test_pooling_none(self, client, mock_httpx_echo):
+        response = client.post(
+            "/embed",
+            json={"text": "x" * 26, "chunking": {**self.CHUNKING, "pooling": "none"}},
+        )
+
+        body = response.json()
+        assert body["embedding"] is None
+        assert all(len(chunk["embedding"]) == 512 for chunk in body["chunks"])
+
+    def test_binary_rows_per_chunk(self, client, mock_httpx_echo):
+        import json
+
+        from app.core.encoding import decode_binary
+
+        response = client.post(
+            "/embed",
+            json={
+                "text": "x" * 26,
+                "encoding_format": "binary",
+                "chunking": {**self.CHUNKING, "pooling": "none"},
+            },
+        )
+
+        assert decode_binary(response.content).shape == (3, 512)
+        assert json.loads(response.headers["X-Embedding-Chunks"])[0] == [0, 10]
+
+    def test_overlap_must_be_below_size(self, client):
+        response = client.post(
+            "/embed",
+            json={"text": "hello", "chunking": {"size": 4, "overlap": 4}},
+        )
+        assert response.status_code == 422
+
+    def test_without_chunking_response_is_unchanged(self, client, mock_embedding_task):
+        response = client.post("/embed", json={"text": "hello"})
+        assert response.json()["chunks"] is None
+
+
+class TestEmbedEncodingFormats:
+    def test_default_is_float_list(self, client, mock_embedding_task):
+        response = client.post("/embed", json={"text": "hello"})
+        assert isinstance(response.json()["embedding"], list)
+
+    def test_base64_returns_string(self, client, mock_embedding_task):
+        from app.core.encoding import decode_base64
+
+        response = client.post(
+            "/embed", json={"text": "hello", "encoding_format": "base64"}
+        )
+        decoded = decode_base64(response.json()["embedding"])
+        assert decoded.shape == (512,)
+        assert decoded[0] == pytest.approx(0.1)
+
+    def test_binary_returns_octet_stream(self, client, mock_embedding_task):
+        from app.core.encoding import decode_binary
+
+        response = client.post(
+            "/embed",
+            json={"text": "hello", "encoding_format": "binary", "dtype": "float16"},
+        )
+        assert response.headers["content-type"] == "application/octet-stream"
+        matrix = decode_binary(response.content)
+        assert matrix.shape == (1, 512)
+        assert str(matrix.dtype) == "float16"
+
+    def test_unknown_format_returns_422(self, client):
+        response = client.post(
+            "/embed", json={"text": "hello", "encoding_format": "csv"}
+        )
+        assert response.status_code == 422
+
+    def test_batch_base64_encodes_each_item(self, client, mock_batch_embedding_task):
+        data = client.post(
+            "/embed/batch",
+            json={"texts": ["hello", ""], "encoding_format": "base64"},
+        ).json()["data"]
+        assert isinstance(data[0]["embedding"], str)
+        assert data[1]["embedding"] is None
+
+    def test_batch_binary_marks_failed_rows(self, client, mock_batch_embedding_task):
+        import json
+
+        import numpy as np
+
+        from app.core.encoding import decode_binary
+
+        response = client.post(
+            "/embed/batch",
+            json={"texts": ["hello", ""], "encoding_format": "binary"},
+        )
+        matrix = decode_binary(response.content)
+        assert matrix.shape == (2, 512)
+        assert np.isnan(matrix[1]).all()
+        errors = json.loads(response.headers["X-Embedding-Errors"])
+        assert errors[0]["index"] == 1
+
+
+class TestEmbedQuantization:
+    def test_dimensions_truncate_and_renormalize(self, client, mock_embedding_task):
+        import numpy as np
+
+        response = client.post("/embed", json={"text": "hello", "dimensions": 64})
+        embedding = response.json()["embedding"]
+        assert len(embedding) == 64
+        assert np.linalg.norm(embedding) == pytest.approx(1, rel=1e-5)
+
+    def test_too_many_dimensions_returns_400(self, client, mock_embedding_task):
+        response = client.post("/embed", json={"text": "hello", "dimensions": 513})
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VAL_REQUEST_001"
+
+    def test_int8_returns_codes_and_scale(self, client, mock_embedding_task):
+        body = client.post("/embed", json={"text": "hello", "dtype": "int8"}).json()
+        assert all(isinstance(code, int) for code in body["embedding"])
+        assert max(abs(code) for code in body["embedding"]) == 127
+        assert body["scale"] > 0
+
+    def test_batch_binary_dtype(self, client, mock_batch_embedding_task):
+        from app.core.encoding import decode_base64
+
+        data = client.post(
+            "/embed/batch",
+            json={
+                "texts": ["hello", "hi"],
+                "encoding_format": "base64",
+                "dtype": "binary",
+                "dimensions": 128,
+            },
+        ).json()["data"]
+        assert decode_base64(data[0]["embedding"], "binary").size == 16
+        assert data[0]["scale"] is None
+
+    def test_stream_int8_records(self, client, mock_httpx_echo):
+        from app.core.encoding import decode_records
+
+        response = client.post(
+            "/embed/stream?encoding_format=binary&dtype=int8&dimensions=32",
+            content=b'"hello"\n',
+        )
+        [(index, vector)] = decode_records(response.content)
+        assert index == 0 and vector.shape == (32,)
+
+
+class TestUpstreamCircuitBreaker:
+    def test_open_breaker_fails_fast_with_503(self, client, mock_httpx_generation):
+        from app.core import resilience
+        from app.core.gen_and_embed import GENERATION_MODEL
+
+        policy = resilience.get_policy(GENERATION_MODEL)
+        for _ in range(policy.breaker.failure_threshold):
+            policy.breaker.record_failure()
+
+        response = client.post("/generate", json={"query": "hello"})
+
+        assert response.status_code == 503
+        assert response.json()["error"]["code"] == "SYS_003"
+        assert int(response.headers["retry-after"]) >= 1
+        mock_httpx_generation.post.assert_not_called()
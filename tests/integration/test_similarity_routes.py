@@ -0,0 +1,87 @@
+"""
+tests/integration/test_similarity_routes.py
+
+Integration tests for /similarity and /dedup.
+
+Texts go through the real embedding path against the echoing httpx mock,
+so texts of the same length embed to the same vector (see build_embeddings).
+"""
+
+import pytest
+
+
+def unit(i, dim=512):
+    vector = [0.0] * dim
+    vector[i] = 1.0
+    return vector
+
+
+class TestSimilarity:
+    def test_pairwise_matrix_of_vectors(self, client):
+        response = client.post(
+            "/similarity", json={"vectors": [unit(0), unit(1), unit(0)]}
+        )
+        assert response.status_code == 200
+        assert response.json()["scores"] == [
+            [1.0, 0.0, 1.0],
+            [0.0, 1.0, 0.0],
+            [1.0, 0.0, 1.0],
+        ]
+
+    def test_queries_against_corpus(self, client, mock_httpx_echo):
+        scores = client.post(
+            "/similarity",
+            json={"texts": ["hello"], "corpus": {"texts": ["world", "hi", "other"]}},
+        ).json()["scores"]
+        assert len(scores) == 1 and len(scores[0]) == 3
+        assert scores[0][0] == pytest.approx(1.0)
+        assert scores[0][0] > scores[0][1]
+
+    def test_accepts_quantized_vectors(self, client):
+        query = {"dtype": "int8", "data": [127] + [0] * 511, "scale": 0.01}
+        scores = client.post(
+            "/similarity",
+            json={"quantized": [query], "corpus": {"vectors": [unit(0), unit(1)]}},
+        ).json()["scores"]
+        assert scores[0] == pytest.approx([1.0, 0.0])
+
+    def test_too_many_cells_returns_400(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "SIMILARITY_MAX_CELLS", 4)
+        response = client.post("/similarity", json={"vectors": [unit(0)] * 3})
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VAL_BATCH_001"
+
+    def test_needs_exactly_one_input(self, client):
+        response = client.post(
+            "/similarity", json={"texts": ["a"], "vectors": [unit(0)]}
+        )
+        assert response.status_code == 422
+
+
+class TestDedup:
+    def test_clusters_duplicate_texts(self, client, mock_httpx_echo):
+        body = client.post(
+            "/dedup", json={"texts": ["hello", "hi", "world", "abc", "hey"]}
+        ).json()
+        # Same-length texts embed identically
+        assert body["clusters"] == [[0, 2], [3, 4]]
+        assert body["method"] == "exact"
+
+    def test_lsh_for_large_inputs(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DEDUP_EXACT_MAX_ITEMS", 2)
+        vectors = [unit(0), unit(1), unit(0), unit(2)]
+        body = client.post("/dedup", json={"vectors": vectors}).json()
+        assert body == {
+            "clusters": [[0, 2]],
+            "method": "lsh",
+            "comparisons": body["comparisons"],
+        }
+
+    def test_bad_embedding_fails_the_request(self, client, mock_httpx_echo):
+        response = client.post("/dedup", json={"texts": ["hello", ""]})
+        assert response.status_code == 400
+        assert response.json()["error"]["details"]["errors"][0]["index"] == 1
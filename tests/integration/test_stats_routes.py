@@ -0,0 +1,52 @@
+"""
+tests/integration/test_stats_routes.py
+
+Stats endpoints are what we look at when sizing pools and tuning limits,
+so their shape is a contract just like the health checks.
+"""
+
+
+class TestUpstreamStats:
+    def test_returns_200(self, client):
+        response = client.get("/stats/upstream")
+        assert response.status_code == 200
+
+    def test_reports_pool_counters(self, client):
+        body = client.get("/stats/upstream").json()
+        for key in ("connections", "in_use", "idle", "waiting"):
+            assert isinstance(body[key], int)
+
+
+class TestEmbedBatcherStats:
+    def test_returns_200(self, client):
+        response = client.get("/stats/embed-batcher")
+        assert response.status_code == 200
+
+    def test_reports_tuning_metrics(self, client):
+        body = client.get("/stats/embed-batcher").json()
+        for key in ("queue_depth", "batch_size_histogram", "wait_ms_histogram"):
+            assert key in body
+
+
+class TestEmbedCacheStats:
+    def test_reports_counters(self, client):
+        body = client.get("/stats/embed-cache").json()
+        for key in ("hits", "misses", "evictions", "bytes", "max_bytes"):
+            assert key in body
+
+
+class TestGenerateCoalescingStats:
+    def test_reports_coalesced_counter(self, client):
+        body = client.get("/stats/generate-coalescing").json()
+        assert isinstance(body["coalesced"], int)
+
+
+class TestUpstreamLimitStats:
+    def test_reports_limit_per_model(self, client, mock_httpx_generation):
+        client.post("/generate", json={"query": "test query"})
+        body = client.get("/stats/upstream-limits").json()
+
+        stats = body["mock-gemma3:4b"]
+        assert stats["algorithm"] == "gradient"
+        assert stats["in_flight"] == 0
+        assert stats["samples"] == 1
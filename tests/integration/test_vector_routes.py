@@ -0,0 +1,167 @@
+"""
+tests/integration/test_vector_routes.py
+
+Integration tests for /vectors/upsert and /vectors/search.
+
+These run the real embedding path against the echoing httpx mock, so
+texts of the same length embed to the same vector (see build_embeddings).
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_collections():
+    from app.core import vectors
+
+    vectors.collections.clear()
+    yield
+    vectors.collections.clear()
+
+
+def unit(i, dim=512):
+    vector = [0.0] * dim
+    vector[i] = 1.0
+    return vector
+
+
+class TestUpsert:
+    def test_embeds_texts(self, client, mock_httpx_echo):
+        response = client.post(
+            "/vectors/upsert",
+            json={"items": [{"id": "a", "text": "hello"}, {"id": "b", "text": "hi"}]},
+        )
+        assert response.status_code == 200
+        assert response.json() == {"upserted": 2, "created": 2, "errors": []}
+
+    def test_accepts_raw_vectors(self, client):
+        response = client.post(
+            "/vectors/upsert", json={"items": [{"id": "a", "vector": unit(0)}]}
+        )
+        assert response.json()["created"] == 1
+
+    def test_reports_bad_items_without_failing(self, client, mock_httpx_echo):
+        body = client.post(
+            "/vectors/upsert",
+            json={
+                "items": [
+                    {"id": "ok", "text": "hello"},
+                    {"id": "empty", "text": ""},
+                    {"id": "short", "vector": [1.0, 2.0]},
+                ]
+            },
+        ).json()
+        assert body["upserted"] == 1
+        assert [e["index"] for e in body["errors"]] == [1, 2]
+        assert body["errors"][1]["code"] == "VAL_VECTOR_001"
+
+    def test_texts_beyond_one_batch_are_split(
+        self, client, mock_httpx_echo, monkeypatch
+    ):
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_BATCH_SIZE", 4)
+        items = [{"id": str(i), "text": "x" * (i + 1)} for i in range(10)]
+        items[6]["text"] = ""
+
+        body = client.post("/vectors/upsert", json={"items": items}).json()
+
+        assert body["upserted"] == 9
+        assert [e["index"] for e in body["errors"]] == [6]
+        assert mock_httpx_echo.post.await_count == 3
+
+    def test_accepts_quantized_vectors(self, client):
+        import base64
+
+        import numpy as np
+
+        packed = base64.b64encode(np.packbits(np.array(unit(3)) > 0).tobytes())
+        response = client.post(
+            "/vectors/upsert",
+            json={
+                "items": [
+                    {
+                        "id": "int8",
+                        "quantized": {"dtype": "int8", "data": unit(0), "scale": 0.5},
+                    },
+                    {
+                        "id": "bits",
+                        "quantized": {"dtype": "binary", "data": packed.decode()},
+                    },
+                    {"id": "bad", "quantized": {"dtype": "binary", "data": [1, 2]}},
+                ]
+            },
+        ).json()
+        assert response["upserted"] == 2
+        assert [e["index"] for e in response["errors"]] == [2]
+
+    def test_int8_needs_scale(self, client):
+        response = client.post(
+            "/vectors/upsert",
+            json={"items": [{"id": "a", "quantized": {"dtype": "int8", "data": []}}]},
+        )
+        assert response.status_code == 422
+
+    def test_item_needs_text_or_vector(self, client):
+        response = client.post("/vectors/upsert", json={"items": [{"id": "a"}]})
+        assert response.status_code == 422
+
+
+class TestSearch:
+    def test_vector_query_returns_nearest_first(self, client):
+        client.post(
+            "/vectors/upsert",
+            json={"items": [{"id": str(i), "vector": unit(i)} for i in range(3)]},
+        )
+        body = client.post("/vectors/search", json={"vectors": [unit(1)], "k": 2})
+
+        hits = body.json()["results"][0]
+        assert hits[0]["id"] == "1"
+        assert hits[0]["score"] == pytest.approx(1.0)
+        assert len(hits) == 2
+
+    def test_text_query_uses_embedding_path(self, client, mock_httpx_echo):
+        client.post(
+            "/vectors/upsert",
+            json={
+                "items": [
+                    {"id": "five", "text": "hello"},
+                    {"id": "nine", "text": "long text"},
+                ]
+            },
+        )
+        body = client.post("/vectors/search", json={"queries": ["world"], "k": 1})
+        assert body.json()["results"][0][0]["id"] == "five"
+
+    def test_quantized_query(self, client):
+        client.post(
+            "/vectors/upsert",
+            json={"items": [{"id": str(i), "vector": unit(i)} for i in range(3)]},
+        )
+        query = {"dtype": "int8", "data": [int(x * 127) for x in unit(2)], "scale": 1}
+        body = client.post("/vectors/search", json={"quantized": [query], "k": 1})
+        assert body.json()["results"][0][0]["id"] == "2"
+
+    def test_malformed_quantized_query_returns_400(self, client):
+        client.post("/vectors/upsert", json={"items": [{"id": "a", "vector": unit(0)}]})
+        response = client.post(
+            "/vectors/search",
+            json={"quantized": [{"dtype": "binary", "data": [0, 1]}]},
+        )
+        assert response.status_code == 400
+
+    def test_unknown_collection_returns_404(self, client):
+        response = client.post(
+            "/vectors/search", json={"collection": "nope", "vectors": [unit(0)]}
+        )
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "RES_COLLECTION_001"
+
+    def test_wrong_dimension_returns_400(self, client):
+        client.post("/vectors/upsert", json={"items": [{"id": "a", "vector": unit(0)}]})
+        response = client.post("/vectors/search", json={"vectors": [[1.0, 0.0]]})
+        assert response.status_code == 400
+
+    def test_needs_queries_or_vectors(self, client):
+        response = client.post("/vectors/search", json={"k": 3})
+        assert response.status_code == 422
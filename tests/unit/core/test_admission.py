@@ -0,0 +1,150 @@
+"""
+tests/unit/core/test_admission.py
+
+Unit tests for AdmissionLimiter.
+
+The limiter must never leak a slot: every path out of acquire() (admitted,
+rejected, timed out, cancelled while queued) has to leave in_flight equal
+to the number of callers actually holding a slot.
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionLimiter, parse_limits
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+
+
+def _limiter(max_concurrent=1, max_queue=1, queue_timeout_ms=1000):
+    return AdmissionLimiter("/test", max_concurrent, max_queue, queue_timeout_ms)
+
+
+class TestAdmissionLimiter:
+    @pytest.mark.asyncio
+    async def test_admits_up_to_the_limit(self):
+        limiter = _limiter(max_concurrent=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        assert limiter.in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self):
+        limiter = _limiter(max_concurrent=1, max_queue=0)
+        await limiter.acquire()
+
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await limiter.acquire()
+
+        assert exc_info.value.error_code == ErrorCode.SYS_OVERLOADED
+        assert exc_info.value.retry_after == 1
+        assert exc_info.value.details["reason"] == "queue_full"
+        assert limiter.rejected == 1
+
+    @pytest.mark.asyncio
+    async def test_queued_request_gets_released_slot(self):
+        limiter = _limiter()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_waiters_are_served_in_order(self):
+        limiter = _limiter(max_queue=2)
+        await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            await limiter.acquire()
+            order.append(name)
+
+        first = asyncio.create_task(wait("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(wait("second"))
+        await asyncio.sleep(0)
+
+        limiter.release()
+        await first
+        limiter.release()
+        await second
+        assert order == ["first", "second"]
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_times_out(self):
+        limiter = _limiter(queue_timeout_ms=10)
+        await limiter.acquire()
+
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await limiter.acquire()
+
+        assert exc_info.value.details["reason"] == "queue_timeout"
+        assert limiter.queued == 0
+        assert limiter.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_slot_handed_over_at_timeout_is_returned(self, monkeypatch):
+        from app.core import admission
+
+        limiter = _limiter()
+        await limiter.acquire()
+
+        async def wait_for(future, timeout):
+            # The holder finishes just as the wait times out
+            limiter.release()
+            assert future.done()
+            raise TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", wait_for)
+        with pytest.raises(ServiceUnavailableException):
+            await limiter.acquire()
+
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        limiter = _limiter()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_saturated_only_when_queue_is_full(self):
+        limiter = _limiter(max_concurrent=1, max_queue=1)
+        await limiter.acquire()
+        assert not limiter.saturated
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.saturated
+
+        limiter.release()
+        await waiter
+        limiter.release()
+        assert not limiter.saturated
+
+
+class TestParseLimits:
+    def test_parses_routes(self):
+        assert parse_limits("/generate=32:16, /embed=8") == {
+            "/generate": (32, 16),
+            "/embed": (8, 0),
+        }
+
+    def test_empty_spec(self):
+        assert parse_limits("") == {}
@@ -0,0 +1,118 @@
+"""
+tests/unit/core/test_balancer.py
+
+Unit tests for BackendPool: backend choice, passive ejection and
+slow-start. Time is controlled by patching time.monotonic in the module.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.balancer import BackendPool, parse_urls
+
+URLS = ["http://a/post", "http://b/post", "http://c/post"]
+
+
+def _pool(**kwargs) -> BackendPool:
+    defaults = dict(eject_failures=2, eject_seconds=10, slow_start_seconds=10)
+    return BackendPool("test", URLS, **{**defaults, **kwargs})
+
+
+def _fail(pool: BackendPool, url: str, times: int) -> None:
+    backend = next(b for b in pool.backends if b.url == url)
+    for _ in range(times):
+        pool.record_status(backend, 503)
+
+
+class TestPick:
+    @pytest.mark.parametrize("strategy", ["p2c", "least_outstanding"])
+    def test_never_picks_the_busiest_backend(self, strategy):
+        pool = _pool(strategy=strategy)
+        pool.backends[0].outstanding = 50
+
+        picks = {pool.pick().url for _ in range(100)}
+        assert "http://a/post" not in picks
+
+    def test_least_outstanding_picks_the_idlest(self):
+        pool = _pool(strategy="least_outstanding")
+        pool.backends[0].outstanding = 3
+        pool.backends[1].outstanding = 1
+        pool.backends[2].outstanding = 2
+
+        assert pool.pick().url == "http://b/post"
+
+    def test_lease_counts_outstanding(self):
+        pool = BackendPool("test", ["http://a/post"])
+        with pool.lease() as backend:
+            assert backend.outstanding == 1
+        assert backend.outstanding == 0
+
+
+class TestEjection:
+    def test_ejects_after_consecutive_failures(self):
+        pool = _pool()
+        _fail(pool, "http://a/post", 2)
+
+        picks = {pool.pick().url for _ in range(100)}
+        assert "http://a/post" not in picks
+
+    def test_success_resets_failure_count(self):
+        pool = _pool()
+        _fail(pool, "http://a/post", 1)
+        pool.record_status(pool.backends[0], 200)
+        _fail(pool, "http://a/post", 1)
+
+        assert pool.backends[0].ejections == 0
+        assert pool.backends[0].consecutive_failures == 1
+
+    def test_transport_errors_count_as_failures(self):
+        pool = BackendPool("test", URLS[:2], eject_failures=1)
+        with patch.object(pool, "pick", return_value=pool.backends[0]):
+            with pytest.raises(httpx.ConnectError):
+                with pool.lease():
+                    raise httpx.ConnectError("refused")
+        assert pool.backends[0].ejections == 1
+
+    def test_uses_all_backends_when_all_are_ejected(self):
+        pool = _pool()
+        for url in URLS:
+            _fail(pool, url, 2)
+        assert pool.pick().url in URLS
+
+    def test_rejoins_with_slow_start(self):
+        pool = _pool()
+        with patch("app.core.balancer.time.monotonic", return_value=100.0):
+            _fail(pool, "http://a/post", 2)
+        backend = pool.backends[0]
+
+        assert not backend.available(105.0)
+        assert backend.available(110.0)
+        assert backend.weight(110.0, 10) == pytest.approx(0.1)
+        assert backend.weight(115.0, 10) == pytest.approx(0.55)
+        assert backend.weight(120.0, 10) == 1.0
+
+
+class TestPost:
+    @pytest.mark.asyncio
+    async def test_posts_to_picked_backend_and_records_status(self):
+        response = MagicMock(spec=httpx.Response)
+        response.status_code = 503
+        client = MagicMock()
+        client.post = AsyncMock(return_value=response)
+        pool = BackendPool("test", ["http://a/post"])
+
+        with patch("app.core.upstream.get_client", return_value=client):
+            await pool.post("m", json={"x": 1})
+
+        client.post.assert_called_once_with("http://a/post", json={"x": 1})
+        assert pool.backends[0].consecutive_failures == 1
+
+
+class TestParseUrls:
+    def test_falls_back_to_default(self):
+        assert parse_urls("", "http://default") == ["http://default"]
+
+    def test_splits_and_strips(self):
+        assert parse_urls("http://a, http://b", "x") == ["http://a", "http://b"]
@@ -0,0 +1,109 @@
+"""
+tests/unit/core/test_batching.py
+
+Unit tests for MicroBatcher.
+
+The batcher is pure asyncio — no HTTP involved — so these tests drive it
+with a fake flush function and check the three promises it makes:
+  - concurrent submits are grouped into one flush call
+  - every caller gets its OWN result back
+  - one caller giving up does not break the others
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.batching import MicroBatcher
+
+
+def make_batcher(max_batch_size=8, max_wait_ms=5.0):
+    calls = []
+
+    async def flush(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    return MicroBatcher(flush, max_batch_size, max_wait_ms), calls
+
+
+class TestMicroBatcher:
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_share_one_flush(self):
+        batcher, calls = make_batcher()
+
+        results = await asyncio.gather(*(batcher.submit(t) for t in "abc"))
+
+        assert results == ["A", "B", "C"]
+        assert calls == [["a", "b", "c"]]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting(self):
+        batcher, calls = make_batcher(max_batch_size=2, max_wait_ms=10_000)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a"), batcher.submit("b")), timeout=1
+        )
+
+        assert results == ["A", "B"]
+        assert calls == [["a", "b"]]
+
+    @pytest.mark.asyncio
+    async def test_splits_into_max_size_batches(self):
+        batcher, calls = make_batcher(max_batch_size=2)
+
+        await asyncio.gather(*(batcher.submit(t) for t in "abcde"))
+
+        assert [len(c) for c in calls] == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_flush_error_reaches_every_caller(self):
+        async def failing_flush(items):
+            raise RuntimeError("upstream down")
+
+        batcher = MicroBatcher(failing_flush, max_batch_size=8, max_wait_ms=1)
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_short_flush_result_fails_every_caller(self):
+        async def short_flush(items):
+            return [item.upper() for item in items[:-1]]
+
+        batcher = MicroBatcher(short_flush, max_batch_size=8, max_wait_ms=1)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(t) for t in "abc"), return_exceptions=True),
+            timeout=1,
+        )
+
+        # Nobody is left waiting, and nobody gets a result that may be
+        # someone else's
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_is_dropped_from_batch(self):
+        batcher, calls = make_batcher(max_wait_ms=20)
+
+        leaver = asyncio.create_task(batcher.submit("gone"))
+        stayer = asyncio.create_task(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        leaver.cancel()
+
+        assert await stayer == "KEPT"
+        assert calls == [["kept"]]
+
+    @pytest.mark.asyncio
+    async def test_stats_track_batches_and_waits(self):
+        batcher, _ = make_batcher()
+
+        await asyncio.gather(*(batcher.submit(t) for t in "abcd"))
+        stats = batcher.stats()
+
+        assert stats["batches"] == 1
+        assert stats["items"] == 4
+        assert stats["queue_depth"] == 0
+        assert stats["batch_size_histogram"]["<=4"] == 1
+        assert sum(stats["wait_ms_histogram"].values()) == 4
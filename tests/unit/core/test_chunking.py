@@ -0,0 +1,81 @@
+"""
+tests/unit/core/test_chunking.py
+
+Unit tests for window splitting and pooling.
+"""
+
+import numpy as np
+import pytest
+
+from app.core.chunking import count_windows, pool, split
+
+
+class TestSplitChars:
+    def test_short_text_is_one_window(self):
+        assert split("hello", "chars", 10, 2) == [(0, 5)]
+
+    def test_windows_overlap(self):
+        assert split("abcdefghij", "chars", 4, 1) == [(0, 4), (3, 7), (6, 10)]
+
+    def test_last_window_ends_at_text_end(self):
+        spans = split("x" * 25, "chars", 10, 0)
+        assert spans == [(0, 10), (10, 20), (20, 25)]
+
+    def test_whitespace_only_has_no_windows(self):
+        assert split("   ", "chars", 10, 0) == []
+
+
+class TestSplitTokens:
+    def test_windows_cover_whole_tokens(self):
+        text = "one two, three four five"
+        spans = split(text, "tokens", 3, 1)
+
+        assert [text[start:end] for start, end in spans] == [
+            "one two,",
+            ", three four",
+            "four five",
+        ]
+
+    def test_no_tokens_has_no_windows(self):
+        assert split(" \n ", "tokens", 3, 0) == []
+
+
+class TestCountWindows:
+    @pytest.mark.parametrize("unit", ["chars", "tokens"])
+    @pytest.mark.parametrize("size, overlap", [(1, 0), (3, 1), (4, 0), (5, 4)])
+    @pytest.mark.parametrize("words", [0, 1, 3, 7, 20])
+    def test_matches_split(self, unit, size, overlap, words):
+        text = " ".join(f"w{i}" for i in range(words))
+        expected = len(split(text, unit, size, overlap))
+        assert count_windows(text, unit, size, overlap, limit=1000) == expected
+
+    def test_stops_past_the_limit(self, monkeypatch):
+        from app.core import chunking
+
+        seen = []
+        finditer = chunking.TOKEN_RE.finditer
+
+        class CountingPattern:
+            def finditer(self, text):
+                for match in finditer(text):
+                    seen.append(match)
+                    yield match
+
+        monkeypatch.setattr(chunking, "TOKEN_RE", CountingPattern())
+        text = "word " * 100_000
+
+        assert count_windows(text, "tokens", 10, 2, limit=3) == 4
+        # Enough tokens for 4 windows, not the whole text
+        assert len(seen) == 10 + 3 * 8
+
+
+class TestPool:
+    def test_mean(self):
+        matrix = np.array([[1, 2], [3, 4]], dtype=np.float32)
+        assert pool(matrix, "mean", np.ones(2)).tolist() == [2, 3]
+
+    def test_weighted_mean(self):
+        matrix = np.array([[0, 0], [4, 8]], dtype=np.float32)
+        pooled = pool(matrix, "weighted_mean", np.array([3, 1]))
+        assert pooled.tolist() == pytest.approx([1, 2])
+        assert pooled.dtype == np.float32
@@ -0,0 +1,206 @@
+"""
+tests/unit/core/test_concurrency.py
+
+Unit tests for AdaptiveLimiter.
+
+Latency samples are fed in through Slot objects whose start time is set in
+the past, so each test controls exactly what the limiter observes. As with
+admission control, no path out of acquire() may leak a slot.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.concurrency import DROPPED, IGNORED, AdaptiveLimiter, Slot
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test-model", **kwargs)
+
+
+def _slot(latency: float, in_flight: int) -> Slot:
+    return Slot(time.monotonic() - latency, in_flight)
+
+
+def _feed(limiter: AdaptiveLimiter, latency: float, count: int, in_flight=None):
+    """Release `count` samples of `latency` taken with the limiter fully busy."""
+    for _ in range(count):
+        limiter.in_flight += 1
+        busy = limiter.limit if in_flight is None else in_flight
+        limiter.release(_slot(latency, int(busy)))
+
+
+class TestSlots:
+    @pytest.mark.asyncio
+    async def test_admits_up_to_the_limit(self):
+        limiter = _limiter(initial_limit=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        assert limiter.in_flight == 2
+        assert limiter.queued == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_released_slot_goes_to_oldest_waiter(self):
+        limiter = _limiter(initial_limit=1)
+        slot = await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            order.append((name, await limiter.acquire()))
+
+        first = asyncio.create_task(wait("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(wait("second"))
+        await asyncio.sleep(0)
+
+        limiter.release(slot, IGNORED)
+        await first
+        limiter.release(order[0][1], IGNORED)
+        await second
+        assert [name for name, _ in order] == ["first", "second"]
+        assert limiter.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_times_out(self):
+        limiter = _limiter(initial_limit=1, queue_timeout_ms=10)
+        await limiter.acquire()
+
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await limiter.acquire()
+
+        assert exc_info.value.error_code == ErrorCode.SYS_OVERLOADED
+        assert exc_info.value.details == {
+            "model": "test-model",
+            "reason": "upstream_limit",
+        }
+        assert limiter.rejected == 1
+        assert limiter.in_flight == 1
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_handed_over_at_timeout_is_returned(self, monkeypatch):
+        from app.core import concurrency
+
+        limiter = _limiter(initial_limit=1)
+        holder = await limiter.acquire()
+
+        async def wait_for(future, timeout):
+            # The holder finishes just as the wait times out
+            limiter.release(holder, IGNORED)
+            assert future.done()
+            raise TimeoutError
+
+        monkeypatch.setattr(concurrency.asyncio, "wait_for", wait_for)
+        with pytest.raises(ServiceUnavailableException):
+            await limiter.acquire()
+
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak(self):
+        limiter = _limiter(initial_limit=1)
+        slot = await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(slot, IGNORED)
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_raised_limit_admits_waiters(self):
+        limiter = _limiter(initial_limit=1)
+        slot = await limiter.acquire()
+        waiters = [asyncio.create_task(limiter.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        limiter._set_limit(3)
+        await asyncio.gather(*waiters)
+        assert limiter.in_flight == 3
+        limiter.release(slot, IGNORED)
+
+    def test_rejects_unknown_algorithm(self):
+        with pytest.raises(ValueError):
+            _limiter(algorithm="fixed")
+
+
+class TestGradient:
+    def test_grows_while_latency_is_steady(self):
+        limiter = _limiter(initial_limit=10)
+        _feed(limiter, 0.02, 20)
+        assert limiter.limit > 15
+
+    def test_idle_slots_do_not_grow_the_limit(self):
+        limiter = _limiter(initial_limit=10)
+        _feed(limiter, 0.02, 20, in_flight=2)
+        assert limiter.limit == 10
+
+    def test_shrinks_when_latency_climbs(self):
+        limiter = _limiter(initial_limit=40)
+        _feed(limiter, 0.02, 50)
+        grown = limiter.limit
+        _feed(limiter, 0.2, 10)
+        assert limiter.limit < grown * 0.6
+
+    def test_stays_within_bounds(self):
+        limiter = _limiter(initial_limit=10, min_limit=5, max_limit=12)
+        _feed(limiter, 0.02, 50)
+        assert limiter.limit == 12
+        _feed(limiter, 1.0, 50)
+        assert limiter.limit >= 5
+
+
+class TestAimd:
+    def test_grows_about_one_per_limit_of_samples(self):
+        limiter = _limiter(algorithm="aimd", initial_limit=10)
+        _feed(limiter, 0.02, 10)
+        assert 10.9 < limiter.limit < 11.1
+
+    def test_backs_off_on_slow_sample(self):
+        limiter = _limiter(algorithm="aimd", initial_limit=10)
+        _feed(limiter, 0.02, 10)
+        before = limiter.limit
+        _feed(limiter, 0.2, 1)
+        assert limiter.limit == pytest.approx(before * 0.9)
+
+
+class TestDrops:
+    def test_drop_cuts_the_limit(self):
+        limiter = _limiter(initial_limit=20)
+        limiter.in_flight = 1
+        limiter.release(_slot(0.02, 1), DROPPED)
+        assert limiter.limit == pytest.approx(18)
+        assert limiter.dropped == 1
+
+    def test_cuts_once_per_round_trip(self):
+        limiter = _limiter(initial_limit=20)
+        slots = [_slot(0.02, 3) for _ in range(3)]
+        limiter.in_flight = 3
+        for slot in slots:
+            limiter.release(slot, DROPPED)
+        # All three were in flight together, so they count as one signal
+        assert limiter.limit == pytest.approx(18)
+
+        limiter.in_flight = 1
+        limiter.release(Slot(time.monotonic(), 1), DROPPED)
+        assert limiter.limit == pytest.approx(16.2)
+
+    def test_ignored_outcome_leaves_the_limit(self):
+        limiter = _limiter(initial_limit=20)
+        limiter.in_flight = 1
+        limiter.release(_slot(5.0, 20), IGNORED)
+        assert limiter.limit == 20
+        assert limiter.samples == 0
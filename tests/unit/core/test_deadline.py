@@ -0,0 +1,94 @@
+"""
+tests/unit/core/test_deadline.py
+
+Unit tests for per-request deadlines.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core import deadline, upstream
+from app.core.exceptions import GatewayTimeoutException, ValidationException
+
+
+class TestParse:
+    def test_no_header_means_no_deadline_by_default(self):
+        assert deadline.parse(None) is None
+
+    def test_no_header_uses_configured_default(self, monkeypatch):
+        monkeypatch.setattr(settings, "REQUEST_DEFAULT_TIMEOUT_SECONDS", 2.5)
+        assert deadline.parse(None) == 2.5
+
+    def test_header_is_capped(self, monkeypatch):
+        monkeypatch.setattr(settings, "REQUEST_MAX_TIMEOUT_SECONDS", 10)
+        assert deadline.parse("0.25") == 0.25
+        assert deadline.parse("3600") == 10
+
+    @pytest.mark.parametrize("value", ["soon", "nan", "inf", ""])
+    def test_rejects_non_numbers(self, value):
+        with pytest.raises(ValidationException):
+            deadline.parse(value)
+
+
+class TestScope:
+    def test_remaining_counts_down_and_resets(self):
+        assert deadline.remaining() is None
+        with deadline.scope(5):
+            assert 4.9 < deadline.remaining() <= 5
+        assert deadline.remaining() is None
+
+    def test_check_fails_once_spent(self):
+        with deadline.scope(0):
+            with pytest.raises(GatewayTimeoutException) as exc:
+                deadline.check()
+        assert exc.value.error_code == "SYS_004"
+
+    def test_client_timeout_is_cut_to_budget(self):
+        timeout = httpx.Timeout(connect=5, read=20, write=20, pool=5)
+        assert deadline.client_timeout(timeout) is None
+        with deadline.scope(1):
+            cut = deadline.client_timeout(timeout)
+        assert cut.read <= 1 and cut.connect <= 1
+
+    def test_detached_work_has_no_deadline(self):
+        async def seen():
+            return deadline.remaining()
+
+        async def main():
+            with deadline.scope(1):
+                return await deadline.detached(seen()), deadline.remaining()
+
+        inside, after = asyncio.run(main())
+        assert inside is None
+        assert after is not None
+
+
+class TestUpstreamPost:
+    @pytest.fixture
+    def client(self, monkeypatch):
+        client = MagicMock()
+        client.timeout = httpx.Timeout(20)
+        client.post = AsyncMock(return_value=httpx.Response(200))
+        monkeypatch.setattr(upstream, "get_client", lambda: client)
+        return client
+
+    def test_passes_budget_as_timeout(self, client):
+        async def main():
+            with deadline.scope(2):
+                await upstream.post("m", "http://upstream/post", json={})
+
+        asyncio.run(main())
+        assert client.post.call_args.kwargs["timeout"].read <= 2
+
+    def test_spent_budget_never_calls_upstream(self, client):
+        async def main():
+            with deadline.scope(-1):
+                await upstream.post("m", "http://upstream/post", json={})
+
+        with pytest.raises(GatewayTimeoutException):
+            asyncio.run(main())
+        client.post.assert_not_called()
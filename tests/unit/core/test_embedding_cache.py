@@ -0,0 +1,119 @@
+"""
+tests/unit/core/test_embedding_cache.py
+
+Unit tests for EmbeddingCache.
+
+Everything here is in-memory, so the tests exercise the eviction rules
+directly: LRU order, TTL expiry and the byte budget.
+"""
+
+import numpy as np
+import pytest
+
+from app.core import embedding_cache as cache_module
+from app.core.embedding_cache import ENTRY_OVERHEAD_BYTES, EmbeddingCache
+
+MODEL = "mock-embeddinggemma"
+ENTRY_BYTES = 512 * 4 + ENTRY_OVERHEAD_BYTES
+
+
+def vec(value=0.5):
+    return np.full(512, value)
+
+
+class TestEmbeddingCache:
+    def test_miss_then_hit(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+        assert cache.get(MODEL, "hello") is None
+        cache.put(MODEL, "hello", vec())
+        assert cache.get(MODEL, "hello") is not None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_stores_float32(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+        cache.put(MODEL, "hello", vec())
+        assert cache.get(MODEL, "hello").dtype == np.float32
+
+    def test_returned_vector_cannot_corrupt_the_cache(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+        cache.put(MODEL, "hello", vec(0.5))
+
+        vector = cache.get(MODEL, "hello")
+        with pytest.raises(ValueError):
+            vector /= 2
+        with pytest.raises(ValueError):
+            vector[0] = 0
+
+        assert (cache.get(MODEL, "hello") == np.float32(0.5)).all()
+
+    def test_put_copies_the_callers_array(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+        original = vec(0.5)
+        cache.put(MODEL, "hello", original)
+
+        original[:] = 0
+        assert (cache.get(MODEL, "hello") == np.float32(0.5)).all()
+
+    def test_keys_are_isolated_per_model(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+        cache.put(MODEL, "hello", vec())
+        assert cache.get("other-model", "hello") is None
+
+    def test_evicts_least_recently_used_over_budget(self):
+        cache = EmbeddingCache(max_bytes=2 * ENTRY_BYTES, ttl_seconds=60)
+
+        cache.put(MODEL, "a", vec())
+        cache.put(MODEL, "b", vec())
+        cache.get(MODEL, "a")  # "b" is now least recently used
+        cache.put(MODEL, "c", vec())
+
+        assert cache.get(MODEL, "b") is None
+        assert cache.get(MODEL, "a") is not None
+        assert cache.evictions == 1
+        assert cache.bytes <= cache.max_bytes
+
+    def test_expired_entries_are_misses(self, monkeypatch):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=10)
+        now = 1000.0
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now)
+        cache.put(MODEL, "hello", vec())
+
+        now = 1011.0
+        assert cache.get(MODEL, "hello") is None
+        assert cache.expirations == 1
+        assert cache.bytes == 0
+
+    def test_replacing_an_entry_keeps_byte_count(self):
+        cache = EmbeddingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+        cache.put(MODEL, "hello", vec(0.1))
+        cache.put(MODEL, "hello", vec(0.2))
+        assert cache.bytes == ENTRY_BYTES
+        assert cache.get(MODEL, "hello")[0] == pytest.approx(0.2)
+
+    def test_zero_budget_is_disabled(self):
+        assert not EmbeddingCache(max_bytes=0, ttl_seconds=60).enabled
+
+
+class TestRunEmbeddingTaskCaching:
+    @pytest.mark.asyncio
+    async def test_hit_skips_upstream(self, mock_httpx_embedding):
+        from app.core.gen_and_embed import run_embedding_task
+
+        first = await run_embedding_task("test text")
+        second = await run_embedding_task("test text")
+
+        mock_httpx_embedding.post.assert_called_once()
+        assert (first["embedding"] == second["embedding"]).all()
+
+    @pytest.mark.asyncio
+    async def test_bypass_always_calls_upstream(self, mock_httpx_embedding):
+        from app.core.gen_and_embed import run_embedding_task
+
+        await run_embedding_task("test text", use_cache=False)
+        await run_embedding_task("test text", use_cache=False)
+
+        assert mock_httpx_embedding.post.call_count == 2
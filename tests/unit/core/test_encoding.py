@@ -0,0 +1,177 @@
+"""
+tests/unit/core/test_encoding.py
+
+Unit tests for the embedding wire encodings.
+
+Every encoding must round-trip: whatever the server writes, a client
+decoding it with the documented layout gets the same numbers back.
+"""
+
+import numpy as np
+import pytest
+
+from app.core.encoding import (
+    BINARY_HEADER,
+    RECORD_HEADER,
+    decode_base64,
+    decode_binary,
+    decode_binary_scales,
+    decode_records,
+    encode_batch_binary,
+    encode_batch_items,
+    encode_binary,
+    encode_embedding,
+    encode_ndjson,
+    encode_records,
+)
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).random(512, dtype=np.float32)
+
+
+class TestEncodeEmbedding:
+    def test_float_is_a_list(self, vector):
+        encoded = encode_embedding(vector, "float")
+        assert isinstance(encoded["embedding"], list)
+        assert len(encoded["embedding"]) == 512
+        assert encoded["scale"] is None
+
+    def test_base64_float32_round_trips_exactly(self, vector):
+        encoded = encode_embedding(vector, "base64", "float32")["embedding"]
+        assert isinstance(encoded, str)
+        assert (decode_base64(encoded, "float32") == vector).all()
+
+    def test_base64_float16_is_half_the_size(self, vector):
+        f32 = encode_embedding(vector, "base64", "float32")["embedding"]
+        f16 = encode_embedding(vector, "base64", "float16")["embedding"]
+        assert len(f16) < len(f32) * 0.6
+        np.testing.assert_allclose(decode_base64(f16, "float16"), vector, atol=1e-3)
+
+    def test_float_ignores_float16(self, vector):
+        # float16 only changes the packed encodings, not JSON numbers
+        encoded = encode_embedding(vector, "float", "float16")["embedding"]
+        assert encoded == vector.tolist()
+
+
+class TestQuantized:
+    def test_int8_json_has_codes_and_scale(self, vector):
+        encoded = encode_embedding(vector, "float", "int8")
+        codes = np.asarray(encoded["embedding"])
+        assert codes.min() >= -127 and codes.max() == 127
+        np.testing.assert_allclose(
+            codes * encoded["scale"], vector, atol=encoded["scale"]
+        )
+
+    def test_binary_base64_is_packed_bits(self, vector):
+        encoded = encode_embedding(vector - 0.5, "base64", "binary")
+        packed = decode_base64(encoded["embedding"], "binary")
+        assert packed.size == 64
+        assert (np.unpackbits(packed) == (vector > 0.5)).all()
+        assert encoded["scale"] is None
+
+    def test_dimensions_truncate_before_encoding(self, vector):
+        encoded = encode_embedding(vector, "float", dimensions=32)
+        assert len(encoded["embedding"]) == 32
+        assert np.linalg.norm(encoded["embedding"]) == pytest.approx(1, rel=1e-5)
+
+    def test_batch_items_get_scales_and_failures_pass_through(self, vector):
+        failed = {"index": 1, "embedding": None, "error": {"code": "X", "message": ""}}
+        data = [{"index": 0, "embedding": vector, "error": None}, failed]
+        first, second = encode_batch_items(data, "float", "int8", 16)
+        assert len(first["embedding"]) == 16 and first["scale"] > 0
+        assert second is failed
+
+    def test_int8_binary_payload_carries_scales(self, vector):
+        matrix = np.stack([vector, -vector])
+        payload = encode_binary(matrix, "int8")
+        codes, scales = decode_binary(payload), decode_binary_scales(payload)
+        assert codes.dtype == np.int8 and codes.shape == (2, 512)
+        np.testing.assert_allclose(codes * scales[:, np.newaxis], matrix, atol=0.01)
+
+    def test_packed_binary_payload_keeps_logical_dim(self, vector):
+        payload = encode_binary(vector[np.newaxis], "binary", dimensions=100)
+        assert BINARY_HEADER.unpack_from(payload)[-1] == 100
+        assert decode_binary(payload).shape == (1, 13)
+        assert decode_binary_scales(payload) is None
+
+    def test_failed_batch_rows_get_nan_scale(self, vector):
+        data = [
+            {"index": 0, "embedding": vector, "error": None},
+            {"index": 1, "embedding": None, "error": {"code": "X", "message": ""}},
+        ]
+        payload, errors = encode_batch_binary(data, 512, "int8")
+        scales = decode_binary_scales(payload)
+        assert scales[0] > 0 and np.isnan(scales[1])
+        assert [e["index"] for e in errors] == [1]
+
+    def test_int8_records_decode_to_floats(self, vector):
+        data = [{"index": 0, "embedding": vector, "error": None}]
+        [(_, decoded)] = decode_records(encode_records(data, "int8", 64))
+        np.testing.assert_allclose(
+            decoded, vector[:64] / np.linalg.norm(vector[:64]), atol=0.01
+        )
+
+
+class TestBinary:
+    def test_header_is_sixteen_bytes(self):
+        assert BINARY_HEADER.size == 16
+
+    def test_round_trips_matrix(self, vector):
+        matrix = np.stack([vector, vector * 2])
+        decoded = decode_binary(encode_binary(matrix))
+        assert decoded.shape == (2, 512)
+        assert (decoded == matrix).all()
+
+    def test_payload_is_header_plus_raw_bytes(self, vector):
+        payload = encode_binary(vector[np.newaxis], "float16")
+        assert len(payload) == BINARY_HEADER.size + 512 * 2
+        assert decode_binary(payload).dtype == np.float16
+
+    def test_rejects_foreign_payload(self):
+        with pytest.raises(ValueError):
+            decode_binary(b"\x00" * 32)
+
+
+class TestRecords:
+    def test_header_is_twelve_bytes(self):
+        assert RECORD_HEADER.size == 12
+
+    def test_round_trips_vectors_and_errors(self, vector):
+        data = [
+            {"index": 3, "embedding": vector, "error": None},
+            {
+                "index": 4,
+                "embedding": None,
+                "error": {"code": "VAL_INPUT_001", "message": "Text is empty."},
+            },
+        ]
+
+        (first_index, first), (second_index, second) = decode_records(
+            encode_records(data)
+        )
+
+        assert first_index == 3
+        assert (first == vector).all()
+        assert second_index == 4
+        assert second["code"] == "VAL_INPUT_001"
+
+    def test_float16_records(self, vector):
+        data = [{"index": 0, "embedding": vector, "error": None}]
+        [(_, decoded)] = decode_records(encode_records(data, "float16"))
+        assert decoded.dtype == np.float16
+        np.testing.assert_allclose(decoded, vector, rtol=1e-3)
+
+
+class TestNdjson:
+    def test_one_line_per_item(self, vector):
+        import json
+
+        data = [
+            {"index": i, "id": None, "embedding": vector, "error": None}
+            for i in range(3)
+        ]
+        lines = encode_ndjson(data, "float").decode().splitlines()
+
+        assert [json.loads(line)["index"] for line in lines] == [0, 1, 2]
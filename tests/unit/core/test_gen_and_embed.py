@@ -13,14 +13,17 @@ The pattern in every test:
     async def test_something(self, mock_httpx_generation):
                                    ^^^^^^^^^^^^^^^^^^^
                                    This fixture activates before the test,
-                                   replacing httpx.AsyncClient with a fake.
+                                   replacing the shared client with a fake.
                                    The real network is never touched.
 """
 
+import asyncio
 import pytest
 import httpx
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from app.core.balancer import BackendPool
+
 
 class TestRunGenerationTask:
     # ------------------------------------------------------------------
@@ -239,6 +242,7 @@ class TestRunGenerationTask:
 
         echoed = {"prompt": query, "model": "mock-gemma3:4b"}
         mock_response = MagicMock(spec=httpx.Response)
+        mock_response.status_code = 200
         mock_response.raise_for_status = MagicMock()
         mock_response.json.return_value = {"json": echoed}
 
@@ -247,9 +251,7 @@ class TestRunGenerationTask:
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
         mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch(
-            "app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client
-        ):
+        with patch("app.core.upstream.get_client", return_value=mock_client):
             result = await run_generation_task(query)
 
         assert isinstance(result, dict)
@@ -286,11 +288,18 @@ class TestRunEmbeddingTask:
         assert "embedding" in result
 
     @pytest.mark.asyncio
-    async def test_embedding_is_a_list(self, mock_httpx_embedding):
+    async def test_embedding_is_a_float32_array(self, mock_httpx_embedding):
+        """
+        The core returns the NumPy array as-is; converting to a list (or
+        base64, or raw bytes) is the router's job, per encoding_format.
+        """
+        import numpy as np
+
         from app.core.gen_and_embed import run_embedding_task
 
         result = await run_embedding_task("test text")
-        assert isinstance(result["embedding"], list)
+        assert isinstance(result["embedding"], np.ndarray)
+        assert result["embedding"].dtype == np.float32
 
     @pytest.mark.asyncio
     async def test_embedding_has_512_dimensions(self, mock_httpx_embedding):
@@ -300,11 +309,11 @@ class TestRunEmbeddingTask:
         assert len(result["embedding"]) == 512
 
     @pytest.mark.asyncio
-    async def test_embedding_values_are_floats(self, mock_httpx_embedding):
+    async def test_embedding_is_one_dimensional(self, mock_httpx_embedding):
         from app.core.gen_and_embed import run_embedding_task
 
         result = await run_embedding_task("test text")
-        assert all(isinstance(v, float) for v in result["embedding"])
+        assert result["embedding"].shape == (512,)
 
     @pytest.mark.asyncio
     async def test_embedding_values_in_zero_to_one_range(self, mock_httpx_embedding):
@@ -350,6 +359,7 @@ class TestRunEmbeddingTask:
         text = "hello"
         echoed = {"input": text, "model": "mock-embeddinggemma"}
         mock_response = MagicMock(spec=httpx.Response)
+        mock_response.status_code = 200
         mock_response.raise_for_status = MagicMock()
         mock_response.json.return_value = {"json": echoed}
 
@@ -358,10 +368,660 @@ class TestRunEmbeddingTask:
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
         mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch(
-            "app.core.gen_and_embed.httpx.AsyncClient", return_value=mock_client
-        ):
+        with patch("app.core.upstream.get_client", return_value=mock_client):
             result1 = await run_embedding_task(text)
             result2 = await run_embedding_task(text)
 
-        assert result1["embedding"] == result2["embedding"]
+        assert (result1["embedding"] == result2["embedding"]).all()
+
+
+class TestBuildEmbeddings:
+    def test_returns_one_row_per_text(self):
+        from app.core.gen_and_embed import build_embeddings
+
+        vectors = build_embeddings(["a", "bb", "ccc"])
+        assert vectors.shape == (3, 512)
+
+    def test_same_length_texts_share_a_vector(self):
+        from app.core.gen_and_embed import build_embeddings
+
+        vectors = build_embeddings(["abc", "xyz", "hello"])
+        assert (vectors[0] == vectors[1]).all()
+        assert not (vectors[0] == vectors[2]).all()
+
+    def test_row_does_not_depend_on_batch_composition(self):
+        from app.core.gen_and_embed import build_embeddings
+
+        alone = build_embeddings(["hello"])[0]
+        batched = build_embeddings(["a", "hello", "longer text"])[1]
+        assert (alone == batched).all()
+
+
+class TestRunBatchEmbeddingTask:
+    @pytest.mark.asyncio
+    async def test_returns_one_item_per_text(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        result = await run_batch_embedding_task(["one", "two", "three"])
+        assert [item["index"] for item in result["data"]] == [0, 1, 2]
+        assert all(len(item["embedding"]) == 512 for item in result["data"])
+
+    @pytest.mark.asyncio
+    async def test_makes_a_single_upstream_call(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        await run_batch_embedding_task(["one", "two", "three"])
+        mock_httpx_echo.post.assert_called_once()
+        sent_json = mock_httpx_echo.post.call_args[1]["json"]
+        assert sent_json["input"] == ["one", "two", "three"]
+
+    @pytest.mark.asyncio
+    async def test_matches_single_embedding(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task, run_embedding_task
+
+        single = await run_embedding_task("hello")
+        batch = await run_batch_embedding_task(["hello"])
+        assert (batch["data"][0]["embedding"] == single["embedding"]).all()
+
+    @pytest.mark.asyncio
+    async def test_short_upstream_answer_is_rejected(self, mock_httpx_echo):
+        from app.core.exceptions import ServiceUnavailableException
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        async def short_echo(url, json=None, **kwargs):
+            response = MagicMock(spec=httpx.Response)
+            response.status_code = 200
+            response.json.return_value = {"json": {"input": json["input"][:-1]}}
+            return response
+
+        mock_httpx_echo.post.side_effect = short_echo
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await run_batch_embedding_task(["one", "two", "three"])
+
+        assert exc_info.value.error_code == "SYS_003"
+        assert exc_info.value.details["expected_rows"] == 3
+        assert exc_info.value.details["received_rows"] == 2
+
+    @pytest.mark.asyncio
+    async def test_bad_item_does_not_fail_batch(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        result = await run_batch_embedding_task(["good", "   ", "also good"])
+        bad = result["data"][1]
+        assert bad["embedding"] is None
+        assert bad["error"]["code"] == "VAL_INPUT_001"
+        assert result["data"][0]["error"] is None
+        assert result["data"][2]["embedding"] is not None
+
+    @pytest.mark.asyncio
+    async def test_invalid_items_are_not_sent_upstream(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        await run_batch_embedding_task(["good", ""])
+        sent_json = mock_httpx_echo.post.call_args[1]["json"]
+        assert sent_json["input"] == ["good"]
+
+    @pytest.mark.asyncio
+    async def test_all_invalid_skips_upstream(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_embedding_task
+
+        result = await run_batch_embedding_task(["", " "])
+        mock_httpx_echo.post.assert_not_called()
+        assert all(item["error"] for item in result["data"])
+
+    @pytest.mark.asyncio
+    async def test_too_long_item_reports_error(self, mock_httpx_echo, monkeypatch):
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_TEXT_CHARS", 5)
+        result = await gen_and_embed.run_batch_embedding_task(["short", "too long"])
+        assert result["data"][1]["error"]["code"] == "VAL_INPUT_002"
+
+    @pytest.mark.asyncio
+    async def test_rejects_oversized_batch(self, mock_httpx_echo, monkeypatch):
+        from app.core import gen_and_embed
+        from app.core.exceptions import ValidationException
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_BATCH_SIZE", 2)
+        with pytest.raises(ValidationException):
+            await gen_and_embed.run_batch_embedding_task(["a", "b", "c"])
+        mock_httpx_echo.post.assert_not_called()
+
+
+class TestIterBulkEmbeddings:
+    @staticmethod
+    async def _lines(*lines: str):
+        for line in lines:
+            yield (line + "\n").encode()
+
+    @staticmethod
+    async def _collect(chunks):
+        from app.core.gen_and_embed import iter_bulk_embeddings
+
+        items = [item async for batch in iter_bulk_embeddings(chunks) for item in batch]
+        return sorted(items, key=lambda item: item["index"])
+
+    @pytest.mark.asyncio
+    async def test_strings_and_objects(self, mock_httpx_echo):
+        items = await self._collect(
+            self._lines('"plain text"', '{"id": 7, "text": "with id"}')
+        )
+
+        assert [item["index"] for item in items] == [0, 1]
+        assert items[0]["id"] is None
+        assert items[1]["id"] == "7"
+        assert all(item["embedding"].shape == (512,) for item in items)
+
+    @pytest.mark.asyncio
+    async def test_bad_lines_get_item_errors(self, mock_httpx_echo):
+        from app.core.error_codes import ErrorCode
+
+        items = await self._collect(self._lines('"ok"', "not json", '""', "[1]"))
+
+        assert items[0]["error"] is None
+        assert items[1]["error"]["code"] == ErrorCode.VAL_REQUEST_INVALID
+        assert items[2]["error"]["code"] == ErrorCode.VAL_INPUT_EMPTY
+        assert items[3]["error"]["code"] == ErrorCode.VAL_REQUEST_INVALID
+
+    @pytest.mark.asyncio
+    async def test_blank_lines_are_skipped(self, mock_httpx_echo):
+        items = await self._collect(self._lines('"a"', "", '"b"'))
+        assert [item["index"] for item in items] == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_batches_and_concurrency_are_bounded(self, monkeypatch):
+        import asyncio
+
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_STREAM_BATCH_SIZE", 4)
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_STREAM_CONCURRENCY", 2)
+        sizes = []
+        in_flight = peak = 0
+
+        async def embed(texts):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            sizes.append(len(texts))
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return gen_and_embed.build_embeddings(texts)
+
+        with patch("app.core.gen_and_embed._embed_upstream", side_effect=embed):
+            items = await self._collect(self._lines(*(f'"t{i}"' for i in range(18))))
+
+        assert len(items) == 18
+        assert sizes == [4, 4, 4, 4, 2]
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_upstream_failure_fails_only_that_batch(self, monkeypatch):
+        from app.core import gen_and_embed
+        from app.core.error_codes import ErrorCode
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_STREAM_BATCH_SIZE", 2)
+
+        async def embed(texts):
+            if "bad" in texts:
+                raise httpx.ConnectError("refused")
+            return gen_and_embed.build_embeddings(texts)
+
+        with patch("app.core.gen_and_embed._embed_upstream", side_effect=embed):
+            items = await self._collect(self._lines('"a"', '"b"', '"bad"', '"c"'))
+
+        assert [item["error"] is None for item in items] == [True, True, False, False]
+        assert items[2]["error"]["code"] == ErrorCode.SYS_INTERNAL_ERROR
+
+
+class TestRunChunkedEmbeddingTask:
+    @pytest.mark.asyncio
+    async def test_chunks_and_mean_pooling(self, mock_httpx_echo):
+        import numpy as np
+
+        from app.core.gen_and_embed import build_embeddings, run_chunked_embedding_task
+
+        text = "a" * 10 + "b" * 5
+        result = await run_chunked_embedding_task(text, "chars", 10, 0, "mean")
+
+        assert [(c["start"], c["end"]) for c in result["chunks"]] == [(0, 10), (10, 15)]
+        expected = build_embeddings([text[:10], text[10:]]).mean(axis=0)
+        np.testing.assert_allclose(result["embedding"], expected, rtol=1e-6)
+        mock_httpx_echo.post.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_pooling_none_returns_only_chunks(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_chunked_embedding_task
+
+        result = await run_chunked_embedding_task("x" * 30, "chars", 10, 0, "none")
+
+        assert result["embedding"] is None
+        assert len(result["chunks"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_many_chunks_go_up_in_parallel_batches(
+        self, mock_httpx_echo, monkeypatch
+    ):
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_BATCH_SIZE", 4)
+        result = await gen_and_embed.run_chunked_embedding_task(
+            "x" * 100, "chars", 10, 0, "mean"
+        )
+
+        assert len(result["chunks"]) == 10
+        assert mock_httpx_echo.post.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_too_many_chunks_raises(self, mock_httpx_echo, monkeypatch):
+        from app.core import gen_and_embed
+        from app.core.error_codes import ErrorCode
+        from app.core.exceptions import ValidationException
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_CHUNKS", 2)
+        with pytest.raises(ValidationException) as exc_info:
+            await gen_and_embed.run_chunked_embedding_task(
+                "x" * 100, "chars", 10, 0, "mean"
+            )
+        assert exc_info.value.error_code == ErrorCode.VAL_INPUT_TOO_LONG
+        mock_httpx_echo.post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_too_many_chunks_rejected_before_splitting(
+        self, mock_httpx_echo, monkeypatch
+    ):
+        from app.core import chunking, gen_and_embed
+        from app.core.exceptions import ValidationException
+
+        def split(*args):
+            raise AssertionError("split() ran for an oversized text")
+
+        monkeypatch.setattr(gen_and_embed.settings, "EMBED_MAX_CHUNKS", 2)
+        monkeypatch.setattr(chunking, "split", split)
+        with pytest.raises(ValidationException):
+            await gen_and_embed.run_chunked_embedding_task(
+                "word " * 10_000, "tokens", 10, 0, "mean"
+            )
+
+    @pytest.mark.asyncio
+    async def test_empty_text_raises(self, mock_httpx_echo):
+        from app.core.exceptions import ValidationException
+        from app.core.gen_and_embed import run_chunked_embedding_task
+
+        with pytest.raises(ValidationException):
+            await run_chunked_embedding_task("  ", "tokens", 10, 0, "mean")
+
+
+class TestEmbeddingMicroBatching:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_request(
+        self, mock_httpx_echo, monkeypatch
+    ):
+        import asyncio
+
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.embedding_batcher, "max_wait_ms", 5.0)
+        results = await asyncio.gather(
+            *(gen_and_embed.run_embedding_task(t) for t in ["a", "bb", "ccc"])
+        )
+
+        mock_httpx_echo.post.assert_called_once()
+        sent_json = mock_httpx_echo.post.call_args[1]["json"]
+        assert sent_json["input"] == ["a", "bb", "ccc"]
+        assert [len(r["embedding"]) for r in results] == [512, 512, 512]
+
+    @pytest.mark.asyncio
+    async def test_batched_result_matches_unbatched(self, mock_httpx_echo, monkeypatch):
+        from app.core import gen_and_embed
+
+        unbatched = await gen_and_embed.run_embedding_task("hello")
+        monkeypatch.setattr(gen_and_embed.embedding_batcher, "max_wait_ms", 1.0)
+        batched = await gen_and_embed.run_embedding_task("hello")
+
+        assert (batched["embedding"] == unbatched["embedding"]).all()
+
+
+class TestGenerationCoalescing:
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_prompts_share_one_call(self, mock_httpx_echo):
+        import asyncio
+
+        from app.core.gen_and_embed import run_generation_task
+
+        results = await asyncio.gather(
+            *(run_generation_task("same prompt") for _ in range(3))
+        )
+
+        mock_httpx_echo.post.assert_called_once()
+        assert len({r["choices"][0]["message"]["content"] for r in results}) == 1
+
+    @pytest.mark.asyncio
+    async def test_callers_get_independent_copies(self, mock_httpx_echo):
+        import asyncio
+
+        from app.core.gen_and_embed import run_generation_task
+
+        first, second = await asyncio.gather(
+            run_generation_task("same prompt"), run_generation_task("same prompt")
+        )
+        first["choices"][0]["message"]["content"] = "mutated"
+        assert second["choices"][0]["message"]["content"] != "mutated"
+
+    @pytest.mark.asyncio
+    async def test_disabled_sends_every_call(self, mock_httpx_echo, monkeypatch):
+        import asyncio
+
+        from app.core import gen_and_embed
+
+        monkeypatch.setattr(gen_and_embed.settings, "GENERATE_COALESCE", False)
+        await asyncio.gather(
+            *(gen_and_embed.run_generation_task("same prompt") for _ in range(3))
+        )
+        assert mock_httpx_echo.post.call_count == 3
+
+
+class TestRunBatchGenerationTask:
+    @pytest.mark.asyncio
+    async def test_results_are_in_input_order(self, mock_httpx_echo):
+        from app.core.gen_and_embed import run_batch_generation_task
+
+        queries = [f"prompt {i}" for i in range(20)]
+        result = await run_batch_generation_task(queries)
+
+        assert [item["index"] for item in result["data"]] == list(range(20))
+        assert result["data"][7]["response"] == "Processed remotely: prompt 7"
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped(self, monkeypatch):
+        import asyncio
+
+        from app.core import gen_and_embed
+        from tests.conftest import MOCK_GENERATION_RESPONSE
+
+        monkeypatch.setattr(gen_and_embed.settings, "GENERATE_BATCH_CONCURRENCY", 3)
+        in_flight = peak = 0
+
+        async def slow(query):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return MOCK_GENERATION_RESPONSE
+
+        with patch("app.core.gen_and_embed.run_generation_task", side_effect=slow):
+            result = await gen_and_embed.run_batch_generation_task(["q"] * 10)
+
+        assert peak == 3
+        assert len(result["data"]) == 10
+
+    @pytest.mark.asyncio
+    async def test_failed_item_does_not_fail_batch(self):
+        from app.core.error_codes import ErrorCode
+        from app.core.gen_and_embed import run_batch_generation_task
+        from tests.conftest import MOCK_GENERATION_RESPONSE
+
+        async def flaky(query):
+            if query == "bad":
+                raise httpx.ConnectError("refused")
+            return MOCK_GENERATION_RESPONSE
+
+        with patch("app.core.gen_and_embed.run_generation_task", side_effect=flaky):
+            result = await run_batch_generation_task(["good", "bad", "good"])
+
+        good, bad, _ = result["data"]
+        assert good["error"] is None and good["response"]
+        assert bad["response"] is None
+        assert bad["error"]["code"] == ErrorCode.SYS_INTERNAL_ERROR
+        assert "refused" not in bad["error"]["message"]
+
+    @pytest.mark.asyncio
+    async def test_too_many_queries_raises(self, monkeypatch):
+        from app.core import gen_and_embed
+        from app.core.exceptions import ValidationException
+
+        monkeypatch.setattr(gen_and_embed.settings, "GENERATE_MAX_BATCH_SIZE", 2)
+        with pytest.raises(ValidationException):
+            await gen_and_embed.run_batch_generation_task(["a", "b", "c"])
+
+    @pytest.mark.asyncio
+    async def test_closing_early_cancels_remaining_calls(self, monkeypatch):
+        import asyncio
+
+        from app.core import gen_and_embed
+        from tests.conftest import MOCK_GENERATION_RESPONSE
+
+        monkeypatch.setattr(gen_and_embed.settings, "GENERATE_BATCH_CONCURRENCY", 2)
+        cancelled = 0
+
+        async def maybe_hang(query):
+            nonlocal cancelled
+            if query == "fast":
+                return MOCK_GENERATION_RESPONSE
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+
+        with patch(
+            "app.core.gen_and_embed.run_generation_task", side_effect=maybe_hang
+        ):
+            items = gen_and_embed.iter_batch_generation(["fast", "slow", "slow"])
+            first = await anext(items)
+            await items.aclose()
+
+        assert first["index"] == 0
+        assert cancelled == 2
+
+
+class TestSemanticGeneration:
+    # The fake embeddings depend only on text length, so two queries of
+    # the same length count as paraphrases here
+
+    @pytest.mark.asyncio
+    async def test_similar_query_reuses_completion(
+        self, mock_httpx_echo, semantic_cache
+    ):
+        from app.core.gen_and_embed import run_semantic_generation_task
+
+        first, first_hit = await run_semantic_generation_task("how tall is it?")
+        second, second_hit = await run_semantic_generation_task("how big is it??")
+
+        assert (first_hit, second_hit) == (False, True)
+        assert second["choices"] == first["choices"]
+        generate_calls = [
+            call
+            for call in mock_httpx_echo.post.call_args_list
+            if "prompt" in call.kwargs["json"]
+        ]
+        assert len(generate_calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_different_query_misses(self, mock_httpx_echo, semantic_cache):
+        from app.core.gen_and_embed import run_semantic_generation_task
+
+        await run_semantic_generation_task("short")
+        result, hit = await run_semantic_generation_task("a much longer question")
+
+        assert not hit
+        assert result["choices"][0]["message"]["content"].endswith("longer question")
+
+    @pytest.mark.asyncio
+    async def test_embedding_failure_still_answers(self, semantic_cache):
+        from app.core import gen_and_embed
+        from tests.conftest import MOCK_GENERATION_RESPONSE
+
+        with (
+            patch.object(
+                gen_and_embed,
+                "run_embedding_task",
+                AsyncMock(side_effect=httpx.ConnectError("refused")),
+            ),
+            patch.object(
+                gen_and_embed,
+                "run_generation_task",
+                AsyncMock(return_value=MOCK_GENERATION_RESPONSE),
+            ),
+        ):
+            result, hit = await gen_and_embed.run_semantic_generation_task("hello")
+
+        assert result == MOCK_GENERATION_RESPONSE
+        assert not hit
+        assert semantic_cache.entries() == {}
+
+
+class TestStreamGenerationTask:
+    """
+    Streaming is tested against the real local stand-in
+    (benchmarks/upstream_stub.py) mounted in-process with ASGITransport,
+    so the NDJSON protocol on both sides is checked together.
+    """
+
+    @staticmethod
+    def _stub_client(chunk_delay_ms=0):
+        from benchmarks.upstream_stub import app as stub_app
+
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub_app),
+            base_url="http://stub",
+            params={"chunk_delay_ms": chunk_delay_ms},
+        )
+
+    async def _collect(self, client, query):
+        from app.core import gen_and_embed
+
+        with (
+            patch("app.core.upstream.get_client", return_value=client),
+            patch.object(
+                gen_and_embed,
+                "generation_pool",
+                BackendPool("generate", ["http://stub/post"]),
+            ),
+        ):
+            return [c async for c in gen_and_embed.stream_generation_task(query)]
+
+    @pytest.mark.asyncio
+    async def test_chunks_have_completion_chunk_shape(self):
+        async with self._stub_client() as client:
+            chunks = await self._collect(client, "hello streaming world")
+
+        for chunk in chunks:
+            assert chunk["object"] == "chat.completion.chunk"
+            assert chunk["model"] == "mock-gemma3:4b"
+            assert "delta" in chunk["choices"][0]
+        assert len({c["id"] for c in chunks}) == 1
+
+    @pytest.mark.asyncio
+    async def test_relays_one_delta_per_upstream_line(self):
+        async with self._stub_client() as client:
+            chunks = await self._collect(client, "hello streaming world")
+
+        contents = [c["choices"][0]["delta"].get("content") for c in chunks]
+        assert contents[2:5] == ["hello ", "streaming ", "world"]
+
+    @pytest.mark.asyncio
+    async def test_content_matches_non_streaming_response(self):
+        async with self._stub_client() as client:
+            chunks = await self._collect(client, "hello streaming world")
+
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert text == "Processed remotely: hello streaming world"
+
+    @pytest.mark.asyncio
+    async def test_first_chunk_has_role_and_last_has_stop(self):
+        async with self._stub_client() as client:
+            chunks = await self._collect(client, "hi")
+
+        assert chunks[0]["choices"][0]["delta"] == {"role": "assistant"}
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+    @pytest.mark.asyncio
+    async def test_non_streaming_upstream_yields_single_delta(self):
+        import json
+
+        def httpbin(request):
+            return httpx.Response(200, json={"json": json.loads(request.content)})
+
+        transport = httpx.MockTransport(httpbin)
+        async with httpx.AsyncClient(transport=transport) as client:
+            chunks = await self._collect(client, "plain echo")
+
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert text == "Processed remotely: plain echo"
+
+    @pytest.mark.asyncio
+    async def test_propagates_http_error(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(500))
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await self._collect(client, "boom")
+
+    @pytest.mark.asyncio
+    async def test_stream_outliving_its_deadline_is_cut_off(self):
+        import json
+
+        from app.core import deadline, gen_and_embed
+        from app.core.exceptions import GatewayTimeoutException
+
+        class SlowLines(httpx.AsyncByteStream):
+            # ASGITransport buffers whole bodies, so pace the lines here
+            async def __aiter__(self):
+                for i in range(50):
+                    await asyncio.sleep(0.02)
+                    yield json.dumps({"response": f"word{i} "}).encode() + b"\n"
+
+        def ndjson(request):
+            headers = {"content-type": "application/x-ndjson"}
+            return httpx.Response(200, headers=headers, stream=SlowLines())
+
+        chunks = []
+        transport = httpx.MockTransport(ndjson)
+        async with httpx.AsyncClient(transport=transport) as client:
+            with (
+                patch("app.core.upstream.get_client", return_value=client),
+                patch.object(
+                    gen_and_embed,
+                    "generation_pool",
+                    BackendPool("generate", ["http://stub/post"]),
+                ),
+            ):
+                stream = gen_and_embed.stream_generation_task("slow")
+                # As in the route: the first chunk is read inside the deadline
+                # scope and the rest after the handler has returned
+                with deadline.scope(0.15):
+                    chunks.append(await anext(stream))
+                with pytest.raises(GatewayTimeoutException) as exc_info:
+                    async for chunk in stream:
+                        chunks.append(chunk)
+
+        assert exc_info.value.error_code == "SYS_004"
+        assert 2 < len(chunks) < 50
+        assert chunks[-1]["choices"][0]["finish_reason"] is None
+
+    @pytest.mark.asyncio
+    async def test_stream_holds_a_limiter_slot_until_it_ends(self):
+        from app.core import concurrency, resilience
+
+        async with self._stub_client() as client:
+            chunks = await self._collect(client, "hello streaming world")
+        limiter = resilience.get_policy("mock-gemma3:4b").limiter
+
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+        assert limiter.samples == 1
+        assert limiter.in_flight == 0
+        assert concurrency.limiters["mock-gemma3:4b"] is limiter
+
+    @pytest.mark.asyncio
+    async def test_failed_stream_returns_its_slot_as_dropped(self):
+        from app.core import resilience
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(503))
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await self._collect(client, "boom")
+        limiter = resilience.get_policy("mock-gemma3:4b").limiter
+
+        assert limiter.dropped == 1
+        assert limiter.in_flight == 0
@@ -0,0 +1,178 @@
+"""
+tests/unit/core/test_jobs.py
+
+Unit tests for the job queue, worker pool and in-memory result store.
+
+Each test builds its own JobManager so the process-wide one (started by
+the app lifespan) is left alone; run_generation_task is patched where
+jobs.py uses it.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core import jobs
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import (
+    ResourceNotFoundException,
+    ServiceUnavailableException,
+    ValidationException,
+)
+from app.core.jobs import FAILED, SUCCEEDED, Job, JobManager, MemoryResultStore
+from tests.conftest import MOCK_GENERATION_RESPONSE
+
+
+@asynccontextmanager
+async def _manager(workers=1, max_queue=10):
+    manager = JobManager(MemoryResultStore(ttl_seconds=60), workers, max_queue)
+    try:
+        yield manager
+    finally:
+        await manager.stop()
+
+
+class TestMemoryResultStore:
+    @pytest.mark.asyncio
+    async def test_unfinished_jobs_do_not_expire(self):
+        store = MemoryResultStore(ttl_seconds=0)
+        job = Job("hello")
+        await store.put(job)
+
+        assert await store.get(job.id) is job
+        assert await store.purge_expired() == 0
+
+    @pytest.mark.asyncio
+    async def test_finished_jobs_expire_after_ttl(self):
+        store = MemoryResultStore(ttl_seconds=0)
+        job = Job("hello")
+        job.status = SUCCEEDED
+        await store.put(job)
+
+        assert await store.get(job.id) is None
+        assert len(store) == 0
+
+    @pytest.mark.asyncio
+    async def test_purge_removes_expired_jobs(self):
+        store = MemoryResultStore(ttl_seconds=0)
+        job = Job("hello")
+        job.status = FAILED
+        await store.put(job)
+
+        assert await store.purge_expired() == 1
+        assert len(store) == 0
+
+
+class TestLoadStore:
+    def test_memory(self):
+        assert isinstance(jobs.load_store("memory", 10), MemoryResultStore)
+
+    def test_dotted_path(self):
+        store = jobs.load_store("app.core.jobs:MemoryResultStore", 10)
+        assert isinstance(store, MemoryResultStore)
+        assert store.ttl_seconds == 10
+
+
+class TestJobManager:
+    @pytest.mark.asyncio
+    async def test_runs_job_and_stores_result(self):
+        async with _manager() as manager:
+            with patch(
+                "app.core.jobs.run_generation_task",
+                new_callable=AsyncMock,
+                return_value=MOCK_GENERATION_RESPONSE,
+            ) as mock_task:
+                job = await manager.submit("test query")
+                job = await manager.get(job.id, wait=1)
+
+            mock_task.assert_awaited_once_with("test query")
+            assert job.status == SUCCEEDED
+            assert job.result == {"response": "Processed remotely: test query"}
+            assert job.started_at is not None and job.finished_at is not None
+
+    @pytest.mark.asyncio
+    async def test_higher_priority_runs_first(self):
+        async with _manager() as manager:
+            order = []
+
+            async def record(query):
+                order.append(query)
+                return MOCK_GENERATION_RESPONSE
+
+            with patch("app.core.jobs.run_generation_task", side_effect=record):
+                # Queue everything before the single worker gets to run
+                submitted = [
+                    await manager.submit("low", priority=0),
+                    await manager.submit("high", priority=9),
+                    await manager.submit("mid", priority=5),
+                    await manager.submit("low-2", priority=0),
+                ]
+                for job in submitted:
+                    await manager.get(job.id, wait=1)
+
+            assert order == ["high", "mid", "low", "low-2"]
+
+    @pytest.mark.asyncio
+    async def test_app_exception_becomes_job_error(self):
+        async with _manager() as manager:
+            error = ValidationException(
+                message="Text is empty.", error_code=ErrorCode.VAL_INPUT_EMPTY
+            )
+            with patch("app.core.jobs.run_generation_task", side_effect=error):
+                job = await manager.submit("")
+                job = await manager.get(job.id, wait=1)
+
+            assert job.status == FAILED
+            assert job.error == {
+                "code": ErrorCode.VAL_INPUT_EMPTY,
+                "message": "Text is empty.",
+            }
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_is_not_leaked(self):
+        async with _manager() as manager:
+            with patch(
+                "app.core.jobs.run_generation_task", side_effect=RuntimeError("secret")
+            ):
+                job = await manager.submit("hello")
+                job = await manager.get(job.id, wait=1)
+
+            assert job.status == FAILED
+            assert job.error["code"] == ErrorCode.SYS_INTERNAL_ERROR
+            assert "secret" not in job.error["message"]
+
+    @pytest.mark.asyncio
+    async def test_wait_returns_unfinished_job_after_timeout(self):
+        async with _manager() as manager:
+            release = asyncio.Event()
+
+            async def slow(query):
+                await release.wait()
+                return MOCK_GENERATION_RESPONSE
+
+            with patch("app.core.jobs.run_generation_task", side_effect=slow):
+                job = await manager.submit("hello")
+                polled = await manager.get(job.id, wait=0.05)
+                assert not polled.finished
+                release.set()
+                assert (await manager.get(job.id, wait=1)).status == SUCCEEDED
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self):
+        async with _manager(workers=0, max_queue=1) as manager:
+            await manager.submit("first")
+
+            with pytest.raises(ServiceUnavailableException) as exc_info:
+                await manager.submit("second")
+
+        assert exc_info.value.error_code == ErrorCode.SYS_OVERLOADED
+
+    @pytest.mark.asyncio
+    async def test_unknown_job_raises_not_found(self):
+        async with _manager() as manager:
+            with pytest.raises(ResourceNotFoundException) as exc_info:
+                await manager.get("missing")
+
+            assert exc_info.value.error_code == ErrorCode.RES_JOB_NOT_FOUND
@@ -0,0 +1,122 @@
+"""
+tests/unit/core/test_metrics.py
+
+Unit tests for the Prometheus metrics primitives.
+
+Scrapers parse the exposition text literally, so the tests pin the exact
+lines: cumulative buckets, a trailing +Inf bucket, and escaped labels.
+"""
+
+import pytest
+
+from app.core import upstream
+from app.core.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestCounter:
+    def test_counts_per_label_set(self):
+        counter = Counter("requests_total", "Requests.", ("code",))
+        counter.inc(code="a")
+        counter.inc(2, code="a")
+        counter.inc(code="b")
+
+        assert counter.value(code="a") == 3
+        assert counter.value(code="b") == 1
+        assert counter.value(code="missing") == 0
+
+    def test_renders_help_type_and_samples(self):
+        counter = Counter("requests_total", "Requests.", ("code",))
+        counter.inc(code="a")
+
+        assert counter.render() == [
+            "# HELP requests_total Requests.",
+            "# TYPE requests_total counter",
+            'requests_total{code="a"} 1',
+        ]
+
+    def test_escapes_label_values(self):
+        counter = Counter("c", "C.", ("path",))
+        counter.inc(path='a"b\\c\n')
+
+        assert counter.render()[-1] == 'c{path="a\\"b\\\\c\\n"} 1'
+
+
+class TestGauge:
+    def test_set_inc_dec(self):
+        gauge = Gauge("in_flight", "In flight.")
+        gauge.set(5)
+        gauge.inc()
+        gauge.dec(3)
+        assert gauge.value() == 3
+
+    def test_callback_is_read_at_render_time(self):
+        state = {"depth": 1}
+        gauge = Gauge("depth", "Depth.", fn=lambda: state["depth"])
+        state["depth"] = 7
+
+        assert gauge.render()[-1] == "depth 7"
+
+    def test_labelled_callback(self):
+        gauge = Gauge("size", "Size.", ("name",), fn=lambda: {("docs",): 3})
+        assert gauge.render()[-1] == 'size{name="docs"} 3'
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative_with_inf(self):
+        histogram = Histogram("latency", "Latency.", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+
+        assert histogram.render()[2:] == [
+            'latency_bucket{le="0.1"} 1',
+            'latency_bucket{le="1"} 3',
+            'latency_bucket{le="+Inf"} 4',
+            "latency_sum 6.05",
+            "latency_count 4",
+        ]
+
+    def test_bound_is_inclusive(self):
+        histogram = Histogram("h", "H.", buckets=(1, 2))
+        histogram.observe(1)
+        assert histogram.counts() == [1, 0, 0]
+
+    def test_series_are_kept_per_label_set(self):
+        histogram = Histogram("h", "H.", ("route",), buckets=(1,))
+        histogram.observe(0.5, route="/a")
+        histogram.observe(3, route="/b")
+
+        assert histogram.count(route="/a") == 1
+        assert histogram.sum(route="/b") == 3
+        assert 'h_bucket{route="/b",le="+Inf"} 1' in histogram.render()
+
+
+class TestRegistry:
+    def test_rejects_duplicate_names(self):
+        registry = Registry()
+        registry.register(Counter("x", "X."))
+        with pytest.raises(ValueError):
+            registry.register(Gauge("x", "X."))
+
+    def test_render_ends_with_newline(self):
+        registry = Registry()
+        registry.register(Counter("x", "X."))
+        assert registry.render().endswith("\n")
+
+
+class TestUpstreamTiming:
+    def test_records_status_when_stopped(self):
+        before = upstream.UPSTREAM_LATENCY.count(model="m-test", status="200")
+        with upstream.timed("m-test") as timing:
+            timing.stop(200)
+        assert upstream.UPSTREAM_LATENCY.count(model="m-test", status="200") == (
+            before + 1
+        )
+
+    def test_records_error_when_call_raises(self):
+        before = upstream.UPSTREAM_LATENCY.count(model="m-test", status="error")
+        with pytest.raises(RuntimeError):
+            with upstream.timed("m-test"):
+                raise RuntimeError("connect failed")
+        assert upstream.UPSTREAM_LATENCY.count(model="m-test", status="error") == (
+            before + 1
+        )
@@ -0,0 +1,50 @@
+"""
+tests/unit/core/test_ndjson.py
+
+Unit tests for incremental NDJSON line splitting.
+
+Lines must come out the same however the body is chunked, and an
+over-long line must be skipped without being buffered.
+"""
+
+import pytest
+
+from app.core.ndjson import iter_lines
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def _collect(chunks, max_line_bytes=100):
+    return [line async for line in iter_lines(chunks, max_line_bytes)]
+
+
+class TestIterLines:
+    @pytest.mark.asyncio
+    async def test_splits_lines(self):
+        lines = await _collect(_chunks(b"a\nbb\nccc\n"))
+        assert lines == [b"a", b"bb", b"ccc"]
+
+    @pytest.mark.asyncio
+    async def test_lines_split_across_chunks(self):
+        lines = await _collect(_chunks(b"ab", b"c\nd", b"e", b"\n"))
+        assert lines == [b"abc", b"de"]
+
+    @pytest.mark.asyncio
+    async def test_last_line_without_newline(self):
+        lines = await _collect(_chunks(b"a\nlast"))
+        assert lines == [b"a", b"last"]
+
+    @pytest.mark.asyncio
+    async def test_too_long_line_becomes_none(self):
+        lines = await _collect(
+            _chunks(b"ok\n", b"x" * 8, b"x" * 8, b"\nafter\n"), max_line_bytes=10
+        )
+        assert lines == [b"ok", None, b"after"]
+
+    @pytest.mark.asyncio
+    async def test_too_long_last_line(self):
+        lines = await _collect(_chunks(b"ok\n", b"x" * 20), max_line_bytes=10)
+        assert lines == [b"ok", None]
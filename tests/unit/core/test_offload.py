@@ -0,0 +1,81 @@
+"""
+tests/unit/core/test_offload.py
+
+Unit tests for run_cpu().
+
+Offloading is a pure deployment knob: results must be identical whether
+the work runs inline, in a thread or in a process. What changes is only
+WHERE it runs, which these tests check via the executing thread.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.core import offload
+
+
+def current_thread_name(_=None):
+    return threading.current_thread().name
+
+
+@pytest.fixture
+def offload_mode(monkeypatch):
+    def configure(mode, min_rows=1):
+        offload.shutdown()
+        monkeypatch.setattr(offload.settings, "EMBED_OFFLOAD", mode)
+        monkeypatch.setattr(offload.settings, "EMBED_OFFLOAD_MIN_ROWS", min_rows)
+
+    yield configure
+    offload.shutdown()
+
+
+class TestRunCpu:
+    @pytest.mark.asyncio
+    async def test_none_runs_inline(self, offload_mode):
+        offload_mode("none")
+        name = await offload.run_cpu(current_thread_name, rows=1000)
+        assert name == threading.current_thread().name
+
+    @pytest.mark.asyncio
+    async def test_thread_runs_in_worker(self, offload_mode):
+        offload_mode("thread")
+        name = await offload.run_cpu(current_thread_name, rows=1000)
+        assert name.startswith("embed-offload")
+
+    @pytest.mark.asyncio
+    async def test_small_jobs_stay_inline(self, offload_mode):
+        offload_mode("thread", min_rows=64)
+        name = await offload.run_cpu(current_thread_name, rows=8)
+        assert name == threading.current_thread().name
+
+    @pytest.mark.asyncio
+    async def test_process_pool_gives_same_result(self, offload_mode):
+        from app.core.gen_and_embed import build_embeddings
+
+        texts = ["a", "bb", "ccc"]
+        offload_mode("process")
+        remote = await offload.run_cpu(build_embeddings, texts, rows=3)
+        assert (remote == build_embeddings(texts)).all()
+
+
+class TestBuildEmbeddingsRng:
+    def test_does_not_touch_global_rng(self):
+        from app.core.gen_and_embed import build_embeddings
+
+        np.random.seed(123)
+        expected = np.random.rand()
+        np.random.seed(123)
+        build_embeddings(["hello", "world!"])
+        assert np.random.rand() == expected
+
+    def test_same_result_from_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from app.core.gen_and_embed import build_embeddings
+
+        texts = [str(i) * (i % 17 + 1) for i in range(200)]
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(build_embeddings, [texts] * 8))
+        assert all((r == results[0]).all() for r in results)
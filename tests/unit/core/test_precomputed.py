@@ -0,0 +1,112 @@
+"""
+tests/unit/core/test_precomputed.py
+
+Unit tests for the offline build (app.precompute) and the memory-mapped
+store it produces.
+
+The build goes through run_batch_embedding_task, so the shared upstream
+client is mocked with mock_httpx_echo like any other embedding test.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.core import precomputed
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ResourceNotFoundException
+from app.core.gen_and_embed import build_embeddings
+from app.core.precomputed import PrecomputedEmbeddings
+from app.precompute import build
+
+CORPUS = [
+    {"id": "b", "text": "second document"},
+    {"id": "a", "text": "first"},
+    {"id": 42, "text": "numeric id"},
+    {"id": "ünïcode", "text": "non-ascii id"},
+]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in CORPUS) + "\n\n")
+    return str(path)
+
+
+@pytest.fixture
+def store_path(tmp_path, corpus, mock_httpx_echo):
+    out = tmp_path / "store"
+    asyncio.run(build(corpus, str(out), batch_size=3, concurrency=2))
+    return str(out)
+
+
+class TestBuild:
+    def test_writes_meta_and_vectors(self, store_path):
+        store = PrecomputedEmbeddings(store_path)
+
+        assert store.meta["count"] == 4
+        assert len(store) == 4
+        assert store.vectors.shape == (4, 512)
+        assert store.vectors.dtype == np.float32
+
+    def test_vectors_match_embedding_path(self, store_path):
+        store = PrecomputedEmbeddings(store_path)
+        expected = build_embeddings([record["text"] for record in CORPUS])
+
+        for record, row in zip(CORPUS, expected):
+            assert (store.get(str(record["id"])) == row).all()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_ids_are_rejected(self, tmp_path, mock_httpx_echo):
+        path = tmp_path / "dupes.jsonl"
+        path.write_text('{"id": "x", "text": "a"}\n{"id": "x", "text": "b"}\n')
+
+        with pytest.raises(ValueError, match="duplicate"):
+            await build(str(path), str(tmp_path / "out"), 8, 1)
+
+    @pytest.mark.asyncio
+    async def test_invalid_text_fails_the_build(self, tmp_path, mock_httpx_echo):
+        path = tmp_path / "empty.jsonl"
+        path.write_text('{"id": "x", "text": "   "}\n')
+
+        with pytest.raises(ValueError, match="line 1"):
+            await build(str(path), str(tmp_path / "out"), 8, 1)
+        assert not (tmp_path / "out" / "meta.json").exists()
+
+
+class TestPrecomputedEmbeddings:
+    def test_vectors_are_views_of_the_mapping(self, store_path):
+        store = PrecomputedEmbeddings(store_path)
+        vector = store.get("a")
+
+        assert isinstance(store.vectors, np.memmap)
+        assert np.shares_memory(vector, store.vectors)
+        assert not vector.flags.writeable
+
+    def test_unknown_ids_miss(self, store_path):
+        store = PrecomputedEmbeddings(store_path)
+
+        assert store.get("missing") is None
+        # Longer than any stored id; must not match a truncated prefix
+        assert store.get("ünïcode-and-more") is None
+        assert store.get("") is None
+
+
+class TestLookup:
+    def test_items_in_request_order(self, store_path, monkeypatch):
+        monkeypatch.setattr(precomputed, "store", PrecomputedEmbeddings(store_path))
+
+        data = precomputed.lookup(["42", "nope", "b"])
+
+        assert [item["id"] for item in data] == ["42", "nope", "b"]
+        assert data[0]["embedding"].shape == (512,)
+        assert data[1]["error"]["code"] == ErrorCode.RES_EMBEDDING_NOT_FOUND
+
+    def test_no_store_raises_not_found(self, monkeypatch):
+        monkeypatch.setattr(precomputed, "store", None)
+
+        with pytest.raises(ResourceNotFoundException):
+            precomputed.lookup(["a"])
@@ -0,0 +1,90 @@
+"""
+tests/unit/core/test_quantization.py
+
+Unit tests for Matryoshka truncation and int8 / binary quantization.
+"""
+
+import base64
+
+import numpy as np
+import pytest
+
+from app.core.exceptions import ValidationException
+from app.core.quantization import dequantize, pack_bits, quantize_int8, truncate
+
+
+@pytest.fixture
+def matrix():
+    rows = np.random.default_rng(0).standard_normal((4, 512)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class TestTruncate:
+    def test_keeps_prefix_at_unit_length(self, matrix):
+        short = truncate(matrix, 64)
+        assert short.shape == (4, 64)
+        np.testing.assert_allclose(np.linalg.norm(short, axis=1), 1, rtol=1e-5)
+        # Same direction as the prefix it came from
+        cosine = (short * matrix[:, :64]).sum(axis=1) / np.linalg.norm(
+            matrix[:, :64], axis=1
+        )
+        np.testing.assert_allclose(cosine, 1, rtol=1e-5)
+
+    def test_zero_rows_stay_zero(self):
+        assert (truncate(np.zeros((1, 8)), 4) == 0).all()
+
+    def test_rejects_more_dimensions_than_vector(self, matrix):
+        with pytest.raises(ValidationException):
+            truncate(matrix, 513)
+
+
+class TestInt8:
+    def test_round_trips_within_half_a_step(self, matrix):
+        codes, scales = quantize_int8(matrix)
+        assert codes.dtype == np.int8 and scales.shape == (4,)
+        restored = codes.astype(np.float32) * scales[:, np.newaxis]
+        assert (np.abs(restored - matrix) <= scales[:, np.newaxis] / 2 + 1e-7).all()
+
+    def test_largest_component_uses_full_range(self, matrix):
+        codes, _ = quantize_int8(matrix)
+        assert (np.abs(codes).max(axis=1) == 127).all()
+
+    def test_zero_vector_has_zero_scale(self):
+        codes, scales = quantize_int8(np.zeros((1, 8)))
+        assert (codes == 0).all() and scales[0] == 0
+
+
+class TestBinary:
+    def test_packs_sign_bits_most_significant_first(self):
+        packed = pack_bits(np.array([[1, -1, -1, -1, -1, -1, -1, 1, 0.5]]))
+        assert packed.tolist() == [[0b10000001, 0b10000000]]
+
+    def test_dequantized_cosine_follows_hamming_distance(self, matrix):
+        a, b = [
+            dequantize("binary", row.tolist(), None, 512)
+            for row in pack_bits(matrix)[:2]
+        ]
+        hamming = int((np.sign(matrix[0]) != np.sign(matrix[1])).sum())
+        assert float(a @ b) == pytest.approx(1 - 2 * hamming / 512, abs=1e-5)
+
+
+class TestDequantize:
+    def test_int8_from_base64(self, matrix):
+        codes, scales = quantize_int8(matrix[:1])
+        data = base64.b64encode(codes[0].tobytes()).decode()
+        vector = dequantize("int8", data, float(scales[0]), 512)
+        np.testing.assert_allclose(vector, matrix[0], atol=float(scales[0]))
+
+    @pytest.mark.parametrize(
+        "dtype, data, scale",
+        [
+            ("int8", [1, 2, 3], 0.1),
+            ("int8", [0] * 512, None),
+            ("int8", [200] * 512, 0.1),
+            ("binary", [0] * 63, None),
+            ("binary", [-1] * 64, None),
+        ],
+    )
+    def test_rejects_malformed_vectors(self, dtype, data, scale):
+        with pytest.raises(ValueError):
+            dequantize(dtype, data, scale, 512)
@@ -0,0 +1,250 @@
+"""
+tests/unit/core/test_resilience.py
+
+Unit tests for the upstream call policy.
+
+Attempts are plain coroutines returning real httpx.Response objects, so
+raise_for_status() and the status-based retry rules behave exactly as
+they do against a live upstream.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.concurrency import AdaptiveLimiter
+from app.core.error_codes import ErrorCode
+from app.core.exceptions import ServiceUnavailableException
+from app.core.resilience import CircuitBreaker, RetryBudget, UpstreamPolicy
+
+REQUEST = httpx.Request("POST", "http://upstream/post")
+
+
+def _response(status: int = 200) -> httpx.Response:
+    return httpx.Response(status, json={"ok": status}, request=REQUEST)
+
+
+class Script:
+    """An attempt factory that plays back results (responses or errors)."""
+
+    def __init__(self, *results, delays=None):
+        self.results = list(results)
+        self.delays = list(delays or [0] * len(results))
+        self.calls = 0
+
+    async def __call__(self):
+        index = self.calls
+        self.calls += 1
+        if self.delays[index]:
+            await asyncio.sleep(self.delays[index])
+        result = self.results[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+def _policy(**kwargs) -> UpstreamPolicy:
+    defaults = dict(backoff_ms=1, hedge_percentile=0, breaker_failures=0)
+    return UpstreamPolicy("test-model", **{**defaults, **kwargs})
+
+
+class TestRetries:
+    @pytest.mark.asyncio
+    async def test_retries_retryable_status_then_succeeds(self):
+        attempt = Script(_response(503), _response(200))
+        response = await _policy().call(attempt)
+
+        assert response.status_code == 200
+        assert attempt.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_retry_500(self):
+        attempt = Script(_response(500), _response(200))
+        with pytest.raises(httpx.HTTPStatusError):
+            await _policy().call(attempt)
+        assert attempt.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        attempt = Script(*[httpx.ReadTimeout("slow")] * 3)
+        with pytest.raises(httpx.ReadTimeout):
+            await _policy(max_attempts=3).call(attempt)
+        assert attempt.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_non_idempotent_only_retries_unsent_requests(self):
+        sent = Script(httpx.ReadTimeout("slow"), _response())
+        with pytest.raises(httpx.ReadTimeout):
+            await _policy().call(sent, idempotent=False)
+
+        unsent = Script(httpx.ConnectError("refused"), _response())
+        response = await _policy().call(unsent, idempotent=False)
+        assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_retry_budget_caps_retries(self):
+        policy = _policy()
+        policy.budget = RetryBudget(ratio=0.0, initial=1)
+        attempt = Script(_response(503), _response(503), _response(200))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await policy.call(attempt)
+        assert attempt.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_skips_retry_that_cannot_start_before_deadline(self):
+        from app.core import deadline
+
+        policy = _policy(backoff_ms=1000, backoff_max_ms=1000)
+        policy.backoff = lambda retry: 0.5
+        attempt = Script(_response(503), _response(200))
+
+        with deadline.scope(0.1), pytest.raises(httpx.HTTPStatusError):
+            await policy.call(attempt)
+        assert attempt.calls == 1
+
+    def test_backoff_is_bounded(self):
+        policy = _policy(backoff_ms=100, backoff_max_ms=300)
+        for retry in range(1, 10):
+            assert 0 <= policy.backoff(retry) <= 0.3
+
+
+class TestRetryBudget:
+    def test_earns_ratio_per_call(self):
+        budget = RetryBudget(ratio=0.5, initial=0)
+        budget.deposit()
+        assert not budget.withdraw()
+        budget.deposit()
+        assert budget.withdraw()
+
+
+class TestCircuitBreaker:
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        policy = _policy(max_attempts=1, breaker_failures=2)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await policy.call(Script(_response(500)))
+
+        attempt = Script(_response())
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await policy.call(attempt)
+
+        assert exc_info.value.error_code == ErrorCode.SYS_UPSTREAM_UNAVAILABLE
+        assert exc_info.value.retry_after >= 1
+        assert attempt.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_count(self):
+        policy = _policy(max_attempts=1, breaker_failures=1)
+        with pytest.raises(httpx.HTTPStatusError):
+            await policy.call(Script(_response(400)))
+        assert policy.breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes_on_success(self):
+        policy = _policy(max_attempts=1, breaker_failures=1, breaker_open_seconds=0)
+        with pytest.raises(httpx.HTTPStatusError):
+            await policy.call(Script(_response(500)))
+        assert policy.breaker.state == CircuitBreaker.OPEN
+
+        await policy.call(Script(_response()))
+        assert policy.breaker.state == CircuitBreaker.CLOSED
+
+    def test_only_one_probe_when_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=0)
+        breaker.record_failure()
+
+        assert breaker.allow()
+        assert not breaker.allow()
+
+
+class TestHedging:
+    @staticmethod
+    def _warmed_policy() -> UpstreamPolicy:
+        policy = _policy(hedge_percentile=95, hedge_min_delay_ms=1)
+        for _ in range(policy.hedge_min_samples):
+            policy.latency.observe(0.005)
+        return policy
+
+    def test_no_hedging_until_enough_samples(self):
+        policy = _policy(hedge_percentile=95)
+        policy.latency.observe(0.005)
+        assert policy.hedge_delay() is None
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self):
+        policy = self._warmed_policy()
+        attempt = Script(_response(200), _response(201), delays=[1.0, 0])
+
+        response = await policy.call(attempt)
+
+        assert response.status_code == 201
+        assert attempt.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self):
+        policy = self._warmed_policy()
+        attempt = Script(_response(200))
+
+        await policy.call(attempt)
+        assert attempt.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_non_idempotent_calls_are_not_hedged(self):
+        policy = self._warmed_policy()
+        attempt = Script(_response(200), delays=[0.05])
+
+        await policy.call(attempt, idempotent=False)
+        assert attempt.calls == 1
+
+
+class TestConcurrencyLimit:
+    @staticmethod
+    def _limited(**kwargs) -> UpstreamPolicy:
+        limiter = AdaptiveLimiter("test-model", initial_limit=20, **kwargs)
+        return _policy(limiter=limiter)
+
+    @pytest.mark.asyncio
+    async def test_attempt_holds_a_slot(self):
+        policy = self._limited()
+        seen = []
+
+        async def attempt():
+            seen.append(policy.limiter.in_flight)
+            return _response()
+
+        await policy.call(attempt)
+        assert seen == [1]
+        assert policy.limiter.in_flight == 0
+        assert policy.limiter.samples == 1
+
+    @pytest.mark.asyncio
+    async def test_overload_responses_cut_the_limit(self):
+        policy = self._limited()
+        with pytest.raises(httpx.HTTPStatusError):
+            await policy.call(Script(_response(429)))
+        assert policy.limiter.limit < 20
+        assert policy.limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_cut_the_limit(self):
+        policy = self._limited()
+        with pytest.raises(httpx.HTTPStatusError):
+            await policy.call(Script(_response(404)))
+        assert policy.limiter.limit == 20
+
+    @pytest.mark.asyncio
+    async def test_shed_call_is_not_retried(self):
+        policy = self._limited(queue_timeout_ms=10)
+        policy.limiter.limit = 1
+        slot = await policy.limiter.acquire()
+        attempt = Script(_response())
+
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await policy.call(attempt)
+
+        assert exc_info.value.error_code == ErrorCode.SYS_OVERLOADED
+        assert attempt.calls == 0
+        policy.limiter.release(slot)
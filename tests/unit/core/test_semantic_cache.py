@@ -0,0 +1,80 @@
+"""
+tests/unit/core/test_semantic_cache.py
+
+Unit tests for SemanticCache: threshold matching, per-model partitions and
+LRU eviction.
+"""
+
+import numpy as np
+import pytest
+
+from app.core.semantic_cache import SemanticCache
+
+
+def _unit(*values):
+    vector = np.zeros(4, dtype=np.float32)
+    vector[: len(values)] = values
+    return vector
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(capacity=2, threshold=0.9, dim=4)
+
+
+class TestSemanticCache:
+    def test_similar_vector_hits(self, cache):
+        cache.put("m", _unit(1, 0), "answer")
+
+        value, similarity = cache.get("m", _unit(1, 0.1))
+
+        assert value == "answer"
+        assert similarity > 0.9
+        assert cache.hits == 1
+
+    def test_dissimilar_vector_misses(self, cache):
+        cache.put("m", _unit(1, 0), "answer")
+
+        value, similarity = cache.get("m", _unit(0, 1))
+
+        assert value is None
+        assert similarity == pytest.approx(0.0)
+        assert cache.misses == 1
+
+    def test_scale_does_not_matter(self, cache):
+        cache.put("m", _unit(3, 4), "answer")
+        assert cache.get("m", _unit(0.3, 0.4))[0] == "answer"
+
+    def test_models_are_isolated(self, cache):
+        cache.put("model-a", _unit(1, 0), "from a")
+        assert cache.get("model-b", _unit(1, 0))[0] is None
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put("m", _unit(1, 0), "first")
+        cache.put("m", _unit(0, 1), "second")
+        # Touch "first" so "second" is now the least recently used
+        cache.get("m", _unit(1, 0))
+
+        cache.put("m", _unit(0, 0, 1), "third")
+
+        assert cache.get("m", _unit(1, 0))[0] == "first"
+        assert cache.get("m", _unit(0, 1))[0] is None
+        assert cache.get("m", _unit(0, 0, 1))[0] == "third"
+        assert cache.evictions == 1
+
+    def test_zero_vector_is_ignored(self, cache):
+        cache.put("m", _unit(), "answer")
+        assert cache.entries() == {}
+        assert cache.get("m", _unit())[0] is None
+
+    def test_stats_hit_rate(self, cache):
+        cache.put("m", _unit(1, 0), "answer")
+        cache.get("m", _unit(1, 0))
+        cache.get("m", _unit(0, 1))
+
+        stats = cache.stats()
+        assert stats["hit_rate"] == 0.5
+        assert stats["entries"] == {"m": 1}
+
+    def test_zero_capacity_is_disabled(self):
+        assert not SemanticCache(capacity=0, threshold=0.9, dim=4).enabled
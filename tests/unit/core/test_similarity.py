@@ -0,0 +1,100 @@
+"""
+tests/unit/core/test_similarity.py
+
+Unit tests for the cosine matrix and near-duplicate clustering.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from app.core.exceptions import ValidationException
+from app.core.similarity import cluster, cosine_matrix, load_pair
+
+
+def near_duplicates(groups: int, copies: int, seed: int = 0) -> np.ndarray:
+    """groups x copies rows; copies of one group are within ~0.99 cosine."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((groups, 512)).astype(np.float32)
+    noise = rng.standard_normal((groups, copies, 512)).astype(np.float32) * 0.05
+    return (centers[:, np.newaxis] + noise).reshape(groups * copies, 512)
+
+
+class TestCosineMatrix:
+    def test_matches_naive_computation_across_chunks(self):
+        rng = np.random.default_rng(1)
+        queries, corpus = rng.standard_normal((7, 16)), rng.standard_normal((5, 16))
+
+        scores = cosine_matrix(queries, corpus, chunk_rows=3)
+
+        expected = (queries @ corpus.T) / np.outer(
+            np.linalg.norm(queries, axis=1), np.linalg.norm(corpus, axis=1)
+        )
+        np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
+
+    def test_self_similarity_is_symmetric_with_unit_diagonal(self):
+        matrix = np.random.default_rng(2).standard_normal((6, 8))
+        scores = cosine_matrix(matrix, None, chunk_rows=4)
+        np.testing.assert_allclose(scores, scores.T, atol=1e-6)
+        np.testing.assert_allclose(np.diag(scores), 1, rtol=1e-6)
+
+
+class TestCluster:
+    def test_exact_groups_duplicates(self):
+        matrix = near_duplicates(groups=5, copies=3)
+        result = cluster(matrix, 0.95, 1000, bits=12, tables=16, chunk_rows=4)
+        assert result["method"] == "exact"
+        assert result["clusters"] == [[g * 3, g * 3 + 1, g * 3 + 2] for g in range(5)]
+
+    def test_links_transitively(self):
+        # a, b and c 25 degrees apart in turn: a-b and b-c pass, a-c does not
+        a, b, c = (
+            np.array([np.cos(angle), np.sin(angle), 0], dtype=np.float32)
+            for angle in np.radians([0, 25, 50])
+        )
+        far = np.array([0, 0, 1], dtype=np.float32)
+        result = cluster(np.stack([a, far, c, b]), 0.85, 10, 4, 1, chunk_rows=2)
+        assert result["clusters"] == [[0, 2, 3]]
+
+    def test_lsh_finds_duplicates_with_far_fewer_comparisons(self):
+        matrix = near_duplicates(groups=500, copies=2)
+        result = cluster(matrix, 0.95, 100, bits=12, tables=16, chunk_rows=256)
+        assert result["method"] == "lsh"
+        assert len(result["clusters"]) >= 495
+        assert all(group[1] == group[0] + 1 for group in result["clusters"])
+        assert result["comparisons"] < len(matrix) ** 2 / 10
+
+    def test_linking_many_duplicates_scales_linearly(self):
+        # Half the rows are duplicates, and 24-bit keys keep the candidate
+        # pairs near-linear, so what is left is the linking itself. 8x the
+        # rows should cost about 8x; a merge that relabels every row costs
+        # O(n) per pair and came out near 18x
+        def best_time(groups):
+            matrix = near_duplicates(groups=groups, copies=2)
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                result = cluster(matrix, 0.95, 0, bits=24, tables=4, chunk_rows=1024)
+                times.append(time.perf_counter() - start)
+            assert len(result["clusters"]) > groups * 0.9
+            return min(times)
+
+        assert best_time(20_000) / best_time(2_500) < 12
+
+    def test_no_duplicates_gives_no_clusters(self):
+        matrix = np.eye(6, 16)
+        assert cluster(matrix, 0.5, 10, 4, 1, chunk_rows=2)["clusters"] == []
+
+
+class TestLimits:
+    def test_rejects_too_many_cells_before_embedding(self, monkeypatch):
+        import asyncio
+
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "SIMILARITY_MAX_CELLS", 10)
+        # Texts would have to be embedded; the size check comes first
+        with pytest.raises(ValidationException) as exc:
+            asyncio.run(load_pair({"texts": ["x"] * 4}, None))
+        assert exc.value.error_code == "VAL_BATCH_001"
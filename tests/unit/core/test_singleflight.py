@@ -0,0 +1,109 @@
+"""
+tests/unit/core/test_singleflight.py
+
+Unit tests for SingleFlight.
+
+The important behaviours are about cancellation, not the happy path:
+one caller leaving must never cancel the shared call for the others,
+but once EVERY caller has left the shared call should be cancelled.
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+class SlowCall:
+    """Counts invocations and blocks until released."""
+
+    def __init__(self, result="done"):
+        self.result = result
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight, fn = SingleFlight(), SlowCall()
+
+        tasks = [asyncio.create_task(flight.do("k", fn)) for _ in range(5)]
+        await asyncio.sleep(0)
+        fn.release.set()
+
+        assert await asyncio.gather(*tasks) == ["done"] * 5
+        assert fn.calls == 1
+        assert flight.stats()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_different_keys_do_not_coalesce(self):
+        flight, fn = SingleFlight(), SlowCall()
+        fn.release.set()
+
+        await asyncio.gather(flight.do("a", fn), flight.do("b", fn))
+        assert fn.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_coalesced(self):
+        flight, fn = SingleFlight(), SlowCall()
+        fn.release.set()
+
+        await flight.do("k", fn)
+        await flight.do("k", fn)
+        assert fn.calls == 2
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_one_caller_timing_out_does_not_cancel_others(self):
+        flight, fn = SingleFlight(), SlowCall()
+
+        impatient = asyncio.create_task(
+            asyncio.wait_for(flight.do("k", fn), timeout=0.01)
+        )
+        patient = asyncio.create_task(flight.do("k", fn))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        fn.release.set()
+
+        assert await patient == "done"
+        assert not fn.cancelled
+
+    @pytest.mark.asyncio
+    async def test_last_caller_leaving_cancels_shared_call(self):
+        flight, fn = SingleFlight(), SlowCall()
+
+        task = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+        assert fn.cancelled
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_error_reaches_every_caller(self):
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flight.do("k", failing), flight.do("k", failing), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,162 @@
+"""
+tests/unit/core/test_spool.py
+
+Unit tests for decouple(): the producer must run ahead of a reader that is
+not reading, but no further than the spool's cap, and the reader must get
+every byte in order.
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.spool import decouple
+
+
+class TestDecouple:
+    @pytest.mark.asyncio
+    async def test_yields_everything_in_order(self):
+        async def producer():
+            for i in range(100):
+                yield f"{i},".encode()
+
+        output = b"".join([chunk async for chunk in decouple(producer(), 16, 1 << 20)])
+        assert output == b"".join(f"{i},".encode() for i in range(100))
+
+    @pytest.mark.asyncio
+    async def test_producer_does_not_wait_for_reader(self):
+        finished = asyncio.Event()
+
+        async def producer():
+            for _ in range(50):
+                yield b"x" * 1000
+            finished.set()
+
+        reader = decouple(producer(), max_memory_bytes=1000, max_bytes=1 << 20)
+        first = await anext(reader)
+        # Nothing more is read, yet the producer gets to the end
+        await asyncio.wait_for(finished.wait(), 1)
+        rest = b"".join([chunk async for chunk in reader])
+
+        assert len(first) + len(rest) == 50_000
+
+    @pytest.mark.asyncio
+    async def test_producer_error_reaches_reader(self):
+        async def producer():
+            yield b"partial"
+            raise RuntimeError("boom")
+
+        reader = decouple(producer(), 16, 1 << 20)
+        with pytest.raises(RuntimeError):
+            async for _ in reader:
+                pass
+
+    @pytest.mark.asyncio
+    async def test_closing_reader_cancels_producer(self):
+        cancelled = asyncio.Event()
+
+        async def producer():
+            yield b"first"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            yield b"never"
+
+        reader = decouple(producer(), 16, 1 << 20)
+        await anext(reader)
+        await reader.aclose()
+
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_slow_reader_keeps_spool_under_its_cap(self):
+        chunk, cap = 1000, 8000
+        state = {"produced": 0, "consumed": 0, "ahead": 0}
+
+        async def producer():
+            for _ in range(100):
+                state["ahead"] = max(
+                    state["ahead"], state["produced"] - state["consumed"]
+                )
+                yield b"x" * chunk
+                state["produced"] += chunk
+
+        reader = decouple(producer(), max_memory_bytes=2000, max_bytes=cap)
+        async for data in reader:
+            state["consumed"] += len(data)
+            await asyncio.sleep(0.01)
+
+        assert state["consumed"] == 100 * chunk
+        # One chunk may land past the cap before the producer stops
+        assert state["ahead"] <= cap + chunk
+
+    @pytest.mark.asyncio
+    async def test_full_spool_stops_pulling_until_drained(self):
+        pulled = 0
+
+        async def producer():
+            nonlocal pulled
+            for _ in range(100):
+                pulled += 1
+                yield b"x" * 1000
+
+        reader = decouple(producer(), max_memory_bytes=2000, max_bytes=8000)
+        await anext(reader)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        stalled_at = pulled
+        rest = b"".join([chunk async for chunk in reader])
+
+        assert stalled_at < 20
+        assert pulled == 100
+        assert len(rest) > 0
+
+    @pytest.mark.asyncio
+    async def test_stalled_spool_cuts_a_consumer_blocked_on_send(self):
+        from app.core.exceptions import GatewayTimeoutException
+
+        async def producer():
+            while True:
+                yield b"x" * 1000
+
+        client_reading = asyncio.Event()
+        reader = decouple(
+            producer(), max_memory_bytes=2000, max_bytes=4000, stall_seconds=0.05
+        )
+
+        async def respond():
+            # As _DuplexStreamingResponse does, sending to a client that
+            # never reads
+            try:
+                async for _ in reader:
+                    await client_reading.wait()
+            finally:
+                await reader.aclose()
+
+        task = asyncio.create_task(respond())
+        with pytest.raises(GatewayTimeoutException) as exc_info:
+            await asyncio.wait_for(task, 2)
+
+        assert exc_info.value.details["reason"] == "stalled"
+        # The cancellation used to get out of the send was taken back
+        assert task.cancelling() == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_ends_the_stream(self):
+        import time
+
+        from app.core.exceptions import GatewayTimeoutException
+
+        async def producer():
+            yield b"first"
+            await asyncio.sleep(10)
+            yield b"never"
+
+        reader = decouple(producer(), 16, 1 << 20, expires=time.monotonic() + 0.05)
+        assert await anext(reader) == b"first"
+        with pytest.raises(GatewayTimeoutException) as exc_info:
+            await asyncio.wait_for(anext(reader), 2)
+
+        assert exc_info.value.error_code == "SYS_004"
@@ -0,0 +1,44 @@
+"""
+tests/unit/core/test_timing.py
+
+Unit tests for per-request stage timings (the Server-Timing header).
+"""
+
+import asyncio
+
+import pytest
+
+from app.core import timing
+
+
+class TestRequestTiming:
+    def test_record_outside_a_request_is_a_noop(self):
+        assert timing.current() is None
+        timing.record("upstream", 1.0)
+
+    def test_stages_sum_repeated_records(self):
+        with timing.tracking() as request_timing:
+            timing.record("upstream", 0.010)
+            timing.record("upstream", 0.005)
+        assert request_timing.stages["upstream"] == pytest.approx(0.015)
+
+    def test_tracking_restores_previous_context(self):
+        with timing.tracking():
+            pass
+        assert timing.current() is None
+
+    def test_header_value_is_milliseconds(self):
+        request_timing = timing.RequestTiming()
+        request_timing.record("parse", 0.0004)
+        request_timing.record("upstream", 0.0123)
+        assert request_timing.header_value() == "parse;dur=0.40, upstream;dur=12.30"
+
+    @pytest.mark.asyncio
+    async def test_child_tasks_record_into_the_same_request(self):
+        async def child():
+            await asyncio.sleep(0)
+            timing.record("upstream", 0.001)
+
+        with timing.tracking() as request_timing:
+            await asyncio.create_task(child())
+        assert "upstream" in request_timing.stages
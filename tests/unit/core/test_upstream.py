@@ -0,0 +1,74 @@
+"""
+tests/unit/core/test_upstream.py
+
+Unit tests for the shared upstream client.
+
+The point of app.core.upstream is that every call reuses ONE pooled
+httpx.AsyncClient. These tests pin that contract down: the client is
+reused, it picks up limits/timeouts from settings, and pool_stats()
+always returns the same keys whether or not a client exists.
+"""
+
+import httpx
+import pytest
+
+from app.core import upstream
+
+
+@pytest.fixture
+def fresh_upstream():
+    """Start every test without a shared client and clean up afterwards."""
+    previous = upstream._client
+    upstream._client = None
+    yield upstream
+    upstream._client = previous
+
+
+class TestBuildClient:
+    def test_returns_async_client(self):
+        client = upstream.build_client()
+        assert isinstance(client, httpx.AsyncClient)
+
+    def test_applies_timeouts_from_settings(self, monkeypatch):
+        monkeypatch.setattr(upstream.settings, "UPSTREAM_CONNECT_TIMEOUT", 1.5)
+        monkeypatch.setattr(upstream.settings, "UPSTREAM_READ_TIMEOUT", 7.0)
+        monkeypatch.setattr(upstream.settings, "UPSTREAM_POOL_TIMEOUT", 0.5)
+
+        client = upstream.build_client()
+        assert client.timeout.connect == 1.5
+        assert client.timeout.read == 7.0
+        assert client.timeout.pool == 0.5
+
+
+class TestGetClient:
+    def test_reuses_the_same_client(self, fresh_upstream):
+        assert upstream.get_client() is upstream.get_client()
+
+    @pytest.mark.asyncio
+    async def test_start_then_get_returns_lifespan_client(self, fresh_upstream):
+        started = await upstream.start_client()
+        assert upstream.get_client() is started
+        await upstream.close_client()
+
+    @pytest.mark.asyncio
+    async def test_close_resets_client(self, fresh_upstream):
+        first = await upstream.start_client()
+        await upstream.close_client()
+        assert upstream._client is None
+        assert first.is_closed
+        assert upstream.get_client() is not first
+
+
+class TestPoolStats:
+    EXPECTED_KEYS = {"connections", "in_use", "idle", "waiting"}
+
+    def test_has_expected_keys_without_client(self, fresh_upstream):
+        stats = upstream.pool_stats()
+        assert self.EXPECTED_KEYS <= stats.keys()
+        assert stats["connections"] == 0
+
+    def test_has_expected_keys_with_client(self, fresh_upstream):
+        upstream.get_client()
+        stats = upstream.pool_stats()
+        assert self.EXPECTED_KEYS <= stats.keys()
+        assert stats["in_use"] == 0
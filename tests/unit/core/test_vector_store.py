@@ -0,0 +1,119 @@
+"""
+tests/unit/core/test_vector_store.py
+
+Unit tests for VectorStore and its helpers.
+
+Exact search is checked against a brute-force reference; the IVF index is
+approximate, so it is checked for high recall on clustered data rather
+than for identical results.
+"""
+
+import numpy as np
+import pytest
+
+from app.core.vector_store import VectorStore, normalize, spherical_kmeans, top_k
+
+DIM = 16
+
+
+def clustered(n, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    labels = rng.integers(clusters, size=n)
+    return (centers[labels] + 0.1 * rng.normal(size=(n, DIM))).astype(np.float32)
+
+
+class TestHelpers:
+    def test_normalize_gives_unit_rows(self):
+        rows = normalize(np.array([[3.0, 4.0], [0.0, 2.0]]))
+        np.testing.assert_allclose(np.linalg.norm(rows, axis=1), 1.0, rtol=1e-6)
+
+    def test_normalize_leaves_zero_vector_finite(self):
+        assert np.isfinite(normalize(np.zeros((1, 4)))).all()
+
+    def test_top_k_is_sorted_best_first(self):
+        scores = np.array([[0.1, 0.9, 0.5, 0.7]])
+        rows, values = top_k(scores, 3)
+        assert rows.tolist() == [[1, 3, 2]]
+        np.testing.assert_allclose(values, [[0.9, 0.7, 0.5]])
+
+    def test_top_k_caps_k_at_row_length(self):
+        rows, _ = top_k(np.array([[0.1, 0.2]]), 10)
+        assert rows.shape == (1, 2)
+
+    def test_kmeans_centroids_are_unit_norm(self):
+        centroids = spherical_kmeans(normalize(clustered(500)), nlist=8)
+        np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+class TestExactSearch:
+    def test_finds_itself_first(self):
+        store = VectorStore(DIM)
+        data = clustered(200)
+        store.upsert([f"v{i}" for i in range(200)], data)
+
+        hits = store.search(data[17], k=3)[0]
+        assert hits[0][0] == "v17"
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+    def test_matches_brute_force(self):
+        store = VectorStore(DIM)
+        data = clustered(300)
+        store.upsert([str(i) for i in range(300)], data)
+        queries = clustered(5, seed=1)
+
+        expected = np.argsort(-(normalize(queries) @ normalize(data).T), axis=1)[:, :5]
+        got = [[int(i) for i, _ in hits] for hits in store.search(queries, k=5)]
+        assert got == expected.tolist()
+
+    def test_upsert_replaces_existing_id(self):
+        store = VectorStore(DIM)
+        store.upsert(["a"], np.eye(DIM)[:1])
+        created = store.upsert(["a"], np.eye(DIM)[1:2])
+
+        assert created == 0
+        assert len(store) == 1
+        assert store.search(np.eye(DIM)[1], k=1)[0][0][1] == pytest.approx(1.0)
+
+    def test_grows_past_initial_capacity(self):
+        store = VectorStore(DIM, initial_capacity=4)
+        store.upsert([str(i) for i in range(10)], clustered(10))
+        assert len(store) == 10
+        assert store.stats()["capacity"] >= 10
+
+    def test_empty_store_returns_no_hits(self):
+        assert VectorStore(DIM).search(np.ones(DIM), k=5) == [[]]
+
+
+class TestIvfSearch:
+    def test_builds_index_above_threshold(self):
+        store = VectorStore(DIM, ivf_min_size=100, nlist=8)
+        store.upsert([str(i) for i in range(50)], clustered(50))
+        assert not store.uses_ivf
+        store.upsert([str(i) for i in range(50, 150)], clustered(100, seed=2))
+        assert store.uses_ivf
+
+    def test_recall_is_high_on_clustered_data(self):
+        data = clustered(2000)
+        queries = clustered(50, seed=3)
+        exact = VectorStore(DIM)
+        ivf = VectorStore(DIM, ivf_min_size=1000, nlist=16, nprobe=4)
+        ids = [str(i) for i in range(2000)]
+        exact.upsert(ids, data)
+        ivf.upsert(ids, data)
+
+        recall = np.mean(
+            [
+                len({i for i, _ in a} & {i for i, _ in b}) / 10
+                for a, b in zip(exact.search(queries, 10), ivf.search(queries, 10))
+            ]
+        )
+        assert recall >= 0.9
+
+    def test_inserts_after_training_are_searchable(self):
+        store = VectorStore(DIM, ivf_min_size=100, nlist=4, nprobe=4)
+        store.upsert([str(i) for i in range(150)], clustered(150))
+        late = clustered(1, seed=9)
+        store.upsert(["late"], late)
+
+        assert store.search(late, k=1)[0][0][0] == "late"